@@ -0,0 +1,76 @@
+"""
+Benchmark of the compression policies for Feather files: write time, read time, and file size of a synthetic
+PPM results table (columns as written by the intermediate script).
+
+Usage: python benchmarks/feather_compression.py [number of events ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from cmme.lib.compression import CompressionCodec, CompressionPolicy, write_feather
+
+POLICIES = [
+    CompressionPolicy(CompressionCodec.NONE),
+    CompressionPolicy(CompressionCodec.LZ4),
+    CompressionPolicy(CompressionCodec.ZSTD, 1),
+    CompressionPolicy(CompressionCodec.ZSTD, 3),
+    CompressionPolicy(CompressionCodec.ZSTD, 9),
+    CompressionPolicy(CompressionCodec.ZSTD, 16),
+    CompressionPolicy(CompressionCodec.AUTO),
+]
+REPETITIONS = 3
+
+
+def synthetic_results(events_count: int, alphabet_size: int = 12, trial_length: int = 100) -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    distributions = rng.dirichlet(np.ones(alphabet_size), size=events_count)
+    symbols = rng.integers(0, alphabet_size, size=events_count)
+    levels = [str(level) for level in range(alphabet_size)]
+    return pd.DataFrame({
+        "symbol": pd.Categorical.from_codes(symbols, categories=levels),
+        "model_order": rng.integers(-1, 10, size=events_count),
+        "information_content": -np.log2(distributions[np.arange(events_count), symbols]),
+        "entropy": -np.sum(distributions * np.log2(distributions), axis=1),
+        "distribution": list(distributions),
+        "trial_idx": np.arange(events_count) // trial_length + 1
+    })
+
+
+def benchmark(df: pd.DataFrame, policy: CompressionPolicy, directory: str) -> dict:
+    file_path = os.path.join(directory, "results.feather")
+    write_times, read_times = [], []
+    for _ in range(REPETITIONS):
+        start = time.perf_counter()
+        write_feather(df, file_path, policy)
+        write_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        pd.read_feather(file_path)
+        read_times.append(time.perf_counter() - start)
+
+    return {
+        "policy": "{}{}".format(policy.codec.value, "" if policy.level is None else "-{}".format(policy.level)),
+        "resolved": policy.resolve(df).codec.value,
+        "write_ms": 1000 * min(write_times),
+        "read_ms": 1000 * min(read_times),
+        "size_kib": os.path.getsize(file_path) / 1024
+    }
+
+
+def main(events_counts):
+    with tempfile.TemporaryDirectory() as directory:
+        for events_count in events_counts:
+            df = synthetic_results(events_count)
+            results = pd.DataFrame([benchmark(df, policy, directory) for policy in POLICIES])
+            print("events = {}".format(events_count))
+            print(results.to_string(index=False, float_format="{:.2f}".format))
+            print()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 100000, 1000000])
@@ -16,8 +16,7 @@ ppm_model_order = df.ppm_model_order;
 drex_predictions = reshape(cell2mat(df.drex_predictions), length(observation_levels), []);
 drex_surprisal = df.drex_surprisal;
 drex_entropy = df.drex_entropy;
-drex_context_beliefs = reshape(cell2mat(df.drex_context_beliefs), length(observations)+1, []);
-drex_context_beliefs = drex_context_beliefs';
+drex_context_beliefs = reshape(cell2mat(df.drex_context_beliefs), [], ntime); % (memory, time)
 
 % setup plot
 
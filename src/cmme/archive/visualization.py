@@ -10,6 +10,7 @@ from cmme.ppmdecay.binding import PPMResultsMetaFile
 import shutil
 from abc import ABC, abstractmethod
 from pathlib import Path
+from typing import Union
 from matplotlib.figure import Figure
 from matplotlib import pyplot as plt
 from cmme.drex.worker import MatlabWorker
@@ -27,71 +28,65 @@ class DataFrame:
         self.ppm_results_file = ppm_results_file
         self.drex_results_file = drex_results_file
         self.drex_feature_index = None
+        # Contiguous matrices, shape: (time, position) resp. (time, context); the data frame's rows are views of these
+        self.ppm_predictions: np.ndarray = None
+        self.drex_predictions: np.ndarray = None
+        self.drex_context_beliefs: np.ndarray = None
 
         self.df = self._build_data_frame()
 
     def _build_data_frame(self) -> pd.DataFrame:
-        ppm_data = self.ppm_results_file.results_file_data
+        ppm_df = self.ppm_results_file.results_file_data.df_of_last_trial()
         drex_data = self.drex_results_file
 
-        ppm_input_sequence = ppm_data.df_of_last_trial()["symbol"].tolist()
         try:
-            ppm_input_sequence_as_numbers = list(map(float, ppm_input_sequence))
-        except:
+            ppm_input_sequence_as_numbers = ppm_df["symbol"].to_numpy(dtype=float)
+        except (TypeError, ValueError):
             raise ValueError("PPM's input sequence was expected to but cannot be converted to a list of numbers.")
 
-        drex_input_sequence = None
-        drex_input_sequences = drex_data.input_sequence
+        # Compare all of D-REX's feature-specific input sequences at once, and use the first matching one
+        drex_input_sequences = np.asarray(drex_data.input_sequence, dtype=float)
         drex_input_sequence_feature_count = drex_data.dimension_values["feature"]
-        for feature_index in range(drex_input_sequence_feature_count):
-            drex_feature_input_sequence = drex_input_sequences[:, feature_index].tolist()
-            input_sequences_are_equal = np.array_equal(drex_feature_input_sequence, ppm_input_sequence_as_numbers)
-            if input_sequences_are_equal:
-                self.drex_feature_index = feature_index
-                drex_input_sequence = drex_feature_input_sequence
-                break
-        if drex_input_sequence is None:
+        matching_features = np.array([], dtype=int)
+        if drex_input_sequences.shape[0] == len(ppm_input_sequence_as_numbers):
+            matches = drex_input_sequences[:, :drex_input_sequence_feature_count] == \
+                ppm_input_sequence_as_numbers[:, np.newaxis]
+            matching_features = np.flatnonzero(np.all(matches, axis=0))
+        if len(matching_features) == 0:
             raise ValueError("Could not find a matching input sequence in any of D-REX's feature-specific input sequences.")
+        self.drex_feature_index = int(matching_features[0])
+        observations = drex_input_sequences[:, self.drex_feature_index]
+        ntime = len(observations)
+
+        # Prediction matrices, shape: (time, position)
+        self.ppm_predictions = np.ascontiguousarray(np.stack(ppm_df["distribution"].to_numpy())[:ntime], dtype=float)
+        self.drex_predictions = np.ascontiguousarray(
+            drex_data.psi.prediction_by_feature(self.drex_feature_index)[:ntime], dtype=float)
+        # D-REX stores context beliefs as (memory, context), where context covers time 0, ..., ntime
+        self.drex_context_beliefs = np.ascontiguousarray(np.asarray(drex_data.context_beliefs).T[:ntime], dtype=float)
 
-        # Data frame columns
-        observations = drex_input_sequence
-        ppm_information_content = ppm_data.df_of_last_trial()["information_content"]
-        drex_joint_surprisal = drex_data.joint_surprisal
-        ppm_entropy = ppm_data.df_of_last_trial()["entropy"]
-        ppm_predictions = ppm_data.df_of_last_trial()["distribution"]
-        drex_predictions = drex_data.psi.prediction_by_feature(self.drex_feature_index)
-        ppm_model_order = ppm_data.df_of_last_trial()["model_order"]
-        drex_context_beliefs = drex_data.context_beliefs
-        drex_belief_dynamics = drex_data.belief_dynamics
-        drex_changedecision_probability = drex_data.change_decision_probability
         # Constants
         ppm_alphabet_size = len(self.ppm_results_file.alphabet_levels)
-        drex_positions = self.drex_results_file.psi.positions_by_feature(self.drex_feature_index)
         drex_changedecision_threshold = drex_data.change_decision_threshold  # TODO
         drex_changedecision_changepoint = drex_data.change_decision_changepoint
 
-        data_frame_columns = ["observation",
-                              "ppm_information_content", "drex_surprisal",
-                              "ppm_alphabet_size", "ppm_model_order", "ppm_predictions", "drex_predictions",
-                              "ppm_entropy", "drex_entropy",
-                              "drex_context_beliefs",
-                              "drex_bd",
-                              "drex_cd_probability", "drex_cd_changepoint", "drex_cd_threshold"]
-        data_frame = pd.DataFrame([], columns=data_frame_columns)
-
-        # init data frame
-        for idx, observation in enumerate(observations):
-            drex_entropy = calc_drex_entropy(drex_predictions[idx])
-            data_frame.loc[idx] = [observation,
-                                   ppm_information_content[idx], drex_joint_surprisal[idx],
-                                   ppm_alphabet_size, ppm_model_order[idx], ppm_predictions[idx], drex_predictions[idx],
-                                   ppm_entropy[idx], drex_entropy,
-                                   drex_context_beliefs[idx],
-                                   drex_belief_dynamics[idx],
-                                   drex_changedecision_probability[idx], drex_changedecision_changepoint,
-                                   drex_changedecision_threshold]
-
-        return data_frame
+        return pd.DataFrame({
+            "observation": observations,
+            "ppm_information_content": ppm_df["information_content"].to_numpy()[:ntime],
+            "drex_surprisal": np.asarray(drex_data.joint_surprisal).flatten()[:ntime],
+            "ppm_alphabet_size": ppm_alphabet_size,
+            "ppm_model_order": ppm_df["model_order"].to_numpy()[:ntime],
+            # Per-row views of the prediction matrices (i.e., not copied)
+            "ppm_predictions": list(self.ppm_predictions),
+            "drex_predictions": list(self.drex_predictions),
+            "ppm_entropy": ppm_df["entropy"].to_numpy()[:ntime],
+            "drex_entropy": calc_drex_entropy(self.drex_predictions),
+            "drex_context_beliefs": list(self.drex_context_beliefs),
+            "drex_bd": np.asarray(drex_data.belief_dynamics).flatten()[:ntime],
+            "drex_cd_probability": np.asarray(drex_data.change_decision_probability).flatten()[:ntime],
+            "drex_cd_changepoint": [drex_changedecision_changepoint] * ntime,
+            "drex_cd_threshold": [drex_changedecision_threshold] * ntime
+        })
 
     def write_to_mat(self, instructions_file_path):
         data = {
@@ -107,14 +102,26 @@ class DataFrame:
         return instructions_file_path
 
 
-def calc_drex_entropy(ensemble) -> float:
-    ensemble_sum = np.sum(ensemble)
-    entropy = 0
-    for e in ensemble:
-        e = e / ensemble_sum # normalization
-        entropy += e * np.log2(e)
-    entropy = -entropy
-    return entropy
+def calc_drex_entropy(ensemble) -> Union[float, np.ndarray]:
+    """
+    Return the entropy (in bits) of D-REX's predictive distribution(s), each normalized to sum 1.
+
+    Parameters
+    ----------
+    ensemble
+        Predictions, shape: (position,) or (time, position)
+
+    Returns
+    -------
+    float or np.ndarray
+        Entropy, shape: () or (time,)
+    """
+    ensemble = np.asarray(ensemble, dtype=float)
+    p = ensemble / np.sum(ensemble, axis=-1, keepdims=True)  # normalization
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(p > 0, p * np.log2(p), 0.0)  # 0 * log(0) := 0
+    entropy = -np.sum(terms, axis=-1)
+    return entropy if entropy.ndim > 0 else float(entropy)
 
 
 class Plot(ABC):
@@ -200,8 +207,7 @@ class MatplotlibPlot(Plot):
 
         ax = plt.subplot(maxSubplot, 1, 2)
         ax.set_title("PPM: Predictions")
-        data = df_as_dict["ppm_predictions"]
-        predictions = self._prepare_predictions(data).T
+        predictions = self.data_frame.ppm_predictions[:ntime].T
         x = list(range(1, ntime + 1))
         y = list(range(1, ppm_alphabet_size + 1))
         ax.contourf(x, y, predictions, 100)
@@ -211,8 +217,7 @@ class MatplotlibPlot(Plot):
 
         ax = plt.subplot(maxSubplot, 1, 3)
         ax.set_title("D-REX: Predictions")
-        data = df_as_dict["drex_predictions"]
-        predictions = self._prepare_predictions(data).T
+        predictions = self.data_frame.drex_predictions[:ntime].T
         x = list(range(1, ntime + 1))
         y = list(range(1, ppm_alphabet_size + 1))
         ax.contourf(x, y, predictions, 1000)
@@ -261,8 +266,7 @@ class MatplotlibPlot(Plot):
 
         ax = plt.subplot(maxSubplot, 1, 9)
         ax.set_title("D-REX: Context Beliefs")
-        data = df_as_dict["drex_context_beliefs"]
-        context_beliefs = self._prepare_context_beliefs(data)
+        context_beliefs = self.data_frame.drex_context_beliefs[:ntime].T.copy()  # (memory, time)
         context_beliefs[context_beliefs == 0] = np.nan
         p = plt.pcolor(np.log10(context_beliefs))
         ax.set_xlim(xlims)
@@ -297,21 +301,3 @@ class MatplotlibPlot(Plot):
             ypos.extend([e, e, None])
 
         return [xpos, ypos]
-
-    def _prepare_predictions(self, predictions):
-        result = np.array([])
-        size = 0
-        for e in predictions:
-            size = len(e)
-            result = np.concatenate((result, e))
-        result = result.reshape(int(len(result)/size), size)
-        return result
-
-    def _prepare_context_beliefs(self, context_beliefs):
-        result = np.array([])
-        size = 0
-        for e in context_beliefs:
-            size = len(e)
-            result = np.concatenate((result, e))
-        result = result.reshape(int(len(result)/size), size)
-        return result
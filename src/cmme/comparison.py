@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+from typing import AsyncIterator, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from cmme.lib.model import Model, ModelBuilder
+from cmme.lib.results_file import ResultsFile
+
+
+def _model_of(builder: ModelBuilder) -> type:
+    # Imported on demand, such that, e.g., IDyOM's dependencies are only required when comparing with IDyOM
+    from cmme.drex.model import DREXInstructionBuilder, DREXModel
+    from cmme.ppmdecay.model import PPMInstructionBuilder, PPMModel
+    if isinstance(builder, PPMInstructionBuilder):
+        return PPMModel
+    if isinstance(builder, DREXInstructionBuilder):
+        return DREXModel
+    if type(builder).__module__.startswith("cmme.idyom"):
+        from cmme.idyom.model import IDYOMModel
+        return IDYOMModel
+    raise ValueError("builder invalid! {} is not supported.".format(type(builder).__name__))
+
+
+def results_columns(results_file: ResultsFile, length: int = None) -> Dict[str, np.ndarray]:
+    """
+    Return the per-observation quantities of a results file, each as array of the given length.
+
+    * PPM (last trial): information_content, entropy, model_order
+    * D-REX: surprisal (joint surprisal), belief_dynamics, change_probability
+    * IDyOM: information_content, entropy
+
+    Parameters
+    ----------
+    results_file
+        Results of PPM, D-REX, or IDyOM
+    length
+        Number of observations. If None, all values are returned.
+
+    Returns
+    -------
+    dict
+        Quantity name => values, shape: (length,)
+    """
+    from cmme.drex.binding import DREXResultsFile
+    from cmme.ppmdecay.binding import PPMResultsMetaFile
+    if isinstance(results_file, PPMResultsMetaFile):
+        df = results_file.results_file_data.df_of_last_trial()
+        columns = {"information_content": df["information_content"], "entropy": df["entropy"],
+                   "model_order": df["model_order"]}
+    elif isinstance(results_file, DREXResultsFile):
+        columns = {"surprisal": results_file.joint_surprisal, "belief_dynamics": results_file.belief_dynamics,
+                   "change_probability": results_file.change_decision_probability}
+    elif type(results_file).__module__.startswith("cmme.idyom"):
+        columns = {"information_content": results_file.df["information.content"],
+                   "entropy": results_file.df["entropy"]}
+    else:
+        raise ValueError("results_file invalid! {} is not supported.".format(type(results_file).__name__))
+
+    result = dict()
+    for name, values in columns.items():
+        values = np.asarray(values, dtype=float).flatten()
+        if length is not None and len(values) < length:
+            raise ValueError("results_file invalid! It has {} values of {}, but there are {} observations."
+                             .format(len(values), name, length))
+        result[name] = values[:length]  # e.g., D-REX's belief dynamics also cover the time after the last datum
+    return result
+
+
+class ComparisonPipeline:
+    """
+    Runs several models (PPM, D-REX, IDyOM) on the same input sequence concurrently, and aligns their results in
+    one table: one row per observation, and one column per model and quantity (e.g., "ppm_information_content",
+    "drex_surprisal"; see results_columns).
+
+    The runs are dispatched to their backends at once (see Model.arun), and each run's columns are added to the
+    table as soon as it finishes. Thus, the total time is that of the slowest run.
+    """
+
+    def __init__(self, input_sequence: list, builders: Dict[str, ModelBuilder], run_options: Dict[str, dict] = None):
+        """
+        Parameters
+        ----------
+        input_sequence
+            Input sequence (single trial). It is set as input sequence of all PPM and D-REX builders (which are
+            copied, i.e., not modified). IDyOM builders specify their dataset instead.
+        builders
+            Name (used as column prefix) => model builder
+        run_options
+            Name => further arguments of the model's arun (e.g., {"backend": PPMBackend.NATIVE})
+        """
+        if len(builders) == 0:
+            raise ValueError("builders invalid! There must be at least one builder.")
+        run_options = run_options if run_options is not None else dict()
+        unknown_names = set(run_options.keys()) - set(builders.keys())
+        if len(unknown_names) > 0:
+            raise ValueError("run_options invalid! There are no builders named {}.".format(sorted(unknown_names)))
+
+        self.input_sequence = list(input_sequence)
+        self.builders = builders
+        self.run_options = run_options
+        self.results: Dict[str, ResultsFile] = dict()
+        self.table = pd.DataFrame({"observation": self.input_sequence})
+
+    def _instructions_file(self, builder: ModelBuilder):
+        builder = copy.deepcopy(builder)
+        if hasattr(builder, "input_sequence") and not type(builder).__module__.startswith("cmme.idyom"):
+            builder.input_sequence(self.input_sequence)
+        return builder.to_instructions_file()
+
+    async def _run(self, name: str) -> Tuple[str, ResultsFile]:
+        builder = self.builders[name]
+        model: Model = _model_of(builder)
+        instructions_file = self._instructions_file(builder)
+        return name, await model.arun(instructions_file, **self.run_options.get(name, dict()))
+
+    def _add(self, name: str, results_file: ResultsFile) -> List[str]:
+        self.results[name] = results_file
+        columns = {"{}_{}".format(name, quantity): values
+                   for quantity, values in results_columns(results_file, len(self.input_sequence)).items()}
+        for column, values in columns.items():
+            self.table[column] = values
+        return list(columns.keys())
+
+    async def astream(self) -> AsyncIterator[Tuple[str, pd.DataFrame]]:
+        """
+        Run all models concurrently, and yield as soon as a run finished.
+
+        Returns
+        -------
+        AsyncIterator
+            Tuples of the finished run's name and the table (containing all columns of the runs finished so far)
+        """
+        tasks = [asyncio.ensure_future(self._run(name)) for name in self.builders.keys()]
+        try:
+            for task in asyncio.as_completed(tasks):
+                name, results_file = await task
+                self._add(name, results_file)
+                yield name, self.table
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def arun(self) -> pd.DataFrame:
+        """
+        Run all models concurrently, and return the table when all runs finished.
+
+        Returns
+        -------
+        pd.DataFrame
+            Aligned results
+        """
+        async for _ in self.astream():
+            pass
+        return self.table
+
+    def run(self) -> pd.DataFrame:
+        """
+        Like arun, but blocking (for use outside of an event loop).
+        """
+        return asyncio.run(self.arun())
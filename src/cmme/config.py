@@ -1,5 +1,6 @@
 import configparser
 from pathlib import Path
+from typing import Union
 
 
 class Config:
@@ -14,6 +15,12 @@ class Config:
     CONFIG_IDYOM_ROOT = "IDYOM_ROOT"
     CONFIG_IDYOM_DATABASE = "IDYOM_DATABASE"
     CONFIG_CMME_IO_DIR_KEY = "CMME_IO_DIR"
+    CONFIG_FEATHER_COMPRESSION_KEY = "FEATHER_COMPRESSION"
+    CONFIG_FEATHER_COMPRESSION_LEVEL_KEY = "FEATHER_COMPRESSION_LEVEL"
+
+    # Fallback values for optional keys
+    DEFAULT_FEATHER_COMPRESSION = "zstd"
+    DEFAULT_FEATHER_COMPRESSION_LEVEL = 16
 
     def __init__(self, config_file_path: Path = DEFAULT_CONFIG_FILE_PATH):
         if not config_file_path.exists():
@@ -36,4 +43,13 @@ class Config:
         return Path(self.config_parser[Config.CONFIG_SECTION_KEY][Config.CONFIG_IDYOM_DATABASE])
 
     def cmme_io_dir(self) -> Path:
-        return Path(self.config_parser[Config.CONFIG_SECTION_KEY][Config.CONFIG_CMME_IO_DIR_KEY])
\ No newline at end of file
+        return Path(self.config_parser[Config.CONFIG_SECTION_KEY][Config.CONFIG_CMME_IO_DIR_KEY])
+
+    def feather_compression(self) -> str:
+        return self.config_parser[Config.CONFIG_SECTION_KEY].get(Config.CONFIG_FEATHER_COMPRESSION_KEY,
+                                                                 Config.DEFAULT_FEATHER_COMPRESSION)
+
+    def feather_compression_level(self) -> Union[int, None]:
+        level = self.config_parser[Config.CONFIG_SECTION_KEY].get(Config.CONFIG_FEATHER_COMPRESSION_LEVEL_KEY,
+                                                                  str(Config.DEFAULT_FEATHER_COMPRESSION_LEVEL))
+        return int(level) if level != "" else None
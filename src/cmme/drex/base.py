@@ -14,6 +14,12 @@ class DistributionType(Enum):
     POISSON = "poisson"
 
 
+class DREXBackend(Enum):
+    """Implementations of D-REX which DREXModel can run"""
+    MATLAB = "MATLAB"
+    NATIVE = "NATIVE"
+
+
 class Prior(ABC):
     def __init__(self):
         pass
@@ -207,7 +213,7 @@ class GmmPrior(Prior):
 
 
 class PoissonPrior(Prior):
-    def __init__(self, lambd: np.ndarray, n: np.ndarray):
+    def __init__(self, lambd: np.ndarray, n: np.ndarray, D: int = 50):
         """
         Representation of a Poisson prior
 
@@ -217,6 +223,8 @@ class PoissonPrior(Prior):
             interval size, shape: (feature,)
         n
             indicator of how many elements were counted so far, shape: (feature,)
+        D
+            number of most-recent observations which are summed up (D-REX's default value: 50)
         """
         super().__init__()
         if len(lambd.shape) != 1:
@@ -230,9 +238,13 @@ class PoissonPrior(Prior):
         if not lambda_features == n_features:
             raise ValueError("Dimension 'feature' invalid! Value must be equal for lambd and n.")
 
+        if D < 1:
+            raise ValueError("D invalid! Value must be greater than or equal 1.")
+
         self.lambd = lambd
         self.n = n
         self._feature_count = lambda_features
+        self._D = D
 
     def distribution_type(self):
         return DistributionType.POISSON
@@ -241,7 +253,7 @@ class PoissonPrior(Prior):
         return self._feature_count
 
     def D_value(self):
-        return NotImplementedError
+        return self._D
 
 
 class UnprocessedPrior(Prior):
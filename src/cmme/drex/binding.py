@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import io
+import json
 import numbers
+import struct
+import zlib
 from pathlib import Path
-from typing import Union
+from typing import Dict, Iterator, Mapping, Tuple, Union
 
 import numpy as np
 import scipy.io as sio
@@ -48,6 +52,298 @@ def from_mat(file_path: Union[str, Path], simplify_cells=True) -> dict:
     return mat_data
 
 
+# Data types and array classes of the MATLAB 5 file format, see MATLAB's "MAT-File Format" documentation
+MAT_HEADER_SIZE = 128
+MI_INT8 = 1
+MI_MATRIX = 14
+MI_COMPRESSED = 15
+MX_STRUCT_CLASS = 2
+
+
+class _MatStream:
+    """
+    Forward-only byte stream over a data element of a MATLAB file, which is decompressed on the fly if compressed.
+    Thus, skipped parts are never kept in memory.
+    """
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, file, length: int, compressed: bool, byte_order: str):
+        self._file = file
+        self._remaining = length
+        self._decompressor = zlib.decompressobj() if compressed else None
+        self.byte_order = byte_order
+
+    def _next(self, n: int) -> bytes:
+        if self._decompressor is None:
+            data = self._file.read(min(n, self._remaining))
+            self._remaining -= len(data)
+            return data
+        while True:
+            if self._decompressor.unconsumed_tail:
+                data = self._decompressor.decompress(self._decompressor.unconsumed_tail, n)
+            else:
+                compressed = self._file.read(min(self._remaining, _MatStream.CHUNK_SIZE))
+                self._remaining -= len(compressed)
+                if len(compressed) == 0:
+                    return b""
+                data = self._decompressor.decompress(compressed, n)
+            if len(data) > 0:
+                return data
+
+    def read(self, n: int) -> bytes:
+        parts = []
+        while n > 0:
+            data = self._next(n)
+            if len(data) == 0:
+                raise ValueError("MATLAB file invalid! Unexpected end of data element.")
+            parts.append(data)
+            n -= len(data)
+        return b"".join(parts)
+
+    def skip(self, n: int):
+        while n > 0:
+            n -= len(self.read(min(n, _MatStream.CHUNK_SIZE)))
+
+    def read_tag(self) -> Tuple[bytes, int, int]:
+        """
+        Return the tag (as bytes), data type, and data size of the next (full) data element.
+        """
+        tag = self.read(8)
+        data_type, nbytes = struct.unpack(self.byte_order + "II", tag)
+        return tag, data_type, nbytes
+
+    def read_element(self) -> bytes:
+        """
+        Return the data of the next data element, which may be in small data element format.
+        """
+        tag, data_type, nbytes = self.read_tag()
+        if data_type >> 16 != 0:  # small data element: size and type in 4 bytes, followed by 4 bytes of data
+            return tag[4:4 + (data_type >> 16)]
+        data = self.read(nbytes)
+        self.skip(-nbytes % 8)
+        return data
+
+
+class MatVariables(Mapping):
+    """
+    Top-level variables of a MATLAB file (.mat). On construction, only the variable headers are read. Each variable
+    is decoded on first access (as by sio.loadmat(..., simplify_cells=False)), and kept afterwards. The fields of a
+    scalar struct can also be decoded one at a time (see field), without decoding the other fields.
+    """
+
+    def __init__(self, file_path: Union[str, Path]):
+        """
+        Parameters
+        ----------
+        file_path
+            Path where the file is stored
+        """
+        self.file_path = Path(file_path)
+        self.shapes = {name: shape for name, shape, _ in sio.whosmat(str(self.file_path))}
+        self._values = dict()
+        self._fields = dict()  # (variable name, field name) => value
+        self._elements = None  # variable name => offset, size, and whether compressed, of its data element
+
+    def __getitem__(self, name: str):
+        if name not in self.shapes:
+            raise KeyError(name)
+        if name not in self._values:
+            self._values[name] = sio.loadmat(str(self.file_path), variable_names=[name], simplify_cells=False)[name]
+        return self._values[name]
+
+    def __contains__(self, name) -> bool:
+        return name in self.shapes  # without decoding (as Mapping.__contains__ would)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.shapes)
+
+    def __len__(self) -> int:
+        return len(self.shapes)
+
+    def field(self, name: str, field_name: str):
+        """
+        Return a field of a scalar struct variable, i.e., the value of variable[field_name][0][0]. Only this field is
+        decoded (and kept afterwards), unless the variable has been decoded as a whole already.
+
+        Parameters
+        ----------
+        name
+            Variable name
+        field_name
+            Field name
+
+        Returns
+        -------
+        Any
+            Value of the field
+        """
+        if name not in self.shapes:
+            raise KeyError(name)
+        if name in self._values:
+            return self._values[name][field_name][0][0]
+        if (name, field_name) not in self._fields:
+            element = self._read_field_element(name, field_name)
+            if element is None:  # not a scalar struct
+                return self[name][field_name][0][0]
+            with open(self.file_path, "rb") as f:
+                header = f.read(MAT_HEADER_SIZE)
+            # A standalone file of the field's data element, named like the field
+            self._fields[(name, field_name)] = sio.loadmat(io.BytesIO(header + element),
+                                                           simplify_cells=False)[field_name]
+        return self._fields[(name, field_name)]
+
+    def is_decoded(self, name: str, field_name: str = None) -> bool:
+        if field_name is None or name in self._values:
+            return name in self._values
+        return (name, field_name) in self._fields
+
+    def release(self, name: str):
+        """
+        Drop the decoded value of a variable, and its decoded fields. It is decoded again on its next access.
+        """
+        self._values.pop(name, None)
+        for key in [key for key in self._fields if key[0] == name]:
+            del self._fields[key]
+
+    @staticmethod
+    def _byte_order(header: bytes) -> str:
+        return "<" if header[126:128] == b"IM" else ">"
+
+    def _scan_elements(self) -> Dict[str, Tuple[int, int, bool]]:
+        elements = dict()
+        with open(self.file_path, "rb") as f:
+            byte_order = MatVariables._byte_order(f.read(MAT_HEADER_SIZE))
+            offset = MAT_HEADER_SIZE
+            while True:
+                f.seek(offset)
+                tag = f.read(8)
+                if len(tag) < 8:
+                    break
+                data_type, nbytes = struct.unpack(byte_order + "II", tag)
+                compressed = data_type == MI_COMPRESSED
+                if compressed or data_type == MI_MATRIX:
+                    stream = _MatStream(f, nbytes, compressed, byte_order)
+                    if compressed:
+                        stream.read_tag()  # of the (decompressed) matrix
+                    stream.read_element()  # array flags
+                    stream.read_element()  # dimensions
+                    name = stream.read_element().decode("latin1")
+                    elements[name] = (offset + 8, nbytes, compressed)
+                offset += 8 + nbytes + (0 if compressed else -nbytes % 8)
+        return elements
+
+    def _read_field_element(self, name: str, field_name: str) -> Union[bytes, None]:
+        """
+        Return the data element (including its tag) of a field of a scalar struct variable, or None if the variable
+        is not a scalar struct. All other fields are skipped.
+        """
+        if self._elements is None:
+            self._elements = self._scan_elements()
+        offset, nbytes, compressed = self._elements[name]
+        with open(self.file_path, "rb") as f:
+            byte_order = MatVariables._byte_order(f.read(MAT_HEADER_SIZE))
+            f.seek(offset)
+            stream = _MatStream(f, nbytes, compressed, byte_order)
+            if compressed:
+                stream.read_tag()
+            array_flags = stream.read_element()
+            dimensions = np.frombuffer(stream.read_element(), dtype=byte_order + "i4")
+            stream.read_element()  # name
+            if struct.unpack(byte_order + "I", array_flags[:4])[0] & 0xFF != MX_STRUCT_CLASS or \
+                    np.prod(dimensions) != 1:
+                return None
+            field_name_length = struct.unpack(byte_order + "i", stream.read_element()[:4])[0]
+            field_names_data = stream.read_element()
+            field_names = [field_names_data[i:i + field_name_length].split(b"\0", 1)[0].decode("latin1")
+                           for i in range(0, len(field_names_data), field_name_length)]
+            if field_name not in field_names:
+                raise KeyError(field_name)
+            for current_field_name in field_names:
+                _, _, field_nbytes = stream.read_tag()
+                if current_field_name == field_name:
+                    return MatVariables._renamed_matrix(stream.read(field_nbytes), field_name, byte_order)
+                stream.skip(field_nbytes)
+
+    @staticmethod
+    def _renamed_matrix(data: bytes, name: str, byte_order: str) -> bytes:
+        """
+        Return a matrix data element (including its tag) with the given data, but its array name replaced by name.
+        """
+        buffer = io.BytesIO(data)
+        stream = _MatStream(buffer, len(data), False, byte_order)
+        stream.read_element()  # array flags
+        stream.read_element()  # dimensions
+        name_offset = buffer.tell()
+        stream.read_element()
+        encoded_name = name.encode("latin1")
+        name_element = struct.pack(byte_order + "II", MI_INT8, len(encoded_name)) + encoded_name + \
+            b"\0" * (-len(encoded_name) % 8)
+        data = data[:name_offset] + name_element + data[buffer.tell():]
+        return struct.pack(byte_order + "II", MI_MATRIX, len(data)) + data
+
+
+def struct_field(data: Mapping, name: str, field_name: str):
+    """
+    Return a field of a scalar struct variable, i.e., data[name][field_name][0][0]. If data are MatVariables, only
+    this field is decoded.
+    """
+    if isinstance(data, MatVariables):
+        return data.field(name, field_name)
+    return data[name][field_name][0][0]
+
+
+# Processed prior class and its array attributes, per distribution
+PRIOR_ARRAYS = {
+    DistributionType.GAUSSIAN: (GaussianPrior, ["means", "covariance", "n"]),
+    DistributionType.LOGNORMAL: (LognormalPrior, ["means", "covariance", "n"]),
+    DistributionType.GMM: (GmmPrior, ["means", "covariance", "n", "pi", "sp", "k"]),
+    DistributionType.POISSON: (PoissonPrior, ["lambd", "n"])
+}
+
+
+def prior_to_arrays(prior: Prior) -> Dict[str, np.ndarray]:
+    """
+    Return the arrays which describe a processed prior, e.g., to write them with np.savez.
+
+    Parameters
+    ----------
+    prior
+        Processed prior
+
+    Returns
+    -------
+    dict
+        Arrays, including the distribution type ("distribution")
+    """
+    if prior.distribution_type() not in PRIOR_ARRAYS:
+        raise ValueError("prior invalid! Only processed priors are supported.")
+    _, attributes = PRIOR_ARRAYS[prior.distribution_type()]
+    arrays = {attribute: np.asarray(getattr(prior, attribute)) for attribute in attributes}
+    arrays["distribution"] = np.array(prior.distribution_type().value)
+    if prior.distribution_type() == DistributionType.POISSON:
+        arrays["D"] = np.array(prior.D_value())
+    return arrays
+
+
+def prior_from_arrays(arrays: Mapping) -> Prior:
+    """
+    Return the processed prior described by the arrays (see prior_to_arrays).
+
+    Parameters
+    ----------
+    arrays
+        Arrays, including the distribution type ("distribution")
+
+    Returns
+    -------
+    Prior
+        Processed prior
+    """
+    prior_class, attributes = PRIOR_ARRAYS[DistributionType(str(arrays["distribution"]))]
+    kwargs = {"D": int(arrays["D"])} if "D" in arrays else dict()
+    return prior_class(*[arrays[attribute] for attribute in attributes], **kwargs)
+
+
 def transform_to_estimatesuffstat_representation(input_sequence: np.ndarray) -> np.ndarray:
     """
     Transform an input sequence to a numpy array representation which suits the representation as needed by
@@ -441,40 +737,160 @@ class DREXResultsFile(ResultsFile):
 
             return PoissonPrior(np.array(_lambd), np.array(_n))
 
+    # Constructor arguments, in order
+    ATTRIBUTES = ["instructions_file_path", "input_sequence", "prior", "surprisal", "joint_surprisal",
+                  "context_beliefs", "belief_dynamics", "change_decision_changepoint", "change_decision_probability",
+                  "change_decision_threshold", "psi"]
+
     @staticmethod
-    def load(file_path: Union[str, Path]) -> Union[DREXResultsFile, Prior]:
+    def _decode_attribute(attribute: str, data: Mapping):
+        """
+        Decode a single attribute from the top-level variables of a results file. Only the variables which are
+        required for this attribute are accessed.
+        """
+        if attribute == "instructions_file_path":
+            return str(data["instructions_file_path"][0])
+        elif attribute == "input_sequence":
+            return transform_to_rundrexmodel_representation(
+                transform_to_unified_drex_input_sequence_representation([data["input_sequence"].T.tolist()]))
+        elif attribute == "prior":
+            return DREXResultsFile._load_processed_prior(data)
+        elif attribute in ["surprisal", "joint_surprisal", "context_beliefs"]:
+            value = np.array(struct_field(data, "run_DREX_model_results", attribute))
+            return value.flatten() if attribute == "joint_surprisal" else value
+        elif attribute == "belief_dynamics":
+            return np.array(data["post_DREX_beliefdynamics_results"]).flatten()
+        elif attribute == "change_decision_changepoint":
+            return float(np.array(struct_field(data, "post_DREX_changedecision_results", "changepoint")).flatten()[0])
+        elif attribute == "change_decision_probability":
+            return np.array(struct_field(data, "post_DREX_changedecision_results", "changeprobability")).flatten()
+        elif attribute == "change_decision_threshold":
+            return float(np.array(data["change_decision_threshold"]).flatten()[0])
+        elif attribute == "psi":
+            if str(data["distribution"][0]) in [DistributionType.GAUSSIAN.value, DistributionType.LOGNORMAL.value,
+                                                DistributionType.GMM.value]:
+                return DREXResultsFile._load_prediction_results(data["post_DREX_prediction_results"])
+            return DREXResultsFilePsi({}, {})
+        raise ValueError("attribute invalid! Unknown attribute {}.".format(attribute))
+
+    @staticmethod
+    def load(file_path: Union[str, Path], lazy: bool = False) -> Union[DREXResultsFile, Prior]:
+        """
+        Load a results file.
+
+        Parameters
+        ----------
+        file_path
+            Where the results file is stored
+        lazy
+            If True, return a LazyDREXResultsFile, which decodes each attribute on first access only. If a sidecar
+            (see save_sidecar) exists which is not older than the results file, its arrays are memory-mapped instead.
+
+        Returns
+        -------
+        Union[DREXResultsFile, Prior]
+            Results file, or the processed prior if the file contains the results of estimate_suffstat only
+        """
+        if lazy:
+            sidecar_path = DREXResultsFile.sidecar_path(file_path)
+            if (sidecar_path / DREXResultsFile.SIDECAR_META_FILE).exists() and \
+                    sidecar_path.stat().st_mtime >= Path(file_path).stat().st_mtime:
+                return DREXResultsFile.load_sidecar(sidecar_path)
+            lazy_results_file = LazyDREXResultsFile(file_path)
+            if "run_DREX_model_results" not in lazy_results_file.variables:
+                return lazy_results_file.prior
+            return lazy_results_file
+
         data = from_mat(file_path, simplify_cells=False) # TODO adapt code for "simplify_cells=True"
 
         prior = DREXResultsFile._load_processed_prior(data)
         if "run_DREX_model_results" not in data:
             return prior
 
-        instructions_file_path = data["instructions_file_path"][0]
-        input_sequence = data["input_sequence"]
-        run_results = data["run_DREX_model_results"]
-        bd_results = data["post_DREX_beliefdynamics_results"]
-        cd_results = data["post_DREX_changedecision_results"]
-        pred_results = data["post_DREX_prediction_results"]
-
-        input_sequence = transform_to_rundrexmodel_representation(
-            transform_to_unified_drex_input_sequence_representation([input_sequence.T.tolist()]))
-        surprisal = np.array(run_results["surprisal"][0][0])
-        joint_surprisal = np.array(run_results["joint_surprisal"][0][0]).flatten()
-        context_beliefs = np.array(run_results["context_beliefs"][0][0])
-        belief_dynamics = np.array(bd_results).flatten()
-        change_decision_changepoint = float(cd_results["changepoint"][0][0])
-        change_decision_probability = np.array(cd_results["changeprobability"][0][0]).flatten()
-        change_decision_threshold = float(data["change_decision_threshold"])
-        if prior.distribution_type() in [DistributionType.GAUSSIAN, DistributionType.LOGNORMAL, DistributionType.GMM]:
-            psi = DREXResultsFile._load_prediction_results(pred_results)
-        else:
-            psi = DREXResultsFilePsi({}, {})
+        return DREXResultsFile(*[prior if attribute == "prior" else DREXResultsFile._decode_attribute(attribute, data)
+                                 for attribute in DREXResultsFile.ATTRIBUTES])
+
+    SIDECAR_META_FILE = "meta.json"
+    SIDECAR_PRIOR_FILE = "prior.npz"
+
+    @staticmethod
+    def sidecar_path(file_path: Union[str, Path]) -> Path:
+        """
+        Return the default sidecar path of a results file, i.e., the directory "<name>-sidecar" next to it.
+        """
+        file_path = Path(file_path)
+        return file_path.parent / (file_path.stem + "-sidecar")
+
+    @staticmethod
+    def save_sidecar(results_file: DREXResultsFile, sidecar_path: Union[str, Path]) -> Path:
+        """
+        Write the results as sidecar, i.e., a directory with one uncompressed .npy file per array, which can be
+        memory-mapped by load_sidecar.
 
-        return DREXResultsFile(str(instructions_file_path), input_sequence, prior, surprisal,
-                               joint_surprisal,
-                               context_beliefs, belief_dynamics, change_decision_changepoint,
-                               change_decision_probability,
-                               change_decision_threshold, psi)
+        Parameters
+        ----------
+        results_file
+            Results to write
+        sidecar_path
+            Directory to write to (see sidecar_path)
+
+        Returns
+        -------
+        Path
+            Sidecar path
+        """
+        sidecar_path = Path(sidecar_path)
+        sidecar_path.mkdir(parents=True, exist_ok=True)
+
+        for attribute in ["input_sequence", "surprisal", "joint_surprisal", "context_beliefs", "belief_dynamics",
+                          "change_decision_probability"]:
+            np.save(sidecar_path / (attribute + ".npy"), np.asarray(getattr(results_file, attribute)))
+        for f in results_file.psi.features():
+            np.save(sidecar_path / "psi-prediction-{}.npy".format(f), results_file.psi.prediction_by_feature(f))
+            np.save(sidecar_path / "psi-positions-{}.npy".format(f), results_file.psi.positions_by_feature(f))
+        np.savez(sidecar_path / DREXResultsFile.SIDECAR_PRIOR_FILE, **prior_to_arrays(results_file.prior))
+
+        # Written last, as it marks the sidecar as complete
+        with open(sidecar_path / DREXResultsFile.SIDECAR_META_FILE, "w") as f:
+            json.dump({"instructions_file_path": str(results_file.instructions_file_path),
+                       "change_decision_changepoint": results_file.change_decision_changepoint,
+                       "change_decision_threshold": results_file.change_decision_threshold,
+                       "psi_features": [int(f) for f in results_file.psi.features()]}, f)
+        return sidecar_path
+
+    @staticmethod
+    def load_sidecar(sidecar_path: Union[str, Path], mmap_mode: str = "r") -> DREXResultsFile:
+        """
+        Load results from a sidecar (see save_sidecar).
+
+        Parameters
+        ----------
+        sidecar_path
+            Directory of the sidecar
+        mmap_mode
+            Passed to np.load. If "r", arrays are memory-mapped read-only, i.e., only the accessed parts are read.
+            If None, arrays are read into memory.
+
+        Returns
+        -------
+        DREXResultsFile
+            Results
+        """
+        sidecar_path = Path(sidecar_path)
+        with open(sidecar_path / DREXResultsFile.SIDECAR_META_FILE) as f:
+            meta = json.load(f)
+        with np.load(sidecar_path / DREXResultsFile.SIDECAR_PRIOR_FILE) as prior_arrays:
+            prior = prior_from_arrays(dict(prior_arrays))
+
+        def load_array(name: str) -> np.ndarray:
+            return np.load(sidecar_path / (name + ".npy"), mmap_mode=mmap_mode)
+
+        psi = DREXResultsFilePsi({f: load_array("psi-prediction-{}".format(f)) for f in meta["psi_features"]},
+                                 {f: load_array("psi-positions-{}".format(f)) for f in meta["psi_features"]})
+        return DREXResultsFile(meta["instructions_file_path"], load_array("input_sequence"), prior,
+                               load_array("surprisal"), load_array("joint_surprisal"), load_array("context_beliefs"),
+                               load_array("belief_dynamics"), meta["change_decision_changepoint"],
+                               load_array("change_decision_probability"), meta["change_decision_threshold"], psi)
 
     # TODO add prediction_params from run_DREX_model.m?
     def __init__(self, instructions_file_path: Union[str, Path],
@@ -558,3 +974,45 @@ class DREXResultsFile(ResultsFile):
         self.change_decision_probability = change_decision_probability
         self.change_decision_threshold = change_decision_threshold
         self.psi = psi
+
+
+class LazyDREXResultsFile(DREXResultsFile):
+    """
+    Results file whose attributes are decoded on first access, e.g., accessing joint_surprisal decodes neither the
+    (possibly large) marginal predictive distribution psi, nor the other fields of run_DREX_model_results (e.g.,
+    context_beliefs).
+    """
+
+    def __init__(self, file_path: Union[str, Path]):
+        """
+        Parameters
+        ----------
+        file_path
+            Where the results file is stored
+        """
+        ResultsFile.__init__(self)
+        self.variables = MatVariables(file_path)
+
+    def __getattr__(self, name: str):
+        # Only called if the attribute has not been decoded yet
+        if name in DREXResultsFile.ATTRIBUTES:
+            value = DREXResultsFile._decode_attribute(name, self.variables)
+        elif name == "dimension_values":
+            value = {"time": self.input_sequence.shape[0], "feature": self.input_sequence.shape[1],
+                     "context": self.context_beliefs.shape[1]}
+        else:
+            raise AttributeError(name)
+        self.__dict__[name] = value
+        return value
+
+    def is_decoded(self, attribute: str) -> bool:
+        return attribute in self.__dict__
+
+    def release(self, attribute: str):
+        """
+        Drop a decoded attribute, and all decoded variables of the file. The attribute is decoded again on its next
+        access.
+        """
+        self.__dict__.pop(attribute, None)
+        for name in self.variables:
+            self.variables.release(name)
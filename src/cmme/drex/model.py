@@ -2,16 +2,23 @@ from __future__ import annotations
 
 import numbers
 from abc import ABC
-from typing import Union, List
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Union, List, TYPE_CHECKING
 
-from .base import Prior
+from .base import Prior, DREXBackend
 from .binding import DREXInstructionsFile, DREXResultsFile
+from .native import run_native_model
+from .session import DREXSession
 from .util import transform_to_unified_drex_input_sequence_representation
 import numpy as np
 
-from .worker import MatlabWorker
+from ..lib.cache import ResultsCache
 from ..lib.model import ModelBuilder, Model
 
+if TYPE_CHECKING:
+    from .worker import MatlabEnginePool
+
 
 class DREXInstructionBuilder(ModelBuilder, ABC):
     def __init__(self):
@@ -267,21 +274,135 @@ class DREXInstructionBuilder(ModelBuilder, ABC):
                                     self._max_ncomp, self._beta,
                                     self._predscale, self._change_decision_threshold)
 
+    def to_session(self) -> DREXSession:
+        """
+        Return an online session (see DREXSession) with this configuration. The input sequence is ignored, as
+        observations are passed to the session one at a time. A hazard rate per time step is not supported.
+
+        Returns
+        -------
+        DREXSession
+            Session
+        """
+        if self._prior is None:
+            raise ValueError("prior invalid! The prior must be set.")
+        hazard = np.asarray(self._hazard, dtype=float).flatten()
+        if len(hazard) != 1:
+            raise ValueError("hazard invalid! A session requires a single hazard rate, pass hazard rates per time "
+                             "step to DREXSession.observe instead.")
+        return DREXSession(self._prior, hazard[0], self._obsnz, self._memory, self._maxhyp, self._predscale,
+                           self._change_decision_threshold, self._max_ncomp, self._beta)
+
 
 class DREXModel(Model):
     """
     High-level interface for using D-REX.
     Using +instance+, one can hyper-parameterize D-REX.
     """
+    ASYNC_CONCURRENCY_LIMITS = {DREXBackend.MATLAB: 1}  # size of the default engine pool (see MatlabEnginePool)
+    DEFAULT_BACKEND = DREXBackend.MATLAB
 
-    def __init__(self):
+    def __init__(self, pool: MatlabEnginePool = None, backend: DREXBackend = DREXBackend.MATLAB):
+        """
+        Parameters
+        ----------
+        pool
+            Pool of MATLAB engines to run D-REX with. If None, the default pool is used.
+        backend
+            DREXBackend.MATLAB runs D-REX's MATLAB implementation. DREXBackend.NATIVE runs D-REX in-process.
+        """
         super().__init__()
+        self.pool = pool
+        self.backend = DREXBackend(backend)
+
+    def _pool(self) -> MatlabEnginePool:
+        from .worker import MatlabEnginePool
+        return self.pool if self.pool is not None else MatlabEnginePool.default()
 
     def run(self, instructions_file_path) -> DREXResultsFile:
-        results_file_path = MatlabWorker.run_model(instructions_file_path)
-        results_file = DREXResultsFile.load(results_file_path)
-        return results_file
+        return self.submit(instructions_file_path).result()
+
+    def submit(self, instructions_file_path: Union[str, Path]) -> Future:
+        """
+        Schedule the execution of an instructions file.
+
+        Parameters
+        ----------
+        instructions_file_path
+            Path of the instructions file
+
+        Returns
+        -------
+        Future
+            Future of the DREXResultsFile
+        """
+        results_future = Future()
+
+        if self.backend == DREXBackend.NATIVE:
+            try:
+                results_future.set_result(
+                    run_native_model(DREXInstructionsFile.load(instructions_file_path), instructions_file_path))
+            except Exception as e:
+                results_future.set_exception(e)
+            return results_future
+
+        def load_results_file(engine_future: Future):
+            try:
+                results_future.set_result(DREXResultsFile.load(engine_future.result()))
+            except Exception as e:
+                results_future.set_exception(e)
+
+        self._pool().submit(instructions_file_path).add_done_callback(load_results_file)
+        return results_future
+
+    def map(self, instructions_file_paths: List[Union[str, Path]]) -> List[DREXResultsFile]:
+        """
+        Run several instructions files concurrently (as many as the pool has engines), and wait until all of them are
+        processed.
+
+        Parameters
+        ----------
+        instructions_file_paths
+            Paths of the instructions files
+
+        Returns
+        -------
+        list
+            DREXResultsFile objects, in the order of instructions_file_paths
+        """
+        futures = [self.submit(path) for path in instructions_file_paths]
+        return [future.result() for future in futures]
+
+    @classmethod
+    def run_instructions_file(cls, instructions_file: DREXInstructionsFile,
+                              backend: DREXBackend = DREXBackend.MATLAB, cache: ResultsCache = None) \
+            -> DREXResultsFile:
+        """
+        Run D-REX as described by the instructions file.
+
+        Parameters
+        ----------
+        instructions_file
+            Instructions file object
+        backend
+            DREXBackend.MATLAB runs D-REX's MATLAB implementation. DREXBackend.NATIVE runs D-REX in-process, which
+            requires a processed prior.
+        cache
+            If set, results of an identical configuration (instructions, backend) are returned from this cache, and
+            new results are stored in it.
+
+        Returns
+        -------
+        DREXResultsFile
+            Results. If backend is DREXBackend.NATIVE, the results are held in memory only.
+        """
+        if cache is not None:
+            return cache.get_or_run(instructions_file, lambda: cls.run_instructions_file(instructions_file, backend),
+                                    cls.__name__, backend)
+        if backend == DREXBackend.NATIVE:
+            return run_native_model(instructions_file)
+        return super().run_instructions_file(instructions_file)
 
     @staticmethod
-    def run_instructions_file_at_path(file_path: str) -> DREXResultsFile:
-        return DREXModel().run(file_path)
+    def run_instructions_file_at_path(file_path: str, backend: DREXBackend = DREXBackend.MATLAB) -> DREXResultsFile:
+        return DREXModel(backend=backend).run(file_path)
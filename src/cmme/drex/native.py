@@ -0,0 +1,615 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Union
+
+import numpy as np
+from scipy.special import gammaln
+
+from .base import DistributionType, Prior, UnprocessedPrior, GmmPrior
+from .binding import DREXInstructionsFile, DREXResultsFile, DREXResultsFilePsi
+from .suffstat import PriorCache
+
+
+class DREXEngine(ABC):
+    """
+    In-process implementation of D-REX's run_DREX_model.m (Bayesian change-point inference).
+
+    Each context hypothesis corresponds to a run length, i.e., to the time step at which the current context started.
+    Hypotheses are stored in preallocated arrays (one slot per hypothesis, the oldest hypothesis first, the prior
+    as newest one) and are updated at once for all slots. This core handles the context beliefs and the pruning of
+    hypotheses (memory, maxhyp). Subclasses implement the distribution-specific sufficient statistics.
+
+    Like run_DREX_model.m, the engine considers at most memory-1 hypotheses: as soon as the window of memory slots
+    is full, the oldest slot is cleared. Only the D most recent observations are kept, thus, with finite memory, the
+    engine's memory use is constant.
+    """
+    distribution_type: DistributionType = None
+
+    def __init__(self, prior: Prior, hazard: float = 0.01, obsnz: Union[float, List[float]] = 0,
+                 memory: Union[int, float] = np.inf, maxhyp: Union[int, float] = np.inf, predscale: float = 0.001,
+                 capacity: int = 64):
+        """
+        Parameters
+        ----------
+        prior
+            Processed prior, used as sufficient statistics of each new hypothesis
+        hazard
+            Default hazard rate, used unless step receives a hazard rate
+        obsnz
+            Observation noise: scalar or one value per feature
+        memory
+            Number of most-recent hypotheses to calculate
+        maxhyp
+            Number of hypotheses to calculate at every time step
+        predscale
+            Scaling of probability densities to probabilities
+        capacity
+            Number of hypothesis slots to allocate initially. Slots are reallocated (doubling) if required.
+        """
+        if not isinstance(prior, Prior):
+            raise ValueError("prior invalid! Should be an instance of drex.base.Prior.")
+        if isinstance(prior, UnprocessedPrior) or prior.distribution_type() != self.distribution_type:
+            raise ValueError("prior invalid! Should be a processed prior of distribution {}."
+                             .format(self.distribution_type.value))
+        if not (memory >= 2):
+            raise ValueError("memory invalid! Value must be greater than or equal 2.")
+        if not (maxhyp >= 1):
+            raise ValueError("maxhyp invalid! Value must be greater than or equal 1.")
+        if not (0 < predscale <= 1):
+            raise ValueError("predscale invalid! Value must be in range (0,1].")
+
+        self.prior = prior
+        self.feature_count = prior.feature_count()
+        self.D = int(prior.D_value())
+        self.hazard = float(hazard)
+        self.obsnz = np.broadcast_to(np.asarray(obsnz, dtype=float), (self.feature_count,)).copy()
+        self.memory = memory
+        self.maxhyp = maxhyp
+        self.predscale = float(predscale)
+
+        capacity = max(1, int(min(capacity, memory)))
+        self._prior_params = self._initial_params()
+        self.params: Dict[str, np.ndarray] = {
+            name: np.zeros((capacity,) + value.shape, dtype=float) for name, value in self._prior_params.items()
+        }
+        self.beliefs = np.zeros(capacity)
+        self.count = 0
+        self.observations = np.zeros((self.D, self.feature_count))  # the D most recent observations, the newest last
+        self.time = 0
+
+        self._append_prior()
+        self.beliefs[0] = 1
+
+    @abstractmethod
+    def _initial_params(self) -> Dict[str, np.ndarray]:
+        """
+        Return the sufficient statistics of a new hypothesis, derived from the prior.
+        Each array is stored with an additional leading slot axis.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _update(self, params: Dict[str, np.ndarray], history: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Return the sufficient statistics after observing the most recent element of history.
+
+        Parameters
+        ----------
+        params
+            Sufficient statistics of the hypotheses to update, each with leading slot axis
+        history
+            The (up to D) most recent observations, including the new one, shape: (time, feature)
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _pdf(self, params: Dict[str, np.ndarray], history: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """
+        Return the predictive probability densities of each hypothesis.
+
+        Parameters
+        ----------
+        params
+            Sufficient statistics of the hypotheses, each with leading slot axis
+        history
+            The (up to D) most recent observations, shape: (time, feature)
+        values
+            Values to evaluate, shape: (feature, value)
+
+        Returns
+        -------
+        np.ndarray
+            Densities, shape: (slot, feature, value)
+        """
+        raise NotImplementedError
+
+    def _reserve(self, capacity: int):
+        if capacity <= len(self.beliefs):
+            return
+        capacity = max(capacity, 2 * len(self.beliefs))
+        for name, values in self.params.items():
+            self.params[name] = np.concatenate([values, np.zeros((capacity - len(values),) + values.shape[1:])])
+        self.beliefs = np.concatenate([self.beliefs, np.zeros(capacity - len(self.beliefs))])
+
+    def _append_prior(self):
+        self._reserve(self.count + 1)
+        for name, value in self._prior_params.items():
+            self.params[name][self.count] = value
+        self.count += 1
+
+    def _drop_oldest(self):
+        for values in self.params.values():
+            values[:self.count - 1] = values[1:self.count]
+            values[self.count - 1] = 0
+        self.beliefs[:self.count - 1] = self.beliefs[1:self.count]
+        self.beliefs[self.count - 1] = 0
+        self.count -= 1
+
+    def _clear_oldest(self):
+        for values in self.params.values():
+            values[0] = 0
+        self.beliefs[0] = 0
+
+    def _prune(self):
+        """
+        Apply memory and maxhyp to the hypotheses (after a new hypothesis was appended).
+        """
+        if self.count > self.memory:
+            self._drop_oldest()
+        if self.count == self.memory:
+            self._clear_oldest()
+        active = np.flatnonzero(self.beliefs[:self.count])
+        if len(active) > self.maxhyp:
+            weakest = active[np.argsort(self.beliefs[active], kind="stable")[:len(active) - int(self.maxhyp)]]
+            self.beliefs[weakest] = 0
+        self.beliefs[:self.count] /= self.beliefs[:self.count].sum()
+
+    def _active_params(self, active: np.ndarray) -> Dict[str, np.ndarray]:
+        return {name: values[active] for name, values in self.params.items()}
+
+    def _history(self) -> np.ndarray:
+        return self.observations[max(0, self.D - self.time):]
+
+    def predict(self, values: np.ndarray) -> np.ndarray:
+        """
+        Return the marginal predictive probability densities (over all hypotheses) of the next observation.
+
+        Parameters
+        ----------
+        values
+            Values to evaluate, shape: (feature, value)
+
+        Returns
+        -------
+        np.ndarray
+            Densities, shape: (feature, value)
+        """
+        active = np.flatnonzero(self.beliefs[:self.count])
+        pdf = self._pdf(self._active_params(active), self._history(), np.asarray(values, dtype=float))
+        return np.einsum("s,sfv->fv", self.beliefs[active], pdf)
+
+    def step(self, observation: np.ndarray, hazard: float = None) -> dict:
+        """
+        Process the next observation: compute its surprisal, update the context beliefs and the hypotheses.
+
+        Parameters
+        ----------
+        observation
+            Observation, shape: (feature,)
+        hazard
+            Hazard rate of this time step. If None, the engine's hazard rate is used.
+
+        Returns
+        -------
+        dict
+            surprisal (shape: (feature,)), joint_surprisal (float)
+        """
+        hazard = self.hazard if hazard is None else float(hazard)
+        observation = np.asarray(observation, dtype=float).reshape(self.feature_count)
+
+        active = np.flatnonzero(self.beliefs[:self.count])
+        beliefs = self.beliefs[active]
+        params = self._active_params(active)
+
+        likelihood = self._pdf(params, self._history(), observation[:, None])[:, :, 0] * self.predscale
+        joint_likelihood = likelihood.prod(axis=1)
+        evidence = beliefs @ joint_likelihood
+        results = {
+            "surprisal": -np.log2(beliefs @ likelihood),
+            "joint_surprisal": -np.log2(evidence)
+        }
+
+        # Observe
+        self.observations[:-1] = self.observations[1:]
+        self.observations[-1] = observation
+        self.time += 1
+
+        # Context beliefs: either the context continues, or a new context starts
+        self.beliefs[active] = beliefs * joint_likelihood * (1 - hazard)
+        for name, values in self._update(params, self._history()).items():
+            self.params[name][active] = values
+        self._append_prior()
+        self.beliefs[self.count - 1] = hazard * evidence
+        self._prune()
+
+        return results
+
+    def context_beliefs(self) -> np.ndarray:
+        """
+        Return the current context beliefs, shape: (hypothesis,), the oldest hypothesis first.
+        """
+        return self.beliefs[:self.count].copy()
+
+
+class GaussianEngine(DREXEngine):
+    """
+    D-REX with Gaussian hypotheses, modelling the temporal dependence of D successive observations.
+
+    The sufficient statistics of each hypothesis are mean (mu), scatter matrix (ss), and number of observations (n).
+    The predictive distribution of the next observation is a Student's t-distribution, conditioned on the D-1
+    preceding observations.
+    """
+    distribution_type = DistributionType.GAUSSIAN
+
+    def _initial_params(self) -> Dict[str, np.ndarray]:
+        return {
+            "mu": np.array(self.prior.means, dtype=float),  # (feature, D)
+            "ss": np.array(self.prior.covariance, dtype=float),  # (feature, D, D)
+            "n": np.array(self.prior.n, dtype=float)  # (feature,)
+        }
+
+    def _update(self, params: Dict[str, np.ndarray], history: np.ndarray) -> Dict[str, np.ndarray]:
+        if len(history) < self.D:  # not enough observations for a D-dimensional observation yet
+            return params
+        x = history[-self.D:].T  # (feature, D)
+        mu, ss, n = params["mu"], params["ss"], params["n"]
+
+        delta = x - mu
+        updated_n = n + 1
+        return {
+            "mu": mu + delta / updated_n[..., None],
+            "ss": ss + (n / updated_n)[..., None, None] * delta[..., :, None] * delta[..., None, :],
+            "n": updated_n
+        }
+
+    def _pdf(self, params: Dict[str, np.ndarray], history: np.ndarray, values: np.ndarray) -> np.ndarray:
+        mu, ss, n = params["mu"], params["ss"], params["n"]
+        k = min(self.D - 1, len(history))  # number of preceding observations to condition on
+        cov = ss * ((n + 1) / n ** 2)[..., None, None]
+
+        loc = mu[..., -1]
+        scale = cov[..., -1, -1]
+        if k > 0:
+            given = slice(self.D - 1 - k, self.D - 1)
+            cov_given = cov[..., given, given]  # (slot, feature, k, k)
+            cov_cross = cov[..., -1, given]  # (slot, feature, k)
+            delta = history[-k:].T - mu[..., given]  # (slot, feature, k)
+            weights = np.linalg.solve(cov_given, cov_cross[..., None])[..., 0]
+            mahalanobis = np.einsum("...i,...i", delta, np.linalg.solve(cov_given, delta[..., None])[..., 0])
+            loc = loc + np.einsum("...i,...i", weights, delta)
+            scale = (scale - np.einsum("...i,...i", weights, cov_cross)) * (1 + mahalanobis / n)
+        scale = scale + self.obsnz
+
+        return student_t_pdf(values[None, :, :], n[..., None], loc[..., None], scale[..., None])
+
+
+class LognormalEngine(GaussianEngine):
+    """
+    D-REX with log-normal hypotheses, i.e., Gaussian hypotheses of the logarithm of the observations.
+    The prior's parameters refer to the logarithm of the observations.
+    """
+    distribution_type = DistributionType.LOGNORMAL
+
+    def _update(self, params: Dict[str, np.ndarray], history: np.ndarray) -> Dict[str, np.ndarray]:
+        return super()._update(params, np.log(history))
+
+    def _pdf(self, params: Dict[str, np.ndarray], history: np.ndarray, values: np.ndarray) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pdf = super()._pdf(params, np.log(history), np.log(values)) / values[None, :, :]
+        return np.where(values[None, :, :] > 0, pdf, 0)
+
+
+class GmmEngine(DREXEngine):
+    """
+    D-REX with hypotheses being Gaussian mixture models (of single observations, i.e., D=1).
+
+    The sufficient statistics of each component are mean (mu), variance (sigma), number of observations (n), and
+    its share of all observations (sp, pi). An observation is assigned to the component which explains it best.
+    If no component explains it with a probability density of at least beta, a new component is created (up to
+    max_ncomp components).
+    """
+    distribution_type = DistributionType.GMM
+
+    def __init__(self, prior: GmmPrior, *args, max_ncomp: int = 10, beta: float = 0.001, **kwargs):
+        if not max_ncomp >= 1:
+            raise ValueError("max_ncomp invalid! Value must be greater than or equal 1.")
+        self.max_ncomp = int(max(max_ncomp, np.max(prior.k)))
+        self.beta = float(beta)
+        super().__init__(prior, *args, **kwargs)
+
+    def _initial_params(self) -> Dict[str, np.ndarray]:
+        params = {"k": np.array(self.prior.k, dtype=float)}  # (feature,)
+        for name, values in [("mu", self.prior.means), ("sigma", self.prior.covariance), ("n", self.prior.n),
+                             ("sp", self.prior.sp)]:
+            values = np.nan_to_num(np.asarray(values, dtype=float))[:, :self.max_ncomp]
+            params[name] = np.zeros((self.feature_count, self.max_ncomp))  # (feature, component)
+            params[name][:, :values.shape[1]] = values
+        return params
+
+    def _component_pdf(self, params: Dict[str, np.ndarray], values: np.ndarray) -> np.ndarray:
+        """
+        Return the probability densities of each component, shape: (slot, feature, component, value).
+        """
+        exists = np.arange(self.max_ncomp) < params["k"][..., None]  # (slot, feature, component)
+        n = np.where(exists, params["n"], 1)
+        sigma = np.where(exists, params["sigma"], 1) + self.obsnz[:, None]
+        pdf = student_t_pdf(values[None, :, None, :], n[..., None], params["mu"][..., None], sigma[..., None])
+        return np.where(exists[..., None], pdf, 0)
+
+    def _weights(self, params: Dict[str, np.ndarray]) -> np.ndarray:
+        return params["sp"] / params["sp"].sum(axis=-1, keepdims=True)
+
+    def _update(self, params: Dict[str, np.ndarray], history: np.ndarray) -> Dict[str, np.ndarray]:
+        x = history[-1]  # (feature,)
+        mu, sigma, n, sp, k = (params[name].copy() for name in ["mu", "sigma", "n", "sp", "k"])
+
+        weighted_pdf = self._weights(params) * self._component_pdf(params, x[:, None])[..., 0]
+        component = np.argmax(weighted_pdf, axis=-1)  # (slot, feature)
+        is_new = (weighted_pdf.max(axis=-1) < self.beta) & (k < self.max_ncomp)
+        component = np.where(is_new, k, component).astype(int)
+
+        slots, features = np.indices(component.shape)
+        c = (slots, features, component)
+        x = np.broadcast_to(x, component.shape)
+        # A new component starts with the prior's variance
+        mu[c] = np.where(is_new, x, mu[c])
+        sigma[c] = np.where(is_new, self._prior_params["sigma"][features, 0], sigma[c])
+        n[c] = np.where(is_new, 0, n[c])
+        sp[c] = np.where(is_new, 0, sp[c])
+        k = k + is_new
+
+        delta = x - mu[c]
+        updated_n = n[c] + 1
+        mu[c] = mu[c] + delta / updated_n
+        sigma[c] = np.where(is_new, sigma[c], (n[c] * sigma[c] + n[c] / updated_n * delta ** 2) / updated_n)
+        n[c] = np.where(is_new, 1, updated_n)
+        sp[c] = sp[c] + 1
+        return {"mu": mu, "sigma": sigma, "n": n, "sp": sp, "k": k}
+
+    def _pdf(self, params: Dict[str, np.ndarray], history: np.ndarray, values: np.ndarray) -> np.ndarray:
+        return np.einsum("sfc,sfcv->sfv", self._weights(params), self._component_pdf(params, values))
+
+
+class PoissonEngine(DREXEngine):
+    """
+    D-REX with Poisson hypotheses of the sum of the D most recent observations (e.g., event counts).
+
+    The sufficient statistics of each hypothesis are the mean of the sums (lambda), and the number of observations
+    (n). The predictive distribution of the next sum is a Poisson distribution.
+    """
+    distribution_type = DistributionType.POISSON
+
+    def _initial_params(self) -> Dict[str, np.ndarray]:
+        return {
+            "lambda": np.array(self.prior.lambd, dtype=float),  # (feature,)
+            "n": np.array(self.prior.n, dtype=float)  # (feature,)
+        }
+
+    def _update(self, params: Dict[str, np.ndarray], history: np.ndarray) -> Dict[str, np.ndarray]:
+        y = history[-self.D:].sum(axis=0)
+        updated_n = params["n"] + 1
+        return {
+            "lambda": (params["n"] * params["lambda"] + y) / updated_n,
+            "n": updated_n
+        }
+
+    def _pdf(self, params: Dict[str, np.ndarray], history: np.ndarray, values: np.ndarray) -> np.ndarray:
+        y = history[max(0, len(history) - self.D + 1):].sum(axis=0)[:, None] + values  # (feature, value)
+        rate = params["lambda"][..., None]
+        with np.errstate(divide="ignore"):
+            log_pmf = y * np.log(rate) - rate - gammaln(y + 1)
+        return np.exp(log_pmf)
+
+
+def student_t_pdf(x: np.ndarray, dof: np.ndarray, loc: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """
+    Return the probability density of Student's t-distribution (element-wise, with broadcasting).
+
+    Parameters
+    ----------
+    x
+        Values to evaluate
+    dof
+        Degrees of freedom
+    loc
+        Location
+    scale
+        Squared scale
+
+    Returns
+    -------
+    np.ndarray
+        Densities
+    """
+    log_pdf = gammaln((dof + 1) / 2) - gammaln(dof / 2) - 0.5 * np.log(dof * np.pi * scale) \
+        - (dof + 1) / 2 * np.log1p((x - loc) ** 2 / (dof * scale))
+    return np.exp(log_pdf)
+
+
+def jensen_shannon_divergence(p: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """
+    Return the Jensen-Shannon divergence (in bits) between distributions, along the first axis.
+    """
+    m = (p + q) / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kl_p = np.where(p > 0, p * np.log2(p / m), 0).sum(axis=0)
+        kl_q = np.where(q > 0, q * np.log2(q / m), 0).sum(axis=0)
+    return (kl_p + kl_q) / 2
+
+
+def belief_dynamics(context_beliefs: np.ndarray, hazard: Union[float, np.ndarray]) -> np.ndarray:
+    """
+    Port of D-REX's post_DREX_beliefdynamics.m: the divergence between the context beliefs after each observation
+    and the context beliefs as expected before that observation.
+
+    Parameters
+    ----------
+    context_beliefs
+        Context beliefs, shape: (hypothesis, time+1)
+    hazard
+        Hazard rate: scalar or one value per time step
+
+    Returns
+    -------
+    np.ndarray
+        Belief dynamics, shape: (time+1,), where the first value is 0
+    """
+    hypotheses, times = context_beliefs.shape
+    hazard = np.broadcast_to(np.asarray(hazard, dtype=float), (times - 1,))
+
+    expected = np.zeros_like(context_beliefs, dtype=float)
+    expected[:, 1:] = context_beliefs[:, :-1] * (1 - hazard)
+    new_hypothesis = np.arange(1, min(hypotheses, times))
+    expected[new_hypothesis, new_hypothesis] += hazard[new_hypothesis - 1]
+
+    results = np.zeros(times)
+    results[1:] = jensen_shannon_divergence(context_beliefs[:, 1:], expected[:, 1:])
+    return results
+
+
+def change_decision(context_beliefs: np.ndarray, threshold: float) -> (float, np.ndarray):
+    """
+    Port of D-REX's post_DREX_changedecision.m.
+
+    Parameters
+    ----------
+    context_beliefs
+        Context beliefs, shape: (hypothesis, time+1)
+    threshold
+        Change probability above which a change is detected
+
+    Returns
+    -------
+    (float, np.ndarray)
+        Changepoint (1-based index into the time+1 axis, or float('nan') if no change was detected), and change
+        probability, shape: (time+1,)
+    """
+    change_probability = 1 - context_beliefs[0]
+    changes = np.flatnonzero(change_probability > threshold)
+    changepoint = float(changes[0] + 1) if len(changes) > 0 else float("nan")
+    return changepoint, change_probability
+
+
+ENGINES = {
+    DistributionType.GAUSSIAN: GaussianEngine,
+    DistributionType.LOGNORMAL: LognormalEngine,
+    DistributionType.GMM: GmmEngine,
+    DistributionType.POISSON: PoissonEngine
+}
+
+
+def create_engine(prior: Prior, hazard: float = 0.01, obsnz: Union[float, List[float]] = 0,
+                  memory: Union[int, float] = np.inf, maxhyp: Union[int, float] = np.inf, predscale: float = 0.001,
+                  max_ncomp: int = None, beta: float = None, prior_cache: PriorCache = None,
+                  capacity: int = 64) -> DREXEngine:
+    """
+    Return the engine for the prior's distribution. An unprocessed prior is processed first.
+
+    Parameters
+    ----------
+    prior
+        (Un)processed prior
+    hazard, obsnz, memory, maxhyp, predscale, capacity
+        See DREXEngine
+    max_ncomp, beta
+        Relevant for GMM priors. If None, the engine's default value is used.
+    prior_cache
+        Relevant for unprocessed priors. Cache used to estimate the processed prior. If None, the in-memory cache of
+        the current process is used.
+
+    Returns
+    -------
+    DREXEngine
+        Engine
+    """
+    if isinstance(prior, UnprocessedPrior):
+        prior_cache = prior_cache if prior_cache is not None else PriorCache.default()
+        prior = prior_cache.get(prior, max_ncomp if max_ncomp is not None else 10)
+    if prior.distribution_type() not in ENGINES:
+        raise ValueError("prior invalid! The native backend does not support distribution {}."
+                         .format(prior.distribution_type().value))
+
+    kwargs = dict()
+    if prior.distribution_type() == DistributionType.GMM:
+        if max_ncomp is not None:
+            kwargs["max_ncomp"] = max_ncomp
+        if beta is not None:
+            kwargs["beta"] = beta
+    return ENGINES[prior.distribution_type()](prior, hazard, obsnz, memory, maxhyp, predscale, capacity=capacity,
+                                              **kwargs)
+
+
+def run_native_model(instructions_file: DREXInstructionsFile,
+                     instructions_file_path: Union[str, Path] = None,
+                     prior_cache: PriorCache = None) -> DREXResultsFile:
+    """
+    Run D-REX as described by the instructions file in-process, i.e., without MATLAB.
+
+    Parameters
+    ----------
+    instructions_file
+        Instructions file object
+    instructions_file_path
+        Path of the instructions file (if any), which is referenced by the results
+    prior_cache
+        Relevant for unprocessed priors. Cache used to estimate the processed prior. If None, the in-memory cache of
+        the current process is used.
+
+    Returns
+    -------
+    DREXResultsFile
+        Results held in memory
+    """
+    input_sequence = np.array(instructions_file.input_sequence[0], dtype=float)  # (time, feature)
+    [times, features] = input_sequence.shape
+    hazard = np.broadcast_to(np.asarray(instructions_file.hazard, dtype=float).flatten(), (times,))
+    threshold = instructions_file.change_decision_threshold
+    threshold = 0.01 if threshold is None else threshold
+
+    engine = create_engine(instructions_file.prior, hazard[0], instructions_file.obsnz, instructions_file.memory,
+                           instructions_file.maxhyp, instructions_file.predscale, instructions_file.max_ncomp,
+                           instructions_file.beta, prior_cache, capacity=min(instructions_file.memory, times + 1))
+    prior = engine.prior
+    # Like post_DREX_prediction.m, compute the marginal predictive distribution for continuous distributions only
+    with_psi = prior.distribution_type() != DistributionType.POISSON
+
+    # Positions of the marginal predictive distribution: all observed values, per feature
+    positions = [np.unique(input_sequence[:, f]) for f in range(features)]
+    position_values = np.array([np.pad(p, (0, max(map(len, positions)) - len(p)), mode="edge") for p in positions])
+
+    surprisal = np.zeros((times, features))
+    joint_surprisal = np.zeros(times)
+    context_beliefs = np.zeros((int(min(instructions_file.memory, times + 1)), times + 1))
+    context_beliefs[0, 0] = 1
+    predictions = np.zeros((features, times, position_values.shape[1]))
+    for t in range(times):
+        if with_psi:
+            predictions[:, t] = engine.predict(position_values)
+        results = engine.step(input_sequence[t], hazard[t])
+        surprisal[t] = results["surprisal"]
+        joint_surprisal[t] = results["joint_surprisal"]
+        context_beliefs[:engine.count, t + 1] = engine.context_beliefs()
+
+    changepoint, change_probability = change_decision(context_beliefs, threshold)
+    if with_psi:
+        psi = DREXResultsFilePsi({f: predictions[f, :, :len(positions[f])] for f in range(features)},
+                                 {f: positions[f] for f in range(features)})
+    else:
+        psi = DREXResultsFilePsi({}, {})
+
+    return DREXResultsFile(str(instructions_file_path) if instructions_file_path is not None else "",
+                           input_sequence, prior, surprisal, joint_surprisal, context_beliefs,
+                           belief_dynamics(context_beliefs, hazard), changepoint, change_probability,
+                           threshold, psi)
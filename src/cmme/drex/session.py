@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from typing import List, Union
+
+import numpy as np
+
+from .base import Prior
+from .native import create_engine, jensen_shannon_divergence
+from .suffstat import PriorCache
+
+
+class DREXSession:
+    """
+    Online D-REX: observations are processed one at a time, as they arrive (e.g., from a live feature stream).
+
+    Each observation yields the same quantities as the corresponding time step of a DREXResultsFile: surprisal,
+    joint surprisal, belief dynamics, and change probability. The session keeps the current hypotheses and the D most
+    recent observations only. Thus, with finite memory, its memory use is constant.
+    """
+
+    def __init__(self, prior: Prior, hazard: float = 0.01, obsnz: Union[float, List[float]] = 0,
+                 memory: Union[int, float] = np.inf, maxhyp: Union[int, float] = np.inf, predscale: float = 0.001,
+                 change_decision_threshold: float = 0.01, max_ncomp: int = 10, beta: float = 0.001,
+                 prior_cache: PriorCache = None):
+        """
+        Parameters
+        ----------
+        prior
+            (Un)processed prior. An unprocessed prior is processed on construction.
+        hazard
+            Default hazard rate, used unless observe receives a hazard rate
+        obsnz
+            Observation noise: scalar or one value per feature
+        memory
+            Number of most-recent hypotheses to calculate
+        maxhyp
+            Number of hypotheses to calculate at every time step
+        predscale
+            Scaling of probability densities to probabilities
+        change_decision_threshold
+            Change probability above which a change is detected
+        max_ncomp
+            Relevant for GMM priors. Maximum number of components
+        beta
+            Relevant for GMM priors. Threshold for adding a new component
+        prior_cache
+            Relevant for unprocessed priors. If None, the in-memory cache of the current process is used.
+        """
+        if not 0 <= change_decision_threshold <= 1:
+            raise ValueError("change_decision_threshold invalid! Value must be in range [0,1].")
+
+        self.engine = create_engine(prior, hazard, obsnz, memory, maxhyp, predscale, max_ncomp, beta, prior_cache)
+        self.change_decision_threshold = change_decision_threshold
+        self.change_decision_changepoint = float("nan")
+
+    @property
+    def prior(self) -> Prior:
+        return self.engine.prior
+
+    @property
+    def time(self) -> int:
+        """
+        Number of observations so far.
+        """
+        return self.engine.time
+
+    def observe(self, x: Union[float, List[float], np.ndarray], hazard: float = None) -> dict:
+        """
+        Process the next observation.
+
+        Parameters
+        ----------
+        x
+            Observation: scalar, or one value per feature
+        hazard
+            Hazard rate of this time step. If None, the session's hazard rate is used.
+
+        Returns
+        -------
+        dict
+            surprisal (shape: (feature,)), joint_surprisal (float), belief_dynamics (float),
+            change_decision_probability (float), and change_decision_changepoint (float, see DREXResultsFile)
+        """
+        engine = self.engine
+        hazard = engine.hazard if hazard is None else float(hazard)
+        count = engine.count
+        previous_beliefs = engine.beliefs[:count] * (1 - hazard)
+
+        results = engine.step(np.asarray(x, dtype=float), hazard)
+
+        # Context beliefs as expected before the observation: either the context continues, or a new context starts
+        expected_beliefs = np.zeros(engine.count)
+        if engine.count == count:  # the oldest hypothesis was dropped, i.e., all hypotheses moved by one slot
+            expected_beliefs[:count - 1] = previous_beliefs[1:]
+        else:
+            expected_beliefs[:count] = previous_beliefs
+        expected_beliefs[-1] += hazard
+        results["belief_dynamics"] = float(jensen_shannon_divergence(engine.context_beliefs(), expected_beliefs))
+
+        results["change_decision_probability"] = float(1 - engine.beliefs[0])
+        if np.isnan(self.change_decision_changepoint) and \
+                results["change_decision_probability"] > self.change_decision_threshold:
+            self.change_decision_changepoint = float(engine.time + 1)  # 1-based index into the time+1 axis
+        results["change_decision_changepoint"] = self.change_decision_changepoint
+        return results
+
+    def predict(self, values: np.ndarray) -> np.ndarray:
+        """
+        Return the marginal predictive probability densities of the next observation (cf. DREXResultsFile.psi).
+
+        Parameters
+        ----------
+        values
+            Values to evaluate, shape: (feature, value)
+
+        Returns
+        -------
+        np.ndarray
+            Densities, shape: (feature, value)
+        """
+        return self.engine.predict(values)
+
+    def context_beliefs(self) -> np.ndarray:
+        """
+        Return the current context beliefs, shape: (hypothesis,), the oldest hypothesis first.
+        """
+        return self.engine.context_beliefs()
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Union
+
+import numpy as np
+
+from .base import DistributionType, Prior, UnprocessedPrior, GaussianPrior, LognormalPrior, GmmPrior, PoissonPrior
+from .binding import prior_to_arrays, prior_from_arrays
+
+
+def _trials_of_feature(prior: UnprocessedPrior, feature: int) -> List[np.ndarray]:
+    return [np.asarray(trial, dtype=float).reshape(len(trial), -1)[:, feature] for trial in prior.prior_input_sequence]
+
+
+def _pooled_autocovariance(trials: List[np.ndarray], max_lag: int) -> (float, np.ndarray):
+    """
+    Return the mean of the trial means, and the autocovariance for lags 0, ..., max_lag. The autocovariance of each
+    trial (normalized by the number of products) is pooled across trials, weighted by the trials' lengths.
+    """
+    lengths = np.array([len(trial) for trial in trials])
+    values = np.concatenate(trials)
+    trial_idx = np.repeat(np.arange(len(trials)), lengths)
+
+    trial_means = np.bincount(trial_idx, values, minlength=len(trials)) / lengths
+    centered = values - trial_means[trial_idx]
+
+    autocovariance = np.zeros(max_lag + 1)
+    for lag in range(max_lag + 1):
+        same_trial = trial_idx[:len(values) - lag] == trial_idx[lag:]
+        products = np.bincount(trial_idx[lag:][same_trial],
+                               (centered[:len(values) - lag] * centered[lag:])[same_trial], minlength=len(trials))
+        has_products = lengths > lag
+        autocovariance[lag] = (lengths[has_products] * products[has_products] / (lengths[has_products] - lag)).sum() \
+            / lengths[has_products].sum()
+    return trial_means.mean(), autocovariance
+
+
+def _estimate_gaussian(prior: UnprocessedPrior, transform=None) -> (np.ndarray, np.ndarray, np.ndarray):
+    D = int(prior.D_value())
+    means = np.zeros((prior.feature_count(), D))
+    covariance = np.zeros((prior.feature_count(), D, D))
+    for f in range(prior.feature_count()):
+        trials = _trials_of_feature(prior, f)
+        if transform is not None:
+            trials = [transform(trial) for trial in trials]
+        mean, autocovariance = _pooled_autocovariance(trials, D - 1)
+        means[f] = mean
+        lags = np.abs(np.arange(D)[:, None] - np.arange(D)[None, :])
+        covariance[f] = autocovariance[lags]  # Toeplitz matrix
+    return means, covariance, np.full(prior.feature_count(), D)
+
+
+def _estimate_gmm(prior: UnprocessedPrior, max_ncomp: int) -> GmmPrior:
+    shape = (prior.feature_count(), max_ncomp)
+    means, covariance, n = np.full(shape, np.nan), np.full(shape, np.nan), np.full(shape, np.nan)
+    pi, sp = np.zeros(shape), np.zeros(shape)
+    for f in range(prior.feature_count()):
+        mean, autocovariance = _pooled_autocovariance(_trials_of_feature(prior, f), 0)
+        means[f, 0], covariance[f, 0], n[f, 0], pi[f, 0], sp[f, 0] = mean, autocovariance[0], 1, 1, 1
+    return GmmPrior(means, covariance, n, pi, sp, np.ones(prior.feature_count(), dtype=int))
+
+
+def _estimate_poisson(prior: UnprocessedPrior) -> PoissonPrior:
+    D = int(prior.D_value())
+    lambd = np.zeros(prior.feature_count())
+    for f in range(prior.feature_count()):
+        # Sums over non-overlapping windows of D observations
+        sums = np.concatenate([trial[:len(trial) // D * D].reshape(-1, D).sum(axis=1)
+                               for trial in _trials_of_feature(prior, f)])
+        if len(sums) == 0:
+            raise ValueError("prior invalid! There must be at least one trial with D or more observations.")
+        lambd[f] = sums.mean()
+    return PoissonPrior(lambd, np.ones(prior.feature_count()), D)
+
+
+def estimate_suffstat(prior: UnprocessedPrior, max_ncomp: int = 10) -> Prior:
+    """
+    In-process implementation of D-REX's estimate_suffstat.m: estimate the processed prior of an unprocessed prior.
+
+    Parameters
+    ----------
+    prior
+        Unprocessed prior
+    max_ncomp
+        Maximum number of components (relevant for GMM priors)
+
+    Returns
+    -------
+    Prior
+        GaussianPrior, LognormalPrior, GmmPrior, or PoissonPrior
+    """
+    if not isinstance(prior, UnprocessedPrior):
+        raise ValueError("prior invalid! Should be an instance of drex.base.UnprocessedPrior.")
+
+    distribution = prior.distribution_type()
+    if distribution == DistributionType.GAUSSIAN:
+        return GaussianPrior(*_estimate_gaussian(prior))
+    elif distribution == DistributionType.LOGNORMAL:
+        return LognormalPrior(*_estimate_gaussian(prior, np.log))
+    elif distribution == DistributionType.GMM:
+        return _estimate_gmm(prior, max_ncomp)
+    elif distribution == DistributionType.POISSON:
+        return _estimate_poisson(prior)
+    raise ValueError("prior invalid! Distribution {} is not supported.".format(distribution))
+
+
+class PriorCache:
+    """
+    Cache of processed priors, addressed by the content of the unprocessed prior (distribution, D, prior input
+    sequence), such that the same prior input sequence is estimated only once.
+
+    Processed priors are kept in memory, and, if a directory is specified, persisted as .npz files to be reused
+    across processes.
+    """
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, directory: Union[str, Path] = None):
+        """
+        Parameters
+        ----------
+        directory
+            Where to persist processed priors. If None, priors are cached in memory only.
+        """
+        self.directory = Path(directory) if directory is not None else None
+        self._priors: Dict[str, Prior] = dict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> PriorCache:
+        """
+        Return the in-memory cache which is shared within the current process.
+        """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = PriorCache()
+            return cls._default
+
+    def __len__(self):
+        return len(self._priors)
+
+    @staticmethod
+    def key(prior: UnprocessedPrior, max_ncomp: int = 10) -> str:
+        """
+        Return the content hash of an unprocessed prior.
+
+        Parameters
+        ----------
+        prior
+            Unprocessed prior
+        max_ncomp
+            Maximum number of components (relevant for GMM priors)
+
+        Returns
+        -------
+        str
+            Hexadecimal SHA-256 digest
+        """
+        digest = hashlib.sha256()
+        digest.update("{}|{}|{}".format(prior.distribution_type().value, prior.D_value(),
+                                        max_ncomp if prior.distribution_type() == DistributionType.GMM else "")
+                      .encode())
+        for trial in prior.prior_input_sequence:
+            trial = np.ascontiguousarray(trial, dtype=np.float64)
+            digest.update(np.array(trial.shape, dtype=np.int64).tobytes())
+            digest.update(trial.tobytes())
+        return digest.hexdigest()
+
+    def _file_path(self, key: str) -> Path:
+        return self.directory / "{}.npz".format(key)
+
+    def _save(self, key: str, prior: Prior):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        np.savez(self._file_path(key), **prior_to_arrays(prior))
+
+    def _load(self, key: str) -> Union[Prior, None]:
+        if self.directory is None or not self._file_path(key).exists():
+            return None
+        with np.load(self._file_path(key)) as arrays:
+            return prior_from_arrays(dict(arrays))
+
+    def get(self, prior: UnprocessedPrior, max_ncomp: int = 10) -> Prior:
+        """
+        Return the processed prior. It is estimated only if it is not cached yet.
+
+        Parameters
+        ----------
+        prior
+            Unprocessed prior
+        max_ncomp
+            Maximum number of components (relevant for GMM priors)
+
+        Returns
+        -------
+        Prior
+            Processed prior
+        """
+        key = PriorCache.key(prior, max_ncomp)
+        with self._lock:
+            if key in self._priors:
+                return self._priors[key]
+        processed_prior = self._load(key)
+        if processed_prior is None:
+            processed_prior = estimate_suffstat(prior, max_ncomp)
+            if self.directory is not None:
+                self._save(key, processed_prior)
+        with self._lock:
+            return self._priors.setdefault(key, processed_prior)
+
+    def clear(self):
+        """
+        Remove all priors from memory (persisted priors are kept).
+        """
+        with self._lock:
+            self._priors.clear()
@@ -1,7 +1,12 @@
+from __future__ import annotations
+
+import collections
 import threading
 import time
+from concurrent.futures import Future
 from datetime import datetime
 from pathlib import Path
+from typing import List, Union
 
 import matlab.engine
 from pymatbridge import pymatbridge
@@ -21,19 +26,10 @@ class MatlabWorker:
     def run_model(instructions_file_path: Path):
         """
         Triggers the execution of the wrapper script, running D-REX's run_DREX_model.m function.
-        :return: dictionary with MATLAB output
+        Uses the default engine pool, see MatlabEnginePool.default().
+        :return: results file path
         """
-        MatlabEngineWorker.autostart_matlab()
-        try:
-            MatlabEngineWorker.matlab_work_in_progress += 1
-
-            MatlabEngineWorker.matlab_engine\
-                .addpath(str(MatlabWorker.DREX_INTERMEDIATE_SCRIPT_PATH.parent))  # load script
-            result = MatlabEngineWorker.matlab_engine\
-                .drex_intermediate_script(str(instructions_file_path))  # execute script
-        finally:
-            MatlabEngineWorker.matlab_work_in_progress -= 1
-        return result
+        return MatlabEnginePool.default().submit(instructions_file_path).result()
 
     @staticmethod
     def plot(input_file_path: Path):
@@ -49,48 +45,201 @@ class MatlabWorker:
         return result
 
 
-class MatlabEngineWorker:
-    matlab_engine = None
-    _matlab_engine_running = False
-    _matlab_last_action = None
-    matlab_work_in_progress = 0
-    _autostop_thread = None
+class MatlabEnginePool:
+    """
+    Pool of MATLAB engines, which process D-REX jobs (instructions files) concurrently.
 
-    @classmethod
-    def _start_matlab(cls):
-        if cls.matlab_engine is None:
-            cls.matlab_engine = matlab.engine.start_matlab()
-            cls._matlab_engine_running = True
-            cls._autostop_thread = threading.Thread(target=cls._autostop_matlab_thread_func)
-            cls._autostop_thread.start()
+    Engines are started on demand (up to size engines), and each engine is warmed up once, i.e., the intermediate
+    script's directory is added to MATLAB's path. Jobs are queued and dispatched to idle engines. An engine is shut down
+    once it has been idle for autostop_wait_time seconds.
+    """
+    _default_pool = None
+    _default_pool_lock = threading.Lock()
 
-    @classmethod
-    def _stop_matlab(cls):
-        if cls.matlab_engine is not None:
-            cls.matlab_engine.exit()
-            cls._matlab_engine_running = False
-            cls.matlab_engine = None
+    def __init__(self, size: int = 1, autostop_wait_time: float = MatlabWorker.AUTOSTOP_WAIT_TIME):
+        """
+        Parameters
+        ----------
+        size
+            Maximum number of engines
+        autostop_wait_time
+            Idle time (seconds) after which an engine is shut down
+        """
+        if not size >= 1:
+            raise ValueError("size invalid! Value must be greater than or equal 1.")
 
-    @classmethod
-    def restart_matlab(cls):
-        cls._stop_matlab()
-        cls._start_matlab()
+        self.size = size
+        self.autostop_wait_time = autostop_wait_time
 
-    @classmethod
-    def autostart_matlab(cls):
-        cls._matlab_last_action = datetime.now()
-        if cls._matlab_engine_running is not True:
-            cls._start_matlab()
+        self._condition = threading.Condition()
+        self._jobs = collections.deque()
+        self._engines_count = 0
+        self._idle_engines_count = 0
+        self._threads = []
+        self._is_shutdown = False
 
     @classmethod
-    def _autostop_matlab_thread_func(cls):
-        sleep_time = max(MatlabWorker.AUTOSTOP_WAIT_TIME / 5.0, 1)  # seconds until next check; once every >=1s
-        while cls.matlab_engine is not None:
-            now = datetime.now()
-            if cls.matlab_work_in_progress <= 0 and\
-                    (now - cls._matlab_last_action).total_seconds() >= MatlabWorker.AUTOSTOP_WAIT_TIME:
-                cls._stop_matlab()
-            time.sleep(sleep_time)
+    def default(cls) -> MatlabEnginePool:
+        """
+        Return the pool shared by all D-REX models which do not specify a pool (with a single engine).
+
+        Returns
+        -------
+        MatlabEnginePool
+            Shared pool
+        """
+        with cls._default_pool_lock:
+            if cls._default_pool is None:
+                cls._default_pool = MatlabEnginePool()
+            return cls._default_pool
+
+    def __enter__(self) -> MatlabEnginePool:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    @property
+    def engines_count(self) -> int:
+        return self._engines_count
+
+    def submit(self, instructions_file_path: Union[str, Path]) -> Future:
+        """
+        Schedule the execution of an instructions file.
+
+        Parameters
+        ----------
+        instructions_file_path
+            Path of the instructions file
+
+        Returns
+        -------
+        Future
+            Future of the results file path
+        """
+        future = Future()
+        with self._condition:
+            if self._is_shutdown:
+                raise RuntimeError("Cannot submit jobs to a pool which has been shut down.")
+            self._jobs.append((future, str(instructions_file_path)))
+            if len(self._jobs) > self._idle_engines_count and self._engines_count < self.size:
+                self._engines_count += 1
+                thread = threading.Thread(target=self._engine_thread_func, daemon=True)
+                self._threads = [t for t in self._threads if t.is_alive()] + [thread]
+                thread.start()
+            self._condition.notify()
+        return future
+
+    def map(self, instructions_file_paths: List[Union[str, Path]]) -> List[str]:
+        """
+        Run several instructions files concurrently, and wait until all of them are processed.
+
+        Parameters
+        ----------
+        instructions_file_paths
+            Paths of the instructions files
+
+        Returns
+        -------
+        list
+            Results file paths, in the order of instructions_file_paths
+        """
+        futures = [self.submit(path) for path in instructions_file_paths]
+        return [future.result() for future in futures]
+
+    def shutdown(self, wait: bool = True):
+        """
+        Shut down all engines after the queued jobs are processed.
+
+        Parameters
+        ----------
+        wait
+            Whether to block until all engines are shut down
+        """
+        with self._condition:
+            self._is_shutdown = True
+            self._condition.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    @staticmethod
+    def _start_engine():
+        engine = matlab.engine.start_matlab()
+        engine.addpath(str(MatlabWorker.DREX_INTERMEDIATE_SCRIPT_PATH.parent))  # load script (once per engine)
+        return engine
+
+    @staticmethod
+    def _is_alive(engine) -> bool:
+        try:
+            engine.eval("1;", nargout=0)
+            return True
+        except Exception:
+            return False
+
+    def _next_job(self):
+        """
+        Wait for the next job. Returns None if this engine should be shut down, i.e., it was idle for
+        autostop_wait_time seconds, or the pool is shut down and there are no more jobs.
+        """
+        with self._condition:
+            self._idle_engines_count += 1
+            deadline = time.monotonic() + self.autostop_wait_time
+            while not self._jobs and not self._is_shutdown:
+                remaining_time = deadline - time.monotonic()
+                if remaining_time <= 0:
+                    break
+                self._condition.wait(remaining_time)
+            self._idle_engines_count -= 1
+
+            if not self._jobs:
+                self._engines_count -= 1
+                return None
+            return self._jobs.popleft()
+
+    def _fail_queued_jobs(self, exception: BaseException):
+        with self._condition:
+            if self._engines_count > 1:
+                return  # other engines will process the queued jobs
+            jobs, self._jobs = list(self._jobs), collections.deque()
+        for future, _ in jobs:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(exception)
+
+    def _engine_thread_func(self):
+        try:
+            engine = self._start_engine()
+        except Exception as e:
+            self._fail_queued_jobs(e)
+            with self._condition:
+                self._engines_count -= 1
+            return
+
+        try:
+            while (job := self._next_job()) is not None:
+                future, instructions_file_path = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(engine.drex_intermediate_script(instructions_file_path))  # execute script
+                except Exception as e:
+                    future.set_exception(e)
+                    if not self._is_alive(engine):
+                        engine = None
+                        try:
+                            engine = self._start_engine()
+                        except Exception as restart_exception:
+                            self._fail_queued_jobs(restart_exception)
+                            with self._condition:
+                                self._engines_count -= 1
+                            return
+        finally:
+            if engine is not None:
+                try:
+                    engine.exit()
+                except Exception:
+                    pass
 
 
 class PymatbridgeMatlabWorker:
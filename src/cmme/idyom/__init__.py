@@ -1,2 +1,3 @@
 from .idyom_database import *
-from .model import *
\ No newline at end of file
+from .model import *
+from .server import *
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 import pandas as pd
-from typing import Union
+import pyarrow as pa
+import pyarrow.csv
+import pyarrow.feather
+from typing import List, Union
 import re
 
 from .base import transform_viewpoints_list_to_string_list, IDYOMModelType, IDYOMViewpointSelectionBasis, \
     transform_string_list_to_viewpoints_list, IDYOMEscapeMethod
 from .util import LispExpressionBuilder, LispExpressionBuilderMode, escape_path_string
+from ..lib.compression import CompressionCodec, CompressionPolicy
 from ..lib.instructions_file import InstructionsFile
 from ..lib.results_file import ResultsFile
 from ..lib.util import path_as_string_with_trailing_slash
@@ -506,19 +511,153 @@ class IDYOMInstructionsFile(InstructionsFile):
 
 
 class IDYOMResultsFile(ResultsFile):
+    STRING_COLUMNS = ["melody.name"]
+    INTEGER_COLUMNS = ["dataset.id", "melody.id", "note.id"]
+    NULL_VALUES = ["NIL", "nil", "NA", ""]
+    SIDECAR_SUFFIX = ".feather"
+    SIDECAR_SOURCE_MTIME_KEY = b"cmme.source_mtime_ns"
+    SIDECAR_SOURCE_SIZE_KEY = b"cmme.source_size"
 
     @staticmethod
     def save(results_file: ResultsFile, file_path: Union[str, Path]):
         raise NotImplementedError
 
     @staticmethod
-    def load(file_path: Union[str, Path]) -> IDYOMResultsFile:
-        df = pd.read_csv(file_path, sep=" ")
+    def load(file_path: Union[str, Path], columns: List[str] = None, use_sidecar: bool = True) -> IDYOMResultsFile:
+        """
+        Load IDyOM's results (.dat) file.
+
+        Parameters
+        ----------
+        file_path
+            Path of the results file
+        columns
+            Columns to load, e.g., ["information.content", "entropy"]. If None, all columns are loaded.
+        use_sidecar
+            Whether to read from (and, if missing or outdated, create) a Feather sidecar of the results file
+            (see sidecar_path). Once created, (projected) loads read the sidecar only.
+
+        Returns
+        -------
+        IDYOMResultsFile
+            Results file object
+        """
+        if use_sidecar:
+            table = IDYOMResultsFile._read_sidecar(file_path, columns)
+        else:
+            table = IDYOMResultsFile.read_table(file_path, columns)
+        return IDYOMResultsFile(table.to_pandas())
 
-        unnamed_columns = df.columns.str.match("Unnamed")
-        df = df.loc[:, ~unnamed_columns]  # remove unnamed columns
+    @staticmethod
+    def schema(column_names: List[str]) -> dict:
+        """
+        Return the data type of each column: melody.name is a string, the ids are integers. Model outputs (e.g.,
+        probabilities, distributions, information content, entropy) are floats. The types of the events' basic
+        viewpoints and of the model orders are inferred.
+        """
+        unrelated_fieldnames = IDYOMResultsFile.unrelated_fieldnames()
+        column_types = dict()
+        for name in column_names:
+            if name in IDYOMResultsFile.STRING_COLUMNS:
+                column_types[name] = pa.string()
+            elif name in IDYOMResultsFile.INTEGER_COLUMNS:
+                column_types[name] = pa.int64()
+            elif (name not in unrelated_fieldnames and ".order." not in name) or \
+                    name in ["probability", "information.content", "entropy", "information.gain"]:
+                column_types[name] = pa.float64()
+        return column_types
+
+    @staticmethod
+    def read_table(file_path: Union[str, Path], columns: List[str] = None) -> pa.Table:
+        """
+        Read a results file with pyarrow's CSV reader, using an explicit schema (see schema).
+
+        Parameters
+        ----------
+        file_path
+            Path of the results file
+        columns
+            Columns to read. If None, all columns are read.
 
-        return IDYOMResultsFile(df)
+        Returns
+        -------
+        pa.Table
+            Results
+        """
+        with open(file_path) as f:
+            raw_column_names = f.readline().rstrip("\r\n").split(" ")
+        # Unnamed columns (due to trailing separators) get placeholder names, and are not read
+        column_names = [name if name != "" else "__unnamed_{}".format(idx) for idx, name in enumerate(raw_column_names)]
+        named_columns = [name for name in raw_column_names if name != ""]
+        IDYOMResultsFile._check_columns(named_columns, columns)
+        include_columns = list(columns) if columns is not None else named_columns
+
+        return pyarrow.csv.read_csv(
+            file_path,
+            read_options=pyarrow.csv.ReadOptions(column_names=column_names, skip_rows=1),
+            parse_options=pyarrow.csv.ParseOptions(delimiter=" "),
+            convert_options=pyarrow.csv.ConvertOptions(
+                column_types=IDYOMResultsFile.schema(include_columns), include_columns=include_columns,
+                null_values=IDYOMResultsFile.NULL_VALUES, strings_can_be_null=False))
+
+    @staticmethod
+    def sidecar_path(file_path: Union[str, Path]) -> Path:
+        """
+        Return the sidecar path of a results file, i.e., "<name>.dat.feather" next to it.
+        """
+        file_path = Path(file_path)
+        return file_path.parent / (file_path.name + IDYOMResultsFile.SIDECAR_SUFFIX)
+
+    @staticmethod
+    def _source_key(file_path: Union[str, Path]) -> dict:
+        stat = os.stat(file_path)
+        return {IDYOMResultsFile.SIDECAR_SOURCE_MTIME_KEY: str(stat.st_mtime_ns).encode(),
+                IDYOMResultsFile.SIDECAR_SOURCE_SIZE_KEY: str(stat.st_size).encode()}
+
+    @staticmethod
+    def _read_sidecar(file_path: Union[str, Path], columns: List[str] = None) -> pa.Table:
+        sidecar_path = IDYOMResultsFile.sidecar_path(file_path)
+        source_key = IDYOMResultsFile._source_key(file_path)
+        if sidecar_path.exists():
+            with pa.ipc.open_file(sidecar_path) as reader:  # reads the schema only
+                schema = reader.schema
+            if all((schema.metadata or dict()).get(key) == value for key, value in source_key.items()):
+                IDYOMResultsFile._check_columns(schema.names, columns)
+                return pyarrow.feather.read_table(sidecar_path, columns=columns, memory_map=True)
+
+        table = IDYOMResultsFile.read_table(file_path)
+        table = table.replace_schema_metadata({**(table.schema.metadata or dict()), **source_key})
+        tmp_sidecar_path = sidecar_path.parent / (sidecar_path.name + ".tmp-{}".format(os.getpid()))
+        try:
+            pyarrow.feather.write_feather(table, tmp_sidecar_path,
+                                          **CompressionPolicy(CompressionCodec.LZ4).feather_kwargs())
+            os.replace(tmp_sidecar_path, sidecar_path)  # readers never see a partially written sidecar
+        except OSError:  # e.g., read-only directory: proceed without sidecar
+            if tmp_sidecar_path.exists():
+                tmp_sidecar_path.unlink()
+        IDYOMResultsFile._check_columns(table.column_names, columns)
+        return table.select(columns) if columns is not None else table
+
+    @staticmethod
+    def _check_columns(column_names: List[str], columns: List[str] = None):
+        if columns is not None:
+            missing_columns = [column for column in columns if column not in column_names]
+            if len(missing_columns) > 0:
+                raise ValueError("columns invalid! {} do not exist.".format(missing_columns))
+
+    @staticmethod
+    def unrelated_fieldnames() -> List[str]:
+        """
+        Return the names of columns which do not relate to a target viewpoint, i.e., ids, the events' basic
+        viewpoints, and the overall model outputs.
+        """
+        return ['dataset.id', 'melody.id', 'note.id', 'melody.name', 'vertint12', 'articulation',
+                'comma',
+                'voice', 'ornament', 'dyn', 'phrase', 'bioi', 'deltast', 'accidental', 'mpitch',
+                'cpitch',
+                'barlength', 'pulses', 'tempo', 'mode', 'keysig', 'dur', 'onset',
+                'probability', 'information.content', 'entropy', 'information.gain',
+                '']
 
     def __init__(self, df: pd.DataFrame):
         super().__init__()
@@ -529,14 +668,10 @@ class IDYOMResultsFile(ResultsFile):
     @staticmethod
     def infer_target_viewpoints_target_viewpoint_values_and_used_source_viewpoints(
             fieldnames):  # "used", because each target viewpoint may use only a subset of all provided source viewpoints
-        unrelated_fieldnames = ['dataset.id', 'melody.id', 'note.id', 'melody.name', 'vertint12', 'articulation',
-                                'comma',
-                                'voice', 'ornament', 'dyn', 'phrase', 'bioi', 'deltast', 'accidental', 'mpitch',
-                                'cpitch',
-                                'barlength', 'pulses', 'tempo', 'mode', 'keysig', 'dur', 'onset',
-                                'probability', 'information.content', 'entropy', 'information.gain',
-                                '']
+        unrelated_fieldnames = set(IDYOMResultsFile.unrelated_fieldnames())
         remaining_fieldnames = [o for o in fieldnames if o not in unrelated_fieldnames]
+        if len(remaining_fieldnames) == 0:  # e.g., projected results (see load)
+            return [], dict(), dict()
 
         target_viewpoints = transform_string_list_to_viewpoints_list(list(set(map(lambda o: o.split(".", 1)[0], remaining_fieldnames))))
 
@@ -1,8 +1,12 @@
+import hashlib
 import os.path
+import sqlite3
+import subprocess
 from pathlib import Path
-from typing import Union, List
+from typing import Union, List, Tuple
 
 import cl4py
+import numpy as np
 from cl4py import Lisp
 
 from .base import Dataset, Composition, Viewpoint, BasicViewpoint, transform_viewpoints_list_to_string_list
@@ -43,6 +47,25 @@ class IDYOMDatabase:
                    ':if-exists', ':old',
                    ':database-type', ':sqlite3'))
 
+    def close(self, timeout: float = 5):
+        """
+        Terminate the Lisp process. If it does not exit within the timeout (e.g., because it hangs), it is killed.
+        Afterwards, this object cannot be used anymore.
+
+        Parameters
+        ----------
+        timeout
+            Time (seconds) to wait for the process to exit after being terminated
+        """
+        process = self.lisp.process
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
     def _check_path_is_existing_and_nonempty_directory(self, path: Union[str, Path]) -> bool:
         if not os.path.exists(path):
             return False
@@ -237,15 +260,15 @@ class IDYOMDatabase:
         if isinstance(dataset, Dataset):
             dataset = dataset.id
 
-        descriptions = self.eval(
-            ("mapcar", ("function", "idyom-db::composition-description"), ("idyom-db:get-compositions", dataset)))[0]
-        composition_ids = self.eval((
-            "mapcan", ("function", ("lambda", ("x",), ("cdr", ("idyom-db:get-id", "x")))),
-            ("idyom-db:get-compositions", dataset)))[0]
+        # One call returning (composition-id description) per composition
+        compositions = self.eval(
+            ("mapcar", ("function", ("lambda", ("x",), ("list", ("cadr", ("idyom-db:get-id", "x")),
+                                                        ("idyom-db::composition-description", "x")))),
+             ("idyom-db:get-compositions", dataset)))[0]
         result = list()
-        for idx, description in enumerate(
-                descriptions):  # assuming that idx always coincides with the composition's id within the dataset
-            result.append(Composition(dataset_id=dataset, id=composition_ids[idx], description=description))
+        for composition in (compositions or []):
+            composition_id, description = list(composition)
+            result.append(Composition(dataset_id=dataset, id=composition_id, description=description))
 
         return result
 
@@ -290,3 +313,84 @@ class IDYOMDatabase:
             viewpoint_sequence = []
 
         return viewpoint_sequence
+
+    def encode_dataset(self, dataset: Union[int, Dataset],
+                       viewpoint_spec: Union[Viewpoint, List[Viewpoint]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Transform all compositions of a dataset into viewpoint sequences, within a single evaluation in lisp.
+
+        Parameters
+        ----------
+        dataset
+            Id or dataset object
+        viewpoint_spec
+            List of viewpoints to transform the compositions to
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            (values, offsets): values of all compositions, concatenated (shape: (event,), or (event, viewpoint) if
+            the viewpoint is linked), and offsets (shape: (composition+1,)), such that the sequence of the i-th
+            composition (ordered as by get_all_compositions) is values[offsets[i]:offsets[i+1]].
+        """
+        if isinstance(dataset, Dataset):
+            dataset = dataset.id
+
+        # Returns ((length ...) (value ...)), i.e., the sequences' lengths and the concatenated sequences
+        cmd = ("let*", (("v", ("viewpoints:get-viewpoint",
+                               ("quote", tuple(transform_viewpoints_list_to_string_list(viewpoint_spec))))),
+                        ("sequences", ("mapcar", ("function", ("lambda", ("s",),
+                                                               ("viewpoints:viewpoint-sequence", "v", "s"))),
+                                       ("md:get-event-sequences", ("list", dataset))))),
+               ("list", ("mapcar", ("function", "length"), "sequences"),
+                ("loop", "for", "s", "in", "sequences", "append", "s")))
+        result, _ = self.eval(cmd)
+        lengths, values = list(result) if result else ([], [])
+
+        offsets = np.concatenate([[0], np.cumsum(list(lengths or []), dtype=np.int64)]).astype(np.int64)
+        values = [list(value) if isinstance(value, cl4py.Cons) else value for value in (values or [])]
+        return np.array(values), offsets
+
+
+# Tables of IDyOM's database which contain the data of a dataset (each with column dataset_id)
+DATASET_TABLES = ["mtp_dataset", "mtp_composition", "mtp_event"]
+
+
+def dataset_fingerprint(idyom_database_path: Union[str, Path], dataset_ids: List[int]) -> str:
+    """
+    Return a hash of the data of some datasets, i.e., of their rows in IDyOM's database. Thus, the fingerprint
+    changes if a dataset is re-imported with different compositions, even if the dataset id is reused.
+
+    If the database does not contain IDyOM's tables, the hash of the database file's size and modification time is
+    returned instead, i.e., the fingerprint changes with any modification of the database.
+
+    Parameters
+    ----------
+    idyom_database_path
+        Path to IDyOM's sqlite database file
+    dataset_ids
+        Dataset ids
+
+    Returns
+    -------
+    str
+        Hexadecimal SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    if not os.path.isfile(idyom_database_path):
+        return digest.hexdigest()
+
+    dataset_ids = sorted(set(int(dataset_id) for dataset_id in dataset_ids))
+    connection = sqlite3.connect(str(idyom_database_path))
+    try:
+        for table in DATASET_TABLES:
+            cursor = connection.execute("SELECT * FROM {} WHERE dataset_id IN ({})".format(
+                table, ", ".join("?" * len(dataset_ids))), dataset_ids)
+            columns = [column[0].lower() for column in cursor.description]
+            digest.update(repr((table, columns, sorted(cursor.fetchall(), key=repr))).encode())
+    except sqlite3.Error:
+        stat = os.stat(idyom_database_path)
+        digest = hashlib.sha256(repr((stat.st_size, stat.st_mtime_ns)).encode())
+    finally:
+        connection.close()
+    return digest.hexdigest()
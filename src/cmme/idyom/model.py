@@ -1,8 +1,15 @@
+import asyncio
+import os
 import tempfile
 
 from .base import *
 from .binding import *
 from .util import *
+from .idyom_database import dataset_fingerprint
+from .server import IDYOMServer
+from ..config import Config
+from ..lib.cache import ResultsCache, instructions_key
+from ..lib.io import new_filepath
 from ..lib.model import ModelBuilder, Model
 
 
@@ -233,9 +240,112 @@ class IDYOMInstructionBuilder(ModelBuilder):
 
 
 class IDYOMModel(Model):
+    @classmethod
+    def run_instructions_file(cls, instructions_file: IDYOMInstructionsFile, server: IDYOMServer = None,
+                              cache: ResultsCache = None) -> IDYOMResultsFile:
+        """
+        Run IDyOM as described by the instructions file.
+
+        Parameters
+        ----------
+        instructions_file
+            Instructions file object
+        server
+            If set, the run is performed by this (warm) IDyOM server. Otherwise, the instructions file is written
+            to disk and run by a new Lisp process.
+        cache
+            If set, results of identical instructions (and identical data of the datasets in IDyOM's database, see
+            dataset_fingerprint) are returned from this cache, and new results are stored in it.
+
+        Returns
+        -------
+        IDYOMResultsFile
+            Results file object
+        """
+        if cache is not None:
+            return cache.get_or_run(instructions_file, lambda: cls.run_instructions_file(instructions_file, server),
+                                    *cls._cache_variant(instructions_file, server))
+        if server is not None:
+            return server.run(instructions_file)
+        return super().run_instructions_file(instructions_file)
+
+    @classmethod
+    async def arun(cls, instructions_file: Union[IDYOMInstructionsFile, IDYOMInstructionBuilder],
+                   server: IDYOMServer = None, cache: ResultsCache = None) -> IDYOMResultsFile:
+        """
+        Run IDyOM without blocking the event loop (see run_instructions_file). Without server, sbcl is run as
+        asyncio subprocess, and the number of concurrent sbcl processes is limited (see ASYNC_CONCURRENCY_LIMITS,
+        backend "sbcl"). With server, the run is awaited in the server's queue. If the run is cancelled, the sbcl
+        process is killed.
+
+        Parameters
+        ----------
+        instructions_file
+            Instructions file object, or model builder
+        server
+            If set, the run is performed by this (warm) IDyOM server
+        cache
+            If set, results of identical instructions are returned from this cache, and new results are stored in it.
+
+        Returns
+        -------
+        IDYOMResultsFile
+            Results file object
+        """
+        if isinstance(instructions_file, ModelBuilder):
+            instructions_file = instructions_file.to_instructions_file()
+        if cache is not None:
+            key = instructions_key(instructions_file, *cls._cache_variant(instructions_file, server))
+            results_file = cache.get(key)
+            if results_file is None:
+                results_file = await cls.arun(instructions_file, server)
+                cache.put(key, results_file)
+            return results_file
+        if server is not None:
+            return await asyncio.wrap_future(server.submit(instructions_file))
+
+        loop = asyncio.get_running_loop()
+        async with cls._async_semaphore("sbcl"):
+            if_path = new_filepath(cls.__name__, "lisp")
+            try:
+                await loop.run_in_executor(None, instructions_file.save_self, if_path)
+                process = await asyncio.create_subprocess_exec("sbcl", "--script", str(if_path),
+                                                               stdout=asyncio.subprocess.PIPE,
+                                                               stderr=asyncio.subprocess.PIPE)
+                try:
+                    out, err = await process.communicate()
+                except BaseException:  # e.g., asyncio.CancelledError, if the consumer stopped early
+                    if process.returncode is None:
+                        try:
+                            process.kill()
+                        except ProcessLookupError:  # exited meanwhile
+                            pass
+                    await process.wait()
+                    raise
+            finally:
+                if os.path.exists(if_path):
+                    os.remove(if_path)
+        return await loop.run_in_executor(None, IDYOMModel._results_file_from_output, out, err)
+
+    @classmethod
+    def _cache_variant(cls, instructions_file: IDYOMInstructionsFile, server: IDYOMServer = None) -> tuple:
+        # The instructions refer to datasets by id only, thus the key also covers the datasets' data
+        idyom_database_path = instructions_file.idyom_database_path
+        if idyom_database_path is None:
+            idyom_database_path = server.idyom_database_path if server is not None \
+                else Config().idyom_database_path()
+        dataset = instructions_file.dataset
+        dataset_ids = [dataset.id if isinstance(dataset, Dataset) else dataset]
+        dataset_ids += (instructions_file.training_options or dict()).get("pretraining_dataset_ids") or []
+        return cls.__name__, dataset_fingerprint(idyom_database_path, dataset_ids)
+
     @staticmethod
     def run_instructions_file_at_path(file_path: Union[str, Path]) -> IDYOMResultsFile:
         out, err = run_idyom_instructions_file(file_path)
+        return IDYOMModel._results_file_from_output(out, err)
+
+    @staticmethod
+    def _results_file_from_output(out: bytes, err: bytes) -> IDYOMResultsFile:
         out_last_line = out.decode('utf-8').split("\n")[-1]
         search_results = re.search(r"results_file_path=(.+)\"", out_last_line)
         results_file_path = search_results.groups()[0] if search_results else None
@@ -0,0 +1,418 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import List, Union
+
+from .binding import IDYOMInstructionsFile, IDYOMResultsFile
+from .idyom_database import IDYOMDatabase
+from .util import LispExpressionBuilderMode
+from ..config import Config
+from ..lib.util import path_as_string_with_trailing_slash
+
+
+class IDYOMServer:
+    """
+    Long-lived IDyOM. Quicklisp, idyom, and clsql are loaded, and the database is connected, only once (see
+    IDYOMDatabase). Afterwards, run requests are taken from a queue and evaluated one after another, each as
+    IDYOMInstructionsFile.to_run_expression(leb_mode=CL4PY).
+
+    Compared to running each instructions file by "sbcl --script" (see IDYOMModel.run_instructions_file_at_path),
+    this avoids the startup costs of several seconds per run.
+
+    shutdown stops serving but keeps the Lisp process, such that the server can be started again cheaply. close (as
+    well as leaving the context manager) also terminates the Lisp process.
+
+    If a run fails, or does not finish within run_timeout, and the Lisp process does not respond anymore, the Lisp
+    process is replaced by a new one.
+    """
+    HEALTH_CHECK_EXPRESSION = ("+", 1, 1)
+    HEALTH_CHECK_TIMEOUT = 10  # seconds
+    CLOSE_TIMEOUT = 10  # seconds
+
+    def __init__(self, idyom_root_path: Union[str, Path] = None, idyom_database_path: Union[str, Path] = None,
+                 run_timeout: float = None):
+        """
+        Parameters
+        ----------
+        idyom_root_path
+            Path to IDyOM's root (data) directory. If None, the configured path is used.
+        idyom_database_path
+            Path to IDyOM's sqlite database file. If None, the configured path is used.
+        run_timeout
+            Time (seconds) after which a run is considered hung, i.e., it fails with a TimeoutError, and the Lisp
+            process is replaced. If None, runs may take arbitrarily long.
+        """
+        if run_timeout is not None and not run_timeout > 0:
+            raise ValueError("run_timeout invalid! Value must be greater than 0.")
+        self.idyom_root_path = idyom_root_path if idyom_root_path is not None else Config().idyom_root_path()
+        self.idyom_database_path = idyom_database_path if idyom_database_path is not None \
+            else Config().idyom_database_path()
+        self.run_timeout = run_timeout
+
+        self.database: IDYOMDatabase = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._terminating = threading.Event()  # if set, pending requests are cancelled, and the Lisp is not restarted
+
+    def __enter__(self) -> IDYOMServer:
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        """
+        Start IDyOM (if not running yet). This blocks until IDyOM is loaded.
+        """
+        with self._lock:
+            if self._thread is None:
+                if self.database is None:
+                    self.database = IDYOMDatabase(self.idyom_root_path, self.idyom_database_path)
+                self._terminating.clear()
+                self._thread = threading.Thread(target=self._serve, daemon=True)
+                self._thread.start()
+
+    def _stop(self, timeout: float = None) -> Union[threading.Thread, None]:
+        # Returns the serving thread if it is still alive after the timeout
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join(timeout)
+            if thread.is_alive():
+                return thread
+        return None
+
+    def shutdown(self, timeout: float = None) -> bool:
+        """
+        Process all pending requests, then stop serving. The Lisp process is kept, such that start is cheap.
+
+        Parameters
+        ----------
+        timeout
+            Time (seconds) to wait for the pending requests. If None, wait until all of them are processed.
+
+        Returns
+        -------
+        bool
+            Whether serving stopped within the timeout
+        """
+        return self._stop(timeout) is None
+
+    def close(self, timeout: float = CLOSE_TIMEOUT):
+        """
+        Process all pending requests, then stop serving and terminate the Lisp process. If the requests are not
+        processed within the timeout (e.g., because a run hangs), the Lisp process is terminated right away, which
+        fails the current run, and the remaining requests are cancelled. The server can be started again (which
+        starts a new Lisp process).
+
+        Parameters
+        ----------
+        timeout
+            Time (seconds) to wait for the pending requests. If None, wait until all of them are processed.
+        """
+        thread = self._stop(timeout)
+        if thread is not None:
+            self._terminating.set()
+        with self._lock:
+            database, self.database = self.database, None
+        if database is not None:
+            database.close()  # unblocks a hung run, if any
+        if thread is not None:
+            thread.join()
+
+    def _serve(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                break
+            future, instructions_file, results_file_path = request
+            if self._terminating.is_set():
+                future.cancel()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._run_with_timeout(instructions_file, results_file_path))
+            except BaseException as e:
+                try:
+                    self._restart_if_unhealthy()  # before failing the run, such that the server is usable again
+                finally:
+                    future.set_exception(e)
+
+    def _run_with_timeout(self, instructions_file: IDYOMInstructionsFile,
+                          results_file_path: Union[str, Path] = None) -> IDYOMResultsFile:
+        if self.run_timeout is None:
+            return self._run(instructions_file, results_file_path)
+
+        # Watchdog: terminating the Lisp process unblocks the evaluation
+        database = self.database
+        timed_out = threading.Event()
+
+        def expire():
+            timed_out.set()
+            database.close(timeout=0)
+
+        watchdog = threading.Timer(self.run_timeout, expire)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            results_file = self._run(instructions_file, results_file_path)
+        except BaseException:
+            if not timed_out.is_set():
+                raise
+        finally:
+            watchdog.cancel()
+        if timed_out.is_set():
+            raise TimeoutError("IDyOM run did not finish within {} seconds.".format(self.run_timeout))
+        return results_file
+
+    def _is_healthy(self) -> bool:
+        # Evaluated in a separate thread, as a hung Lisp process would block forever
+        results = []
+
+        def check():
+            try:
+                results.append(self.database.eval(self.HEALTH_CHECK_EXPRESSION)[0])
+            except Exception:
+                pass  # e.g., the process exited
+
+        thread = threading.Thread(target=check, daemon=True)
+        thread.start()
+        thread.join(self.HEALTH_CHECK_TIMEOUT)
+        return len(results) == 1 and results[0] == 2
+
+    def _restart_if_unhealthy(self):
+        if self._terminating.is_set() or self._is_healthy():
+            return
+        with self._lock:
+            if self._terminating.is_set() or self.database is None:  # closed meanwhile
+                return
+            # The old process would not exit on its own (e.g., if it hangs, or waits in the debugger)
+            self.database.close(timeout=0)
+            self.database = IDYOMDatabase(self.idyom_root_path, self.idyom_database_path)
+
+    def _check_instructions_file(self, instructions_file: IDYOMInstructionsFile):
+        for name, path, server_path in [
+            ("idyom_root_path", instructions_file.idyom_root_path, self.idyom_root_path),
+            ("idyom_database_path", instructions_file.idyom_database_path, self.idyom_database_path)]:
+            if path is not None and os.path.abspath(path) != os.path.abspath(server_path):
+                raise ValueError("instructions_file invalid! Its {} does not match the server's.".format(name))
+
+    def _run(self, instructions_file: IDYOMInstructionsFile, results_file_path: Union[str, Path] = None) \
+            -> IDYOMResultsFile:
+        self._check_instructions_file(instructions_file)
+        output_dir = path_as_string_with_trailing_slash(
+            results_file_path if results_file_path is not None else instructions_file.output_options["output_path"])
+        os.makedirs(output_dir, exist_ok=True)
+
+        self.database.eval(instructions_file.to_run_expression(results_file_path=output_dir,
+                                                               leb_mode=LispExpressionBuilderMode.CL4PY))
+        filename, _ = self.database.eval(
+            instructions_file.to_filename_inference_expression(leb_mode=LispExpressionBuilderMode.CL4PY))
+        results_file_path = output_dir + str(filename)
+        if not os.path.exists(results_file_path):
+            raise ValueError("Could not determine results_file_path!")
+
+        return IDYOMResultsFile.load(results_file_path)
+
+    def submit(self, instructions_file: IDYOMInstructionsFile, results_file_path: Union[str, Path] = None) -> Future:
+        """
+        Schedule a run. The server is started if not running.
+
+        Parameters
+        ----------
+        instructions_file
+            Instructions file object. If it specifies idyom_root_path or idyom_database_path, these must match the
+            server's.
+        results_file_path
+            Path to the *directory*, where IDyOM is supposed to store its results. If None, the instructions file's
+            output path is used.
+
+        Returns
+        -------
+        Future
+            Future of the results file object
+        """
+        self.start()
+        future = Future()
+        self._queue.put((future, instructions_file, results_file_path))
+        return future
+
+    def run(self, instructions_file: IDYOMInstructionsFile, results_file_path: Union[str, Path] = None) \
+            -> IDYOMResultsFile:
+        """
+        Run an instructions file, and wait for its results (see submit).
+        """
+        return self.submit(instructions_file, results_file_path).result()
+
+    def map(self, instructions_files: List[IDYOMInstructionsFile]) -> List[IDYOMResultsFile]:
+        """
+        Run several instructions files, and wait until all of them are processed.
+
+        Parameters
+        ----------
+        instructions_files
+            Instructions file objects
+
+        Returns
+        -------
+        list
+            Results file objects, in the order of instructions_files
+        """
+        futures = [self.submit(instructions_file) for instructions_file in instructions_files]
+        return [future.result() for future in futures]
+
+
+class IDYOMWorkerPool:
+    """
+    Pool of IDyOM servers (i.e., Lisp processes) to run several instructions files in parallel.
+
+    Jobs are scheduled with dataset affinity: if caching is used (see IDYOMInstructionBuilder.caching_options), a
+    job is sent to a worker which already ran a job of the same dataset (and pretraining datasets), such that this
+    worker's LTMs and resampling sets are reused. Only if all such workers are busier than the least busy worker by
+    more than max_imbalance jobs, the job is sent to the least busy worker instead.
+    """
+    MAX_IMBALANCE = 2  # jobs
+
+    def __init__(self, size: int = None, idyom_root_path: Union[str, Path] = None,
+                 idyom_database_path: Union[str, Path] = None, max_imbalance: int = MAX_IMBALANCE,
+                 run_timeout: float = None):
+        """
+        Parameters
+        ----------
+        size
+            Number of workers. If None, the number of CPUs is used.
+        idyom_root_path
+            Path to IDyOM's root (data) directory. If None, the configured path is used.
+        idyom_database_path
+            Path to IDyOM's sqlite database file. If None, the configured path is used.
+        max_imbalance
+            Number of pending jobs by which a worker with affinity may exceed the least busy worker
+        run_timeout
+            Time (seconds) after which a run is considered hung (see IDYOMServer)
+        """
+        if size is not None and not size >= 1:
+            raise ValueError("size invalid! Value must be greater than or equal 1.")
+        if not max_imbalance >= 0:
+            raise ValueError("max_imbalance invalid! Value must be greater than or equal 0.")
+
+        self.size = size if size is not None else (os.cpu_count() or 1)
+        self.max_imbalance = max_imbalance
+        self.servers = [IDYOMServer(idyom_root_path, idyom_database_path, run_timeout) for _ in range(self.size)]
+        self.affinities = [set() for _ in range(self.size)]  # affinity keys per worker
+        self._pending = [0] * self.size
+        self._lock = threading.Lock()
+
+    @property
+    def idyom_database_path(self) -> Union[str, Path]:
+        return self.servers[0].idyom_database_path
+
+    def __enter__(self) -> IDYOMWorkerPool:
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def start(self):
+        """
+        Start all workers. The Lisp processes are started concurrently, and this blocks until all are ready.
+        """
+        threads = [threading.Thread(target=server.start) for server in self.servers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def shutdown(self, timeout: float = IDYOMServer.CLOSE_TIMEOUT):
+        """
+        Process all pending jobs, then stop all workers and terminate their Lisp processes (see IDYOMServer.close).
+
+        Parameters
+        ----------
+        timeout
+            Time (seconds) to wait for each worker's pending jobs. If None, wait until all of them are processed.
+        """
+        for server in self.servers:
+            server.close(timeout)
+
+    @staticmethod
+    def affinity_key(instructions_file: IDYOMInstructionsFile) -> Union[tuple, None]:
+        """
+        Return the key by which jobs sharing cached LTMs and resampling sets are identified, i.e., the dataset id and
+        the pretraining dataset ids. If the instructions file disables both caches, None is returned.
+        """
+        caching_options = instructions_file.caching_options or dict()
+        if caching_options.get("use_ltms_cache") is False and \
+                caching_options.get("use_resampling_set_cache") is False:
+            return None
+        pretraining_dataset_ids = (instructions_file.training_options or dict()).get("pretraining_dataset_ids")
+        return instructions_file.dataset.id, tuple(pretraining_dataset_ids or [])
+
+    def _select_worker(self, key: Union[tuple, None]) -> int:
+        least_busy = min(range(self.size), key=lambda idx: self._pending[idx])
+        if key is None:
+            return least_busy
+        candidates = [idx for idx in range(self.size) if key in self.affinities[idx]]
+        if len(candidates) > 0:
+            worker = min(candidates, key=lambda idx: self._pending[idx])
+            if self._pending[worker] - self._pending[least_busy] <= self.max_imbalance:
+                return worker
+        self.affinities[least_busy].add(key)
+        return least_busy
+
+    def _job_done(self, worker: int):
+        with self._lock:
+            self._pending[worker] -= 1
+
+    def submit(self, instructions_file: IDYOMInstructionsFile, results_file_path: Union[str, Path] = None) -> Future:
+        """
+        Schedule a run (see IDYOMServer.submit).
+
+        Parameters
+        ----------
+        instructions_file
+            Instructions file object
+        results_file_path
+            Path to the *directory*, where IDyOM is supposed to store its results. If None, the instructions file's
+            output path is used.
+
+        Returns
+        -------
+        Future
+            Future of the results file object
+        """
+        with self._lock:
+            worker = self._select_worker(self.affinity_key(instructions_file))
+            self._pending[worker] += 1
+        future = self.servers[worker].submit(instructions_file, results_file_path)
+        future.add_done_callback(lambda _: self._job_done(worker))
+        return future
+
+    def map(self, instructions_files: List[IDYOMInstructionsFile]) -> List[IDYOMResultsFile]:
+        """
+        Run several instructions files in parallel, and wait until all of them are processed.
+
+        Parameters
+        ----------
+        instructions_files
+            Instructions file objects
+
+        Returns
+        -------
+        list
+            Results file objects, in the order of instructions_files
+        """
+        futures = [self.submit(instructions_file) for instructions_file in instructions_files]
+        return [future.result() for future in futures]
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Union
+
+import numpy as np
+
+from cmme.lib.instructions_file import InstructionsFile
+from cmme.lib.results_file import ResultsFile
+
+
+def _update_digest(digest, value):
+    """
+    Feed a canonical representation of a value into the digest: equal values yield equal bytes, regardless of,
+    e.g., the memory layout of arrays or the insertion order of dicts.
+    """
+    if value is None:
+        digest.update(b"N;")
+    elif isinstance(value, (bool, int, float, str, bytes)):
+        digest.update("{}:{!r};".format(type(value).__name__, value).encode())
+    elif isinstance(value, Enum):
+        digest.update("E:{}.{};".format(type(value).__qualname__, value.name).encode())
+    elif isinstance(value, Path):
+        digest.update("P:{};".format(value).encode())
+    elif isinstance(value, np.generic):
+        _update_digest(digest, value.item())
+    elif isinstance(value, np.ndarray):
+        if value.dtype == object:
+            digest.update("O{};".format(value.shape).encode())
+            for element in value.flat:
+                _update_digest(digest, element)
+        else:
+            digest.update("A:{}{};".format(value.dtype.str, value.shape).encode())
+            digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        digest.update("L{};".format(len(value)).encode())
+        for element in value:
+            _update_digest(digest, element)
+    elif isinstance(value, dict):
+        digest.update("D{};".format(len(value)).encode())
+        for key in sorted(value.keys(), key=repr):
+            _update_digest(digest, key)
+            _update_digest(digest, value[key])
+    elif dataclasses.is_dataclass(value) or hasattr(value, "__dict__"):
+        digest.update("C:{}.{};".format(type(value).__module__, type(value).__qualname__).encode())
+        _update_digest(digest, vars(value))
+    else:
+        raise ValueError("value invalid! Values of type {} cannot be hashed.".format(type(value).__name__))
+
+
+def instructions_key(instructions_file: InstructionsFile, *variant) -> str:
+    """
+    Return the content hash of an instructions file object, i.e., of its type and all its parameters (including
+    input sequences and priors).
+
+    Parameters
+    ----------
+    instructions_file
+        Instructions file object, e.g., PPMInstructionsFile, DREXInstructionsFile, or IDYOMInstructionsFile
+    variant
+        Further values which affect the results, e.g., the backend
+
+    Returns
+    -------
+    str
+        Hexadecimal SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    _update_digest(digest, instructions_file)
+    _update_digest(digest, list(variant))
+    return digest.hexdigest()
+
+
+class ResultsCache:
+    """
+    Content-addressed cache of results: results are stored under the hash of the instructions file object (see
+    instructions_key), such that running an identical configuration again returns the stored results instead.
+
+    Results are stored pickled, either in memory or, if a directory is specified, as files to be reused across
+    processes and sessions. The least recently used results are evicted once the cache exceeds max_bytes or
+    max_entries.
+    """
+    DEFAULT_MAX_BYTES = 1024 ** 3  # 1 GiB
+    FILE_EXTENSION = ".pickle"
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, directory: Union[str, Path] = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_entries: int = None):
+        """
+        Parameters
+        ----------
+        directory
+            Where to store results. If None, results are cached in memory only.
+        max_bytes
+            Maximum total size of the stored results. If None, the size is unbounded.
+        max_entries
+            Maximum number of stored results. If None, the number is unbounded.
+        """
+        if max_bytes is not None and not max_bytes >= 0:
+            raise ValueError("max_bytes invalid! Value must be greater than or equal 0.")
+        if max_entries is not None and not max_entries >= 0:
+            raise ValueError("max_entries invalid! Value must be greater than or equal 0.")
+
+        self.directory = Path(directory) if directory is not None else None
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, bytes] = OrderedDict()  # in memory; least recently used first
+        self._lock = threading.RLock()
+        self._last_use_ns = 0
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def default(cls) -> ResultsCache:
+        """
+        Return the in-memory cache which is shared within the current process.
+        """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = ResultsCache()
+            return cls._default
+
+    def _file_path(self, key: str) -> Path:
+        return self.directory / (key + ResultsCache.FILE_EXTENSION)
+
+    def _mark_used(self, file_path: Path):
+        # The modification time tracks the last use. It strictly increases, even within the file system's resolution.
+        self._last_use_ns = max(time.time_ns(), self._last_use_ns + 1)
+        os.utime(file_path, ns=(self._last_use_ns, self._last_use_ns))
+
+    def _stored_files(self) -> list:
+        # (last use, size, path) per stored result, least recently used first
+        files = []
+        for path in self.directory.glob("*" + ResultsCache.FILE_EXTENSION):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # evicted concurrently
+                continue
+            files.append((stat.st_mtime_ns, stat.st_size, path))
+        return sorted(files)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries) if self.directory is None else len(self._stored_files())
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries if self.directory is None else self._file_path(key).exists()
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Total size of the stored results.
+        """
+        with self._lock:
+            if self.directory is None:
+                return sum(len(data) for data in self._entries.values())
+            return sum(size for _, size, _ in self._stored_files())
+
+    def get(self, key: str) -> Union[ResultsFile, None]:
+        """
+        Return the results stored under the key (and mark them as recently used), or None.
+        """
+        with self._lock:
+            if self.directory is None:
+                data = self._entries.get(key)
+                if data is not None:
+                    self._entries.move_to_end(key)
+            else:
+                file_path = self._file_path(key)
+                try:
+                    data = file_path.read_bytes()
+                    self._mark_used(file_path)
+                except FileNotFoundError:
+                    data = None
+        return pickle.loads(data) if data is not None else None
+
+    def put(self, key: str, results_file: ResultsFile):
+        """
+        Store results under the key, then evict the least recently used results if the cache is too large.
+        """
+        data = pickle.dumps(results_file, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if self.directory is None:
+                self._entries[key] = data
+                self._entries.move_to_end(key)
+            else:
+                tmp_file_path = self.directory / "{}.tmp-{}".format(key, os.getpid())
+                tmp_file_path.write_bytes(data)
+                os.replace(tmp_file_path, self._file_path(key))  # readers never see a partially written file
+                self._mark_used(self._file_path(key))
+            self._evict()
+
+    def _evict(self):
+        if self.directory is None:
+            total_bytes = sum(len(data) for data in self._entries.values())
+            while len(self._entries) > 0 and self._is_too_large(len(self._entries), total_bytes):
+                _, data = self._entries.popitem(last=False)
+                total_bytes -= len(data)
+        else:
+            files = self._stored_files()
+            total_bytes = sum(size for _, size, _ in files)
+            count = len(files)
+            for _, size, path in files:
+                if not self._is_too_large(count, total_bytes):
+                    break
+                path.unlink(missing_ok=True)
+                total_bytes -= size
+                count -= 1
+
+    def _is_too_large(self, count: int, total_bytes: int) -> bool:
+        return (self.max_entries is not None and count > self.max_entries) or \
+            (self.max_bytes is not None and total_bytes > self.max_bytes)
+
+    def get_or_run(self, instructions_file: InstructionsFile, run: Callable[[], ResultsFile], *variant) \
+            -> ResultsFile:
+        """
+        Return the cached results of the instructions file. If there are none, run is called, and its results are
+        stored.
+
+        Parameters
+        ----------
+        instructions_file
+            Instructions file object
+        run
+            Function which runs the model and returns its results
+        variant
+            Further values which affect the results, e.g., the backend (see instructions_key)
+
+        Returns
+        -------
+        ResultsFile
+            Results
+        """
+        key = instructions_key(instructions_file, *variant)
+        results_file = self.get(key)
+        if results_file is None:
+            results_file = run()
+            self.put(key, results_file)
+        return results_file
+
+    def clear(self):
+        """
+        Remove all stored results.
+        """
+        with self._lock:
+            self._entries.clear()
+            if self.directory is not None:
+                for _, _, path in self._stored_files():
+                    path.unlink(missing_ok=True)
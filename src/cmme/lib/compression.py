@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from enum import Enum
+from typing import TYPE_CHECKING
+
+import pandas as pd
+
+if TYPE_CHECKING:
+    from cmme.config import Config
+
+
+class CompressionCodec(Enum):
+    NONE = "uncompressed"
+    LZ4 = "lz4"
+    ZSTD = "zstd"
+    AUTO = "auto"
+
+
+class CompressionPolicy:
+    """
+    Compression of Feather files (instructions and results files).
+
+    With CompressionCodec.AUTO, the codec is chosen by payload size: small tables are compressed with zstd at a low
+    level, large tables with lz4 (fast writes). Higher zstd levels barely reduce the size of typical results tables,
+    but increase the write time considerably (see benchmarks/feather_compression.py).
+    """
+    AUTO_SIZE_THRESHOLD = 1024 * 1024  # bytes
+    AUTO_SMALL_PAYLOAD_LEVEL = 3
+
+    _default = None  # (config file path, modification time), and the policy configured there
+
+    def __init__(self, codec: CompressionCodec = CompressionCodec.ZSTD, level: int = None):
+        """
+        Parameters
+        ----------
+        codec
+            Codec to use
+        level
+            Compression level. If None, the codec's default level is used. Ignored for CompressionCodec.NONE and
+            CompressionCodec.AUTO.
+        """
+        self.codec = CompressionCodec(codec)
+        self.level = level
+
+    def __repr__(self):
+        return "CompressionPolicy(codec={}, level={})".format(self.codec.value, self.level)
+
+    @staticmethod
+    def default(config: Config = None) -> CompressionPolicy:
+        """
+        Return the policy configured in the config file (keys FEATHER_COMPRESSION and FEATHER_COMPRESSION_LEVEL).
+        Without configuration, zstd at level 16 is used.
+
+        Parameters
+        ----------
+        config
+            Configuration to use. If None, the default config file is used, which is read again only if it has been
+            modified since.
+
+        Returns
+        -------
+        CompressionPolicy
+            Configured policy
+        """
+        if config is not None:
+            return CompressionPolicy(CompressionCodec(config.feather_compression()),
+                                     config.feather_compression_level())
+
+        from cmme.config import Config
+        config_file_path = Config.DEFAULT_CONFIG_FILE_PATH
+        key = (config_file_path, config_file_path.stat().st_mtime_ns) if config_file_path.exists() else None
+        if key is None or CompressionPolicy._default is None or CompressionPolicy._default[0] != key:
+            CompressionPolicy._default = (key, CompressionPolicy.default(Config(config_file_path)))
+        return CompressionPolicy._default[1]
+
+    def resolve(self, df: pd.DataFrame = None) -> CompressionPolicy:
+        """
+        Return the concrete policy for a table, i.e., resolve CompressionCodec.AUTO.
+
+        Parameters
+        ----------
+        df
+            Table to compress. Required for CompressionCodec.AUTO.
+
+        Returns
+        -------
+        CompressionPolicy
+            Policy with a concrete codec
+        """
+        if self.codec != CompressionCodec.AUTO:
+            return self
+        if df is None:
+            raise ValueError("df invalid! The payload is required to resolve CompressionCodec.AUTO.")
+        if df.memory_usage(index=False, deep=True).sum() < CompressionPolicy.AUTO_SIZE_THRESHOLD:
+            return CompressionPolicy(CompressionCodec.ZSTD, CompressionPolicy.AUTO_SMALL_PAYLOAD_LEVEL)
+        return CompressionPolicy(CompressionCodec.LZ4)
+
+    def feather_kwargs(self, df: pd.DataFrame = None) -> dict:
+        """
+        Return the keyword arguments for pd.DataFrame.to_feather.
+
+        Parameters
+        ----------
+        df
+            Table to compress. Required for CompressionCodec.AUTO.
+
+        Returns
+        -------
+        dict
+            compression and compression_level
+        """
+        policy = self.resolve(df)
+        return {
+            "compression": policy.codec.value,
+            "compression_level": policy.level if policy.codec != CompressionCodec.NONE else None
+        }
+
+
+def write_feather(df: pd.DataFrame, file_path, compression: CompressionPolicy = None):
+    """
+    Write a table as Feather file.
+
+    Parameters
+    ----------
+    df
+        Table to write
+    file_path
+        Where to write to
+    compression
+        Compression policy. If None, the configured default policy is used.
+    """
+    if compression is None:
+        compression = CompressionPolicy.default()
+    df.to_feather(file_path, **compression.feather_kwargs(df))
@@ -28,7 +28,8 @@ class InstructionsFile(ABC):
         """
         raise NotImplementedError
 
-    def save_self(self, instructions_file_path: Union[str, Path], results_file_path: Union[str, Path] = None):
+    def save_self(self, instructions_file_path: Union[str, Path], results_file_path: Union[str, Path] = None,
+                  **kwargs):
         """
         Save this result file object as file.
 
@@ -39,8 +40,10 @@ class InstructionsFile(ABC):
         results_file_path
             File path where to write the results to. If None, the external intermediate scripts will provide a value
             by their own when processing the instructions file.
+        kwargs
+            Further arguments supported by the specific save method (e.g., compression)
         """
-        self.save(self, instructions_file_path, results_file_path)
+        self.save(self, instructions_file_path, results_file_path, **kwargs)
 
     @staticmethod
     @abstractmethod
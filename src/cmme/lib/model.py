@@ -1,7 +1,14 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import os
 import tempfile
+import weakref
 from abc import ABC, abstractmethod
+from typing import Union
+
+from cmme.lib.cache import ResultsCache
 from cmme.lib.instructions_file import InstructionsFile
 from cmme.lib.io import new_filepath
 from cmme.lib.results_file import ResultsFile
@@ -25,11 +32,62 @@ class ModelBuilder(ABC):
 
 
 class Model(ABC):
+    # Maximum number of concurrent runs by arun, per backend. Backends without entry use the default limit.
+    ASYNC_CONCURRENCY_LIMITS = dict()
+    DEFAULT_ASYNC_CONCURRENCY_LIMIT = os.cpu_count() or 1
+    DEFAULT_BACKEND = None
+
+    _async_semaphores = weakref.WeakKeyDictionary()  # event loop => {(model, backend): semaphore}
+
     def __init__(self):
         pass
 
     @classmethod
-    def run_instructions_file(cls, instructions_file: InstructionsFile) -> ResultsFile:
+    def async_concurrency_limit(cls, backend=None) -> int:
+        """
+        Return the maximum number of concurrent runs by arun for the backend.
+        """
+        return cls.ASYNC_CONCURRENCY_LIMITS.get(backend, cls.DEFAULT_ASYNC_CONCURRENCY_LIMIT)
+
+    @classmethod
+    def _async_semaphore(cls, backend=None) -> asyncio.Semaphore:
+        # Semaphores are bound to the running event loop, and created on first use (with the limit at that time)
+        semaphores = Model._async_semaphores.setdefault(asyncio.get_running_loop(), dict())
+        key = (cls.__name__, backend)
+        if key not in semaphores:
+            semaphores[key] = asyncio.Semaphore(cls.async_concurrency_limit(backend))
+        return semaphores[key]
+
+    @classmethod
+    async def arun(cls, instructions_file: Union[InstructionsFile, ModelBuilder], **kwargs) -> ResultsFile:
+        """
+        Run the model without blocking the event loop (see run_instructions_file). The run is performed by the
+        event loop's default executor, and the number of concurrent runs per backend is limited (see
+        ASYNC_CONCURRENCY_LIMITS).
+
+        Parameters
+        ----------
+        instructions_file
+            Instructions file object, or model builder
+        kwargs
+            Further arguments of run_instructions_file (e.g., backend)
+
+        Returns
+        -------
+        ResultsFile
+            Results
+        """
+        if isinstance(instructions_file, ModelBuilder):
+            instructions_file = instructions_file.to_instructions_file()
+        async with cls._async_semaphore(kwargs.get("backend", cls.DEFAULT_BACKEND)):
+            return await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(cls.run_instructions_file, instructions_file, **kwargs))
+
+    @classmethod
+    def run_instructions_file(cls, instructions_file: InstructionsFile, cache: ResultsCache = None) -> ResultsFile:
+        if cache is not None:
+            return cache.get_or_run(instructions_file, lambda: cls.run_instructions_file(instructions_file),
+                                    cls.__name__)
         match cls.__name__:
             case "IDYOMModel":
                 extension = "lisp"
@@ -22,7 +22,7 @@ class ResultsFile(ABC):
         """
         return NotImplementedError
 
-    def save_self(self, file_path: str):
+    def save_self(self, file_path: str, **kwargs):
         """
         Save this result file object as file.
 
@@ -30,8 +30,10 @@ class ResultsFile(ABC):
         ----------
         file_path
             Where to store the result file
+        kwargs
+            Further arguments supported by the specific save method (e.g., compression)
         """
-        return self.save(self, file_path)
+        return self.save(self, file_path, **kwargs)
 
     @staticmethod
     @abstractmethod
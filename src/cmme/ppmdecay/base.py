@@ -12,3 +12,8 @@ class PPMEscapeMethod(Enum):
 class PPMModelType(Enum):
     SIMPLE = "SIMPLE"
     DECAY = "DECAY"
+
+
+class PPMBackend(Enum):
+    R = "R"
+    NATIVE = "NATIVE"
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset
+
+from cmme.lib.compression import CompressionPolicy
+from cmme.lib.io import new_filepath
+from cmme.ppmdecay.base import PPMBackend, PPMModelType
+from cmme.ppmdecay.binding import PPMInstructionsFile, PPMBatchResultsFileData, PPMResultsMetaFile
+from cmme.ppmdecay.model import PPMInstructionBuilder
+from cmme.ppmdecay.native import run_native_model
+
+
+class PPMBatch:
+    """
+    Several PPM configurations ("jobs"), which are run within one call of the intermediate script.
+    Jobs are identified by their job_id: 1, 2, 3, ... (in the order they were added).
+    """
+
+    def __init__(self, jobs: List[Union[PPMInstructionBuilder, PPMInstructionsFile]] = None):
+        """
+        Parameters
+        ----------
+        jobs
+            Instruction builders or instructions files (of either model type)
+        """
+        self.instructions_files: List[PPMInstructionsFile] = []
+        for job in jobs or []:
+            self.add(job)
+
+    def __len__(self):
+        return len(self.instructions_files)
+
+    @property
+    def job_ids(self) -> List[int]:
+        return list(range(1, len(self.instructions_files) + 1))
+
+    def add(self, job: Union[PPMInstructionBuilder, PPMInstructionsFile]) -> int:
+        """
+        Add a job.
+
+        Parameters
+        ----------
+        job
+            Instruction builder or instructions file
+
+        Returns
+        -------
+        int
+            job_id
+        """
+        if isinstance(job, PPMInstructionBuilder):
+            job = job.to_instructions_file()
+        if not isinstance(job, PPMInstructionsFile):
+            raise ValueError("job invalid! Provide a PPMInstructionBuilder or PPMInstructionsFile instance.")
+        self.instructions_files.append(job)
+        return len(self.instructions_files)
+
+    def instructions_file(self, job_id: int) -> PPMInstructionsFile:
+        if job_id not in self.job_ids:
+            raise ValueError("job_id {} does not exist!".format(job_id))
+        return self.instructions_files[job_id - 1]
+
+    def to_data_frame(self) -> pd.DataFrame:
+        """
+        Return one table which contains the instructions of all jobs, one row per job.
+        Columns which are specific to a model type are empty for jobs of the other model type.
+
+        Returns
+        -------
+        pd.DataFrame
+            Consolidated instructions, with column job_id
+        """
+        if len(self.instructions_files) == 0:
+            raise ValueError("Batch invalid! There must be at least one job.")
+
+        dfs = []
+        for job_id, instructions_file in zip(self.job_ids, self.instructions_files):
+            df = instructions_file.to_data_frame()
+            # Harmonize element types across jobs, as required for a single table.
+            # Like the intermediate script, which converts the input sequence to a factor, compare symbols as strings
+            df["input_sequence"] = [[[str(e) for e in trial] for trial in instructions_file.input_sequence]]
+            if instructions_file.model_type == PPMModelType.DECAY:
+                df["input_time_sequence"] = [[[float(t) for t in trial]
+                                              for trial in instructions_file.input_time_sequence]]
+            df.insert(0, "job_id", job_id)
+            dfs.append(df)
+
+        return pd.concat(dfs, ignore_index=True)
+
+    def save(self, batch_file_path: Union[str, Path], compression: CompressionPolicy = None):
+        """
+        Write the batch file, i.e., the consolidated instructions table.
+
+        Parameters
+        ----------
+        batch_file_path
+            Where to write to
+        compression
+            Compression policy (also used for the results dataset). If None, the configured default policy is used.
+        """
+        PPMInstructionsFile._save_data_frame(self.to_data_frame(), batch_file_path, compression)
+
+    def run(self, backend: PPMBackend = PPMBackend.R,
+            batch_file_path: Union[str, Path] = None) -> PPMBatchResultsFileData:
+        """
+        Run all jobs.
+
+        Parameters
+        ----------
+        backend
+            PPMBackend.R runs all jobs within one call of the intermediate script.
+            PPMBackend.NATIVE runs all jobs in-process.
+        batch_file_path
+            Relevant for PPMBackend.R. Where to write the batch file to. If None, a new file path within CMME_IO_DIR is
+            used. The results dataset is written next to it.
+
+        Returns
+        -------
+        PPMBatchResultsFileData
+            Results of all jobs
+        """
+        if backend == PPMBackend.NATIVE:
+            dfs = []
+            for job_id, instructions_file in zip(self.job_ids, self.instructions_files):
+                df = run_native_model(instructions_file).results_file_data.df
+                df["symbol"] = df["symbol"].astype(str)  # alphabets may differ between jobs
+                df["job_id"] = job_id
+                dfs.append(df)
+            return PPMBatchResultsFileData(None, pd.concat(dfs, ignore_index=True))
+
+        from cmme.ppmdecay.worker import RSession
+
+        if batch_file_path is None:
+            batch_file_path = new_filepath(self.__class__.__name__, "feather")
+        batch_file_path = Path(batch_file_path)
+        self.save(batch_file_path)
+        print("Batch file written to {}".format(batch_file_path))
+
+        results_dataset_path = RSession.run_batch(batch_file_path,
+                                                  batch_file_path.parent / (batch_file_path.stem + "-results"))
+        return PPMBatch.load_results(results_dataset_path)
+
+    @staticmethod
+    def load_results(results_dataset_path: Union[str, Path]) -> PPMBatchResultsFileData:
+        """
+        Load a results dataset written by the intermediate script.
+
+        Parameters
+        ----------
+        results_dataset_path
+            Directory of the results dataset (partitioned by job_id)
+
+        Returns
+        -------
+        PPMBatchResultsFileData
+            Results of all jobs
+        """
+        dataset = pyarrow.dataset.dataset(str(results_dataset_path), format="feather", partitioning="hive")
+        df = dataset.to_table().to_pandas()
+        df["symbol"] = df["symbol"].astype(str)
+        df["job_id"] = df["job_id"].astype(np.int64)
+        df = df.sort_values("job_id", kind="stable", ignore_index=True)
+        return PPMBatchResultsFileData(str(results_dataset_path), df)
+
+    def results_of_job(self, results: PPMBatchResultsFileData, job_id: int) -> PPMResultsMetaFile:
+        """
+        Return the results of a single job, as if it had been run on its own.
+
+        Parameters
+        ----------
+        results
+            Results of the batch
+        job_id
+            Job of interest
+
+        Returns
+        -------
+        PPMResultsMetaFile
+            Results of the job
+        """
+        df = results.df_by_job(job_id).drop(columns=["job_id"]).reset_index(drop=True)
+        return PPMResultsMetaFile.from_data_frame(self.instructions_file(job_id), df)
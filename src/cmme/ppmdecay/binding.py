@@ -3,21 +3,18 @@ from __future__ import annotations
 import os
 from abc import ABC
 from pathlib import Path
-from typing import Union
+from typing import Any, Dict, Iterator, List, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
 from cmme.config import Config
+from cmme.lib.compression import CompressionPolicy, write_feather
 from cmme.lib.instructions_file import InstructionsFile
 from cmme.lib.results_file import ResultsFile
 from cmme.lib.util import nparray_to_list
 from cmme.ppmdecay.base import PPMModelType, PPMEscapeMethod
-from cmme.ppmdecay.util import list_to_str, str_to_list
-
-# R_HOME specifies the R instance to use by rpy2.
-# Needs to happen before any imports from rpy2
-os.environ["R_HOME"] = str(Config().r_home())
-from rpy2.robjects.packages import SignatureTranslatedAnonymousPackage
+from cmme.ppmdecay.util import list_to_str, str_to_list, data_frame_to_ipc_stream, ipc_stream_to_data_frame
 
 PPM_RUN_FILEPATH = (Path(
     __file__).parent.parent.parent.parent.absolute() / "./res/wrappers/ppm-decay/ppmdecay_intermediate_script.R").resolve()
@@ -25,17 +22,29 @@ PPM_RUN_FILEPATH = (Path(
 
 def invoke_model(instructions_file_path: Union[str, Path]) -> str:
     """
+    Run the intermediate script in the embedded R of this process.
+    The script is compiled once per process, see RSession.
 
     :param instructions_file_path:
-    :return: R console output
+    :return: results file path
+    """
+    from cmme.ppmdecay.worker import RSession  # deferred, as the worker module depends on this module
+
+    return RSession.run_model(instructions_file_path)
+
+
+def invoke_model_in_memory(instructions_file: PPMInstructionsFile) -> PPMResultsMetaFile:
     """
-    with open(PPM_RUN_FILEPATH) as f:
-        r_file_contents = f.read()
-    package = SignatureTranslatedAnonymousPackage(r_file_contents, "ppm-python-bridge")
+    Run the intermediate script in the embedded R of this process, without writing any files:
+    instructions and results are passed as Arrow IPC streams.
 
-    results_file_path = package.ppmdecay_intermediate_script(str(instructions_file_path))[0]
+    :param instructions_file:
+    :return: results held in memory
+    """
+    from cmme.ppmdecay.worker import RSession  # deferred, as the worker module depends on this module
 
-    return results_file_path
+    results_ipc_stream = RSession.run_model_in_memory(data_frame_to_ipc_stream(instructions_file.to_data_frame()))
+    return PPMResultsMetaFile.from_data_frame(instructions_file, ipc_stream_to_data_frame(results_ipc_stream))
 
 
 class PPMInstructionsFile(InstructionsFile, ABC):
@@ -47,28 +56,81 @@ class PPMInstructionsFile(InstructionsFile, ABC):
 
         self.input_sequence = input_sequence
 
+    @staticmethod
+    def _save_data_frame(df: pd.DataFrame, instructions_file_path: Union[str, Path],
+                         compression: CompressionPolicy = None):
+        """
+        Write the instructions table. The compression policy also applies to the results file written by the
+        intermediate script (codec "auto" is resolved there, based on the size of the results).
+        """
+        if compression is None:
+            compression = CompressionPolicy.default()
+        df["results_compression"] = compression.codec.value
+        df["results_compression_level"] = compression.level if compression.level is not None else -1
+        write_feather(df, instructions_file_path, compression)
+
+    def to_data_frame(self, results_file_path: Union[str, Path] = None) -> pd.DataFrame:
+        """
+        Return the single-row table which represents this instructions file.
+
+        Parameters
+        ----------
+        results_file_path
+            File path where to write the results to. If None, the intermediate script provides a value.
+
+        Returns
+        -------
+        pd.DataFrame
+            Table as written by save
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def load(file_path: Union[str, Path]) -> PPMInstructionsFile:
+        """
+        Load an instructions file of either model type.
+
+        Parameters
+        ----------
+        file_path
+            Where the instructions file to load is stored
+
+        Returns
+        -------
+        PPMInstructionsFile
+            Either PPMSimpleInstructionsFile or PPMDecayInstructionsFile
+        """
+        model_type = PPMModelType(pd.read_feather(file_path, columns=["model_type"])["model_type"][0])
+        if model_type == PPMModelType.SIMPLE:
+            return PPMSimpleInstructionsFile.load(file_path)
+        else:
+            return PPMDecayInstructionsFile.load(file_path)
+
 
 class PPMSimpleInstructionsFile(PPMInstructionsFile):
     @classmethod
     def save(cls, instructions_file: PPMSimpleInstructionsFile, instructions_file_path: Union[str, Path],
-             results_file_path: Union[str, Path] = None):
+             results_file_path: Union[str, Path] = None, compression: CompressionPolicy = None):
+        instructions_file._save_data_frame(instructions_file.to_data_frame(results_file_path), instructions_file_path,
+                                           compression)
+
+    def to_data_frame(self, results_file_path: Union[str, Path] = None) -> pd.DataFrame:
         data = {
-            "model_type": [instructions_file.model_type.value],
-            "alphabet_levels": [list_to_str(instructions_file.alphabet_levels)],
-            "order_bound": [instructions_file.order_bound],
-            "input_sequence": [instructions_file.input_sequence],
+            "model_type": [self.model_type.value],
+            "alphabet_levels": [list_to_str(self.alphabet_levels)],
+            "order_bound": [self.order_bound],
+            "input_sequence": [self.input_sequence],
             "results_file_path": [str(results_file_path)] if results_file_path is not None else [""]
         }
 
         data.update({
-            "shortest_deterministic": [instructions_file.shortest_deterministic],
-            "exclusion": [instructions_file.exclusion],
-            "update_exclusion": [instructions_file.update_exclusion],
-            "escape": [instructions_file.escape_method.value]
+            "shortest_deterministic": [self.shortest_deterministic],
+            "exclusion": [self.exclusion],
+            "update_exclusion": [self.update_exclusion],
+            "escape": [self.escape_method.value]
         })
 
-        df = pd.DataFrame.from_dict(data)
-        df.to_feather(instructions_file_path, compression="zstd", compression_level=16)
+        return pd.DataFrame.from_dict(data)
 
     @staticmethod
     def load(file_path: Union[str, Path]) -> PPMSimpleInstructionsFile:
@@ -100,33 +162,36 @@ class PPMSimpleInstructionsFile(PPMInstructionsFile):
 class PPMDecayInstructionsFile(PPMInstructionsFile):
     @classmethod
     def save(cls, instructions_file: PPMDecayInstructionsFile, instructions_file_path: Union[str, Path],
-             results_file_path: Union[str, Path] = None):
+             results_file_path: Union[str, Path] = None, compression: CompressionPolicy = None):
+        instructions_file._save_data_frame(instructions_file.to_data_frame(results_file_path), instructions_file_path,
+                                           compression)
+
+    def to_data_frame(self, results_file_path: Union[str, Path] = None) -> pd.DataFrame:
         data = {
-            "model_type": [instructions_file.model_type.value],
-            "alphabet_levels": [list_to_str(instructions_file.alphabet_levels)],
-            "order_bound": [instructions_file.order_bound],
-            "input_sequence": [instructions_file.input_sequence],
+            "model_type": [self.model_type.value],
+            "alphabet_levels": [list_to_str(self.alphabet_levels)],
+            "order_bound": [self.order_bound],
+            "input_sequence": [self.input_sequence],
             "results_file_path": [str(results_file_path)] if results_file_path is not None else [""]
         }
 
         data.update({
-            "input_time_sequence": [instructions_file.input_time_sequence],
-            "buffer_weight": [instructions_file.buffer_weight],
-            "buffer_length_time": [instructions_file.buffer_length_time],
-            "buffer_length_items": [instructions_file.buffer_length_items],
-            "stm_weight": [instructions_file.stm_weight],
-            "stm_duration": [instructions_file.stm_duration],
-            "only_learn_from_buffer": [instructions_file.only_learn_from_buffer],
-            "only_predict_from_buffer": [instructions_file.only_predict_from_buffer],
-            "ltm_weight": [instructions_file.ltm_weight],
-            "ltm_half_life": [instructions_file.ltm_half_life],
-            "ltm_asymptote": [instructions_file.ltm_asymptote],
-            "noise": [instructions_file.noise],
-            "seed": [instructions_file.seed]
+            "input_time_sequence": [self.input_time_sequence],
+            "buffer_weight": [self.buffer_weight],
+            "buffer_length_time": [self.buffer_length_time],
+            "buffer_length_items": [self.buffer_length_items],
+            "stm_weight": [self.stm_weight],
+            "stm_duration": [self.stm_duration],
+            "only_learn_from_buffer": [self.only_learn_from_buffer],
+            "only_predict_from_buffer": [self.only_predict_from_buffer],
+            "ltm_weight": [self.ltm_weight],
+            "ltm_half_life": [self.ltm_half_life],
+            "ltm_asymptote": [self.ltm_asymptote],
+            "noise": [self.noise],
+            "seed": [self.seed]
         })
 
-        df = pd.DataFrame.from_dict(data)
-        df.to_feather(instructions_file_path, compression="zstd", compression_level=16)
+        return pd.DataFrame.from_dict(data)
 
     @staticmethod
     def load(file_path: Union[str, Path]) -> InstructionsFile:
@@ -180,20 +245,74 @@ class PPMDecayInstructionsFile(PPMInstructionsFile):
         self.seed = seed
 
 
+def _contiguous_ranges(df: pd.DataFrame, columns: List[str]) -> Dict[Any, Tuple[int, int]]:
+    """
+    Return the row range (start, stop) of each key of a data frame whose rows are sorted by the key columns.
+    If there are several key columns, keys are tuples.
+    """
+    if len(df) == 0:
+        return dict()
+    values = [df[column].to_numpy() for column in columns]
+    changes = np.flatnonzero(np.logical_or.reduce([v[1:] != v[:-1] for v in values])) + 1
+    starts = np.concatenate([[0], changes])
+    stops = np.concatenate([changes, [len(df)]])
+    keys = zip(*[v[starts].tolist() for v in values]) if len(columns) > 1 else values[0][starts].tolist()
+    return {key: (int(start), int(stop)) for key, start, stop in zip(keys, starts, stops)}
+
+
+def _sort_rows(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """
+    Return the data frame with rows sorted by the key columns (stable). If they are sorted already, no copy is made.
+    """
+    if len(df) == 0 or pd.MultiIndex.from_frame(df[columns]).is_monotonic_increasing:
+        return df
+    return df.sort_values(columns, kind="stable", ignore_index=True)
+
+
 class PPMResultsFileData(ABC):
+    INDEX_COLUMNS = ["trial_idx"]
+
     def __init__(self, results_file_data_path, df):
+        """
+        Results data. On construction, rows are sorted by trial (if needed) and an index of the row range of each
+        trial is built, such that the rows of a trial are accessed as slice.
+
+        Parameters
+        ----------
+        results_file_data_path
+            Path of the results data file, or None
+        df
+            Results data, i.e., columns symbol, model_order, information_content, entropy, distribution, trial_idx
+        """
         self.results_file_data_path = results_file_data_path
-        self.df = df
-        self.trials = list(set(df["trial_idx"].tolist()))
+        self.df = _sort_rows(df, self.INDEX_COLUMNS)
+        self._build_index()
+
+    def _build_index(self):
+        self._trial_ranges = _contiguous_ranges(self.df, ["trial_idx"])
+        self.trials = list(self._trial_ranges.keys())  # sorted
 
     def df_by_trial(self, trial):
-        if trial not in self.trials:
+        if trial not in self._trial_ranges:
             raise ValueError("trial {} does not exist!".format(trial))
-        return self.df[self.df["trial_idx"] == trial]
+        start, stop = self._trial_ranges[trial]
+        return self.df.iloc[start:stop]
 
     def df_of_last_trial(self):
         return self.df_by_trial(self.trials[-1])
 
+    def iter_trials(self) -> Iterator[Tuple[Any, pd.DataFrame]]:
+        """
+        Iterate over the trials, in ascending order.
+
+        Returns
+        -------
+        Iterator
+            Tuples of trial and its results
+        """
+        for trial in self.trials:
+            yield trial, self.df_by_trial(trial)
+
 
 class PPMSimpleResultsFileData(PPMResultsFileData):
     def __init__(self, results_file_data_path, df):
@@ -205,19 +324,76 @@ class PPMDecayResultsFileData(PPMResultsFileData):
         super().__init__(results_file_data_path, df)
 
 
+class PPMBatchResultsFileData(PPMResultsFileData):
+    INDEX_COLUMNS = ["job_id", "trial_idx"]
+
+    def __init__(self, results_file_data_path, df):
+        """
+        Results of several jobs (see PPMBatch), distinguished by the column job_id.
+
+        Parameters
+        ----------
+        results_file_data_path
+            Path of the partitioned results dataset, or None
+        df
+            Results data, i.e., columns symbol, model_order, information_content, entropy, distribution, trial_idx,
+            and job_id
+        """
+        super().__init__(results_file_data_path, df)
+
+    def _build_index(self):
+        self._job_ranges = _contiguous_ranges(self.df, ["job_id"])
+        self._job_trial_ranges = _contiguous_ranges(self.df, ["job_id", "trial_idx"])
+        self.job_ids = list(self._job_ranges.keys())
+        self.trials = sorted(set(trial for _, trial in self._job_trial_ranges.keys()))
+
+    def df_by_trial(self, trial):
+        if trial not in self.trials:
+            raise ValueError("trial {} does not exist!".format(trial))
+        return pd.concat([self.df_by_job_and_trial(job_id, trial) for job_id in self.job_ids
+                          if (job_id, trial) in self._job_trial_ranges])
+
+    def df_by_job(self, job_id):
+        if job_id not in self._job_ranges:
+            raise ValueError("job_id {} does not exist!".format(job_id))
+        start, stop = self._job_ranges[job_id]
+        return self.df.iloc[start:stop]
+
+    def df_by_job_and_trial(self, job_id, trial):
+        if (job_id, trial) not in self._job_trial_ranges:
+            self.df_by_job(job_id)  # raises if job_id does not exist
+            raise ValueError("trial {} does not exist for job_id {}!".format(trial, job_id))
+        start, stop = self._job_trial_ranges[(job_id, trial)]
+        return self.df.iloc[start:stop]
+
+    def indexed_df(self) -> pd.DataFrame:
+        """
+        Return the results indexed by job_id and trial_idx.
+
+        Returns
+        -------
+        pd.DataFrame
+            Results with a MultiIndex (job_id, trial_idx)
+        """
+        return self.df.set_index(["job_id", "trial_idx"])
+
+
 class PPMResultsMetaFile(ResultsFile):
     @staticmethod
-    def save(results_file: PPMResultsMetaFile, file_path: Union[str, Path]):
+    def save(results_file: PPMResultsMetaFile, file_path: Union[str, Path], compression: CompressionPolicy = None):
+        results_file_data_path = str(file_path).replace(".feather", ".data.feather")
         meta_df = pd.DataFrame.from_dict({
-            "model_type": results_file.model_type,
-            "alphabet_levels": results_file.alphabet_levels,
-            "instructions_file_path": str(results_file.instructions_file_path),
-            "results_file_data_path": str(results_file.results_file_data_path)
+            "model_type": [results_file.model_type.value],
+            "alphabet_levels": [list_to_str(results_file.alphabet_levels)],
+            "instructions_file_path": [str(results_file.instructions_file_path)],
+            "results_file_data_path": [results_file_data_path]
         })
         data_df = results_file.results_file_data
 
-        meta_df.to_feather(file_path, compression="zstd", compression_level=16)
-        data_df.df.to_feather(str(file_path).replace(".feather", ".data.feather"), compression="zstd", compression_level=16)
+        if compression is None:
+            compression = CompressionPolicy.default()
+        write_feather(meta_df, file_path, compression)
+        write_feather(data_df.df, results_file_data_path, compression)
 
     @staticmethod
     def load(file_path: Union[str, Path]) -> PPMResultsMetaFile:
@@ -238,15 +414,64 @@ class PPMResultsMetaFile(ResultsFile):
         return PPMResultsMetaFile(file_path, model_type, alphabet_levels, instructions_file_path,
                                   results_file_data_path)
 
+    @staticmethod
+    def from_data_frame(instructions_file: PPMInstructionsFile, df: pd.DataFrame,
+                        instructions_file_path: Union[str, Path] = None) -> PPMResultsMetaFile:
+        """
+        Create results held in memory only.
+
+        Parameters
+        ----------
+        instructions_file
+            Processed instructions file
+        df
+            Results data, i.e., columns symbol, model_order, information_content, entropy, distribution, trial_idx
+        instructions_file_path
+            Path of the processed instructions file, or None
+
+        Returns
+        -------
+        PPMResultsMetaFile
+            Results
+        """
+        if instructions_file.model_type == PPMModelType.SIMPLE:
+            results_file_data = PPMSimpleResultsFileData(None, df)
+        else:
+            results_file_data = PPMDecayResultsFileData(None, df)
+        alphabet_levels = [str(level) for level in instructions_file.alphabet_levels]
+        return PPMResultsMetaFile(None, instructions_file.model_type, alphabet_levels,
+                                  None if instructions_file_path is None else str(instructions_file_path),
+                                  None, results_file_data)
+
     def __init__(self, results_file_meta_path: Path, model_type: PPMModelType, alphabet_levels, instructions_file_path,
-                 results_file_data_path):
+                 results_file_data_path, results_file_data: PPMResultsFileData = None):
+        """
+        Results of a PPM run.
+
+        Parameters
+        ----------
+        results_file_meta_path
+            Path of the results (meta) file, or None if the results are held in memory only
+        model_type
+            Model type
+        alphabet_levels
+            Alphabet levels
+        instructions_file_path
+            Path of the processed instructions file, or None
+        results_file_data_path
+            Path of the results data file, or None if results_file_data is provided
+        results_file_data
+            Results data. If None, it is read from results_file_data_path.
+        """
         super().__init__()
         self.results_file_meta_path = results_file_meta_path
         self.model_type = model_type
         self.alphabet_levels = alphabet_levels
         self.instructions_file_path = instructions_file_path
         self.results_file_data_path = results_file_data_path
-        if model_type == PPMModelType.SIMPLE:
+        if results_file_data is not None:
+            self.results_file_data = results_file_data
+        elif model_type == PPMModelType.SIMPLE:
             self.results_file_data = self._parse_ppm_simple_results_file_data()
         else:
             self.results_file_data = self._parse_ppm_decay_results_file_data()
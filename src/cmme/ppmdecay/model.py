@@ -1,16 +1,26 @@
 from __future__ import annotations
 
+import multiprocessing
 import random
 from abc import ABC
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Union
+from typing import List, Union
 
 import os
 
+import numpy as np
+import pandas as pd
+
+from cmme.lib.cache import ResultsCache
+from cmme.lib.io import new_filepath
 from cmme.lib.model import ModelBuilder, Model
-from cmme.ppmdecay.base import PPMEscapeMethod, PPMModelType
+from cmme.ppmdecay.base import PPMEscapeMethod, PPMModelType, PPMBackend
 from cmme.ppmdecay.binding import PPMSimpleInstructionsFile, PPMDecayInstructionsFile, \
-    PPMResultsMetaFile, invoke_model, PPMInstructionsFile
+    PPMResultsMetaFile, invoke_model, invoke_model_in_memory, PPMInstructionsFile
+from cmme.ppmdecay.native import run_native_model, run_independent_trials, split_trials
+from cmme.ppmdecay.session import PPMSession
+from cmme.ppmdecay.worker import RWorkerPool
 from cmme.ppmdecay.util import auto_convert_input_sequence
 
 
@@ -91,6 +101,17 @@ class PPMInstructionBuilder(ModelBuilder, ABC): # TODO rename to InstructionBuil
     def to_instructions_file(self) -> PPMInstructionsFile:
         raise NotImplementedError
 
+    def to_session(self) -> PPMSession:
+        """
+        Return an online session (see PPMSession) with this configuration, trained on the input sequence (if any).
+
+        Returns
+        -------
+        PPMSession
+            Session
+        """
+        return PPMSession.from_instructions_file(self.to_instructions_file())
+
 
 class PPMSimpleInstructionBuilder(PPMInstructionBuilder):
     def __init__(self):
@@ -203,7 +224,7 @@ class PPMDecayInstructionBuilder(PPMInstructionBuilder):
     def noise(self, noise: float):
         """
 
-        :param noise: Variance of the Gaussian noise.
+        :param noise: Scale (i.e., standard deviation) of the Gaussian retrieval noise, as new_ppm_decay's noise.
         :return:
         """
         self._noise = noise
@@ -231,12 +252,143 @@ class PPMDecayInstructionBuilder(PPMInstructionBuilder):
 
 
 class PPMModel(Model):
+    ASYNC_CONCURRENCY_LIMITS = {PPMBackend.R: 1}  # the embedded R processes one run at a time (see RSession)
+    DEFAULT_BACKEND = PPMBackend.R
+
     def __init__(self):
         super().__init__()
 
+    @classmethod
+    def run_instructions_file(cls, instructions_file: PPMInstructionsFile, backend: PPMBackend = PPMBackend.R,
+                              archive: bool = False, independent_trials: bool = False,
+                              processes: int = None, cache: ResultsCache = None) -> PPMResultsMetaFile:
+        """
+        Run the model described by the instructions file.
+
+        Parameters
+        ----------
+        instructions_file
+            Instructions file object
+        backend
+            PPMBackend.R runs the R package ppm. PPMBackend.NATIVE runs the model in-process.
+        archive
+            Relevant for PPMBackend.R. If True, instructions and results are written to files (within CMME_IO_DIR).
+            If False, they are passed between Python and R in memory.
+        independent_trials
+            By default, the model learns across trials, i.e., trials are processed one after another. If True,
+            the trials are declared independent: each trial is processed by a new model, and trials are distributed
+            across a pool of worker processes. For PPMBackend.R, instructions and results are written to files.
+        processes
+            Relevant if independent_trials is True. Number of worker processes. If None, the number of CPUs is used.
+        cache
+            If set, results of an identical configuration (instructions, backend, independent_trials) are returned
+            from this cache, and new results are stored in it.
+
+        Returns
+        -------
+        PPMResultsMetaFile
+            Results. Unless archive is True, the results are held in memory only.
+        """
+        if cache is not None:
+            return cache.get_or_run(instructions_file,
+                                    lambda: cls.run_instructions_file(instructions_file, backend, archive,
+                                                                      independent_trials, processes),
+                                    cls.__name__, backend, independent_trials)
+        if independent_trials:
+            return cls._run_independent_trials(instructions_file, backend, processes)
+        if backend == PPMBackend.NATIVE:
+            return run_native_model(instructions_file)
+        if not archive:
+            return invoke_model_in_memory(instructions_file)
+        return super().run_instructions_file(instructions_file)
+
     @staticmethod
-    def run_instructions_file_at_path(file_path: Union[str, Path]) -> PPMResultsMetaFile:
+    def run_instructions_file_at_path(file_path: Union[str, Path],
+                                      backend: PPMBackend = PPMBackend.R) -> PPMResultsMetaFile:
+        """
+        Run the model described by the instructions file at the given path.
+
+        Parameters
+        ----------
+        file_path
+            Path of the instructions file
+        backend
+            PPMBackend.R runs the R package ppm, PPMBackend.NATIVE runs the model in-process.
+
+        Returns
+        -------
+        PPMResultsMetaFile
+            Results. If backend is PPMBackend.NATIVE, the results are held in memory only.
+        """
+        if backend == PPMBackend.NATIVE:
+            return run_native_model(PPMInstructionsFile.load(file_path), file_path)
+
         results_file_path = invoke_model(file_path)
+        return PPMModel._load_results_file(results_file_path)
+
+    @staticmethod
+    def run_instructions_files_at_paths(file_paths: List[Union[str, Path]],
+                                        pool: RWorkerPool = None) -> List[PPMResultsMetaFile]:
+        """
+        Run several instructions files concurrently, each within a worker process of the pool.
+
+        Parameters
+        ----------
+        file_paths
+            Paths of the instructions files
+        pool
+            Pool of R worker processes. If None, a temporary pool is used.
+
+        Returns
+        -------
+        list
+            Results, in the order of file_paths
+        """
+        if pool is None:
+            with RWorkerPool(max(1, min(len(file_paths), os.cpu_count() or 1))) as temporary_pool:
+                results_file_paths = temporary_pool.map(file_paths)
+        else:
+            results_file_paths = pool.map(file_paths)
+        return [PPMModel._load_results_file(results_file_path) for results_file_path in results_file_paths]
+
+    @staticmethod
+    def _run_independent_trials(instructions_file: PPMInstructionsFile, backend: PPMBackend,
+                                processes: int = None) -> PPMResultsMetaFile:
+        trial_count = len(instructions_file.input_sequence)
+        processes = max(1, min(trial_count, processes if processes is not None else (os.cpu_count() or 1)))
+
+        if backend == PPMBackend.NATIVE:
+            # Contiguous shards of trials, one per process
+            shards = [shard.tolist() for shard in np.array_split(np.arange(trial_count), processes)]
+            if processes == 1:
+                dfs = [run_independent_trials(instructions_file, shards[0])]
+            else:
+                # Each process receives its shard's trials only
+                shard_instructions_files = split_trials(instructions_file, shards)
+                with ProcessPoolExecutor(max_workers=processes,
+                                         mp_context=multiprocessing.get_context("spawn")) as executor:
+                    dfs = list(executor.map(run_independent_trials, shard_instructions_files,
+                                            [list(range(len(shard))) for shard in shards]))
+                for df, shard in zip(dfs, shards):
+                    df["trial_idx"] += shard[0]  # refer to the trials of instructions_file
+        else:
+            file_paths = []
+            for trial_instructions_file in split_trials(instructions_file):
+                file_path = new_filepath(PPMModel.__name__ + "-trial", "feather")
+                trial_instructions_file.save_self(file_path)
+                file_paths.append(file_path)
+            with RWorkerPool(processes) as pool:
+                results = PPMModel.run_instructions_files_at_paths(file_paths, pool)
+            dfs = []
+            for trial_idx, results_file in enumerate(results):
+                df = results_file.results_file_data.df.copy()
+                df["trial_idx"] = trial_idx + 1
+                dfs.append(df)
+
+        return PPMResultsMetaFile.from_data_frame(instructions_file, pd.concat(dfs, ignore_index=True))
+
+    @staticmethod
+    def _load_results_file(results_file_path: Union[str, Path]) -> PPMResultsMetaFile:
         if not os.path.exists(results_file_path):
             raise ValueError("Unexpectedly, the results file could not be loaded. There exists no such file at {}."\
                              .format(results_file_path))
@@ -0,0 +1,616 @@
+from __future__ import annotations
+
+import copy
+import json
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from cmme.ppmdecay.base import PPMEscapeMethod, PPMModelType
+from cmme.ppmdecay.binding import PPMInstructionsFile, PPMResultsMetaFile
+from cmme.ppmdecay.trie import ContextTrie
+
+
+class PPMSimpleEngine:
+    """
+    In-process implementation of PPM, following the semantics of the R package ppm's new_ppm_simple.
+
+    Observed n-grams are stored in a context tree (see ContextTrie), which maps each context to the counts of the
+    symbols observed after it. The engine is stateful: as with the R model, consecutive calls of model_seq continue
+    learning from where the previous call ended.
+    """
+
+    def __init__(self, alphabet_size: int, order_bound: int = 10, shortest_deterministic: bool = True,
+                 exclusion: bool = True, update_exclusion: bool = True,
+                 escape_method: PPMEscapeMethod = PPMEscapeMethod.C):
+        if not alphabet_size >= 1:
+            raise ValueError("alphabet_size invalid! Value must be greater than or equal 1.")
+        if not order_bound >= 0:
+            raise ValueError("order_bound invalid! Value must be greater than or equal 0.")
+
+        self.alphabet_size = int(alphabet_size)
+        self.order_bound = int(order_bound)
+        self.shortest_deterministic = bool(shortest_deterministic)
+        self.exclusion = bool(exclusion)
+        self.update_exclusion = bool(update_exclusion)
+        self.escape_method = PPMEscapeMethod(escape_method)
+
+        self.counts = ContextTrie(self.alphabet_size)
+
+    def parameters(self) -> dict:
+        """
+        Return the constructor arguments of this engine (JSON-serializable).
+        """
+        return {"alphabet_size": self.alphabet_size, "order_bound": self.order_bound,
+                "shortest_deterministic": self.shortest_deterministic, "exclusion": self.exclusion,
+                "update_exclusion": self.update_exclusion, "escape_method": self.escape_method.value}
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """
+        Return the learned state (context tree) as arrays, e.g., to write them with np.savez.
+
+        Returns
+        -------
+        dict
+            Arrays of the context tree (see ContextTrie.get_state)
+        """
+        return self.counts.get_state()
+
+    def set_state(self, state: Dict[str, np.ndarray]):
+        """
+        Replace the learned state by the given one (see get_state).
+        """
+        self.counts.set_state(state)
+
+    def memory_footprint(self) -> Dict[str, int]:
+        """
+        Return the memory footprint of the learned state (see ContextTrie.memory_footprint).
+        """
+        return self.counts.memory_footprint()
+
+    def _max_order(self, history: List[int], time: float) -> int:
+        """
+        Return the highest order available for the next event.
+        """
+        return min(self.order_bound, len(history))
+
+    def _weights(self, history: List[int], max_order: int, time: float) -> List[np.ndarray]:
+        """
+        Return, for each order 0, ..., max_order, the weights of all symbols following the context preceding the next
+        event, or None if the context was never observed.
+        """
+        return [self.counts.successor_counts(node) if node != ContextTrie.NONE else None
+                for node in self.counts.context_nodes(history, max_order)]
+
+    def _select_model_order(self, weights: List[np.ndarray]) -> int:
+        model_order = -1
+        for order in range(len(weights) - 1, -1, -1):
+            if weights[order] is not None and weights[order].sum() > 0:
+                model_order = order
+                break
+
+        if self.shortest_deterministic:
+            for order in range(0, model_order + 1):
+                if weights[order] is not None and np.count_nonzero(weights[order]) == 1:
+                    return order
+
+        return model_order
+
+    def _escape(self, weights: np.ndarray) -> Tuple[np.ndarray, float]:
+        """
+        Return the (unnormalized by lower orders) symbol probabilities alpha and the escape probability gamma
+        of a context, given its symbol weights.
+        """
+        total = weights.sum()
+        seen = weights > 0
+        distinct = np.count_nonzero(seen)
+
+        match self.escape_method:
+            case PPMEscapeMethod.A:
+                alpha = weights / (total + 1)
+                gamma = 1 / (total + 1)
+            case PPMEscapeMethod.B:
+                alpha = np.where(seen, weights - 1, 0) / total
+                gamma = distinct / total
+            case PPMEscapeMethod.C:
+                alpha = weights / (total + distinct)
+                gamma = distinct / (total + distinct)
+            case PPMEscapeMethod.D:
+                alpha = np.where(seen, weights - 0.5, 0) / total
+                gamma = distinct / (2 * total)
+            case PPMEscapeMethod.AX:
+                singletons = np.count_nonzero(weights == 1) + 1
+                alpha = weights / (total + singletons)
+                gamma = singletons / (total + singletons)
+            case _:
+                raise ValueError("escape_method invalid! Unknown value {}.".format(self.escape_method))
+
+        return alpha, gamma
+
+    def _interpolate(self, weights: List[np.ndarray], model_order: int) -> Tuple[np.ndarray, float]:
+        """
+        Return the interpolated symbol probabilities (from model_order down to order -1), and the escape probability
+        which is left unassigned because exclusion removed every symbol before order -1. Both sum to 1.
+        """
+        distribution = np.zeros(self.alphabet_size)
+        excluded = np.zeros(self.alphabet_size, dtype=bool)
+        remaining_mass = 1.0
+
+        for order in range(model_order, -1, -1):
+            if weights[order] is None:
+                continue
+            w = weights[order]
+            if self.exclusion:
+                w = np.where(excluded, 0, w)
+            if not w.sum() > 0:
+                continue
+
+            alpha, gamma = self._escape(w)
+            distribution += remaining_mass * alpha
+            remaining_mass *= gamma
+            if self.exclusion:
+                # Only exclude symbols which actually received probability mass (cf. escape methods B and D)
+                excluded |= alpha > 0
+
+        # Order -1: uniform distribution over all (non-excluded) symbols
+        remaining_symbols = ~excluded if self.exclusion else np.ones(self.alphabet_size, dtype=bool)
+        if remaining_symbols.any():
+            distribution[remaining_symbols] += remaining_mass / np.count_nonzero(remaining_symbols)
+            remaining_mass = 0.0
+
+        return distribution, remaining_mass
+
+    def _distribution(self, weights: List[np.ndarray], model_order: int) -> np.ndarray:
+        distribution, unassigned_mass = self._interpolate(weights, model_order)
+        if unassigned_mass > 0:
+            # Every symbol was excluded: the escape probability is spread proportionally over all symbols, i.e., the
+            # distribution is normalized
+            distribution *= 1 / (1 - unassigned_mass)
+        return distribution
+
+    def predict(self, history: List[int], time: float = None) -> Tuple[np.ndarray, int]:
+        """
+        Predict the next event given the preceding events of the current sequence.
+
+        Parameters
+        ----------
+        history
+            Symbol indices of the preceding events
+        time
+            Timestamp of the event to predict
+
+        Returns
+        -------
+        (np.ndarray, int)
+            Probability distribution over the alphabet, and the model order used for the prediction
+        """
+        weights = self._weights(history, self._max_order(history, time), time)
+        model_order = self._select_model_order(weights)
+        return self._distribution(weights, model_order), model_order
+
+    def update(self, history: List[int], symbol: int, time: float = None):
+        """
+        Learn from an observed event.
+
+        Parameters
+        ----------
+        history
+            Symbol indices of the preceding events
+        symbol
+            Symbol index of the observed event
+        time
+            Timestamp of the observed event
+        """
+        for node in reversed(self.counts.context_nodes(history, self._max_order(history, time), create=True)):
+            already_seen = self.counts.increment(node, symbol) > 0
+            if self.update_exclusion and already_seen:
+                break
+
+    def model_seq(self, sequence: List[int], time_sequence: List[float] = None, train: bool = True,
+                  predict: bool = True) -> Dict[str, list]:
+        """
+        Process a sequence event by event, i.e., predict each event and learn from it afterwards.
+
+        Parameters
+        ----------
+        sequence
+            Symbol indices (0-based) of the sequence
+        time_sequence
+            Timestamps of the sequence's events
+        train
+            Whether to learn from the sequence
+        predict
+            Whether to predict the sequence's events
+
+        Returns
+        -------
+        dict
+            Columns model_order, information_content, entropy, and distribution
+        """
+        sequence = [int(s) for s in sequence]
+        if time_sequence is None:
+            time_sequence = list(range(len(sequence)))
+        if len(time_sequence) != len(sequence):
+            raise ValueError("time_sequence invalid! Its length must match the length of sequence.")
+
+        results = {"model_order": [], "information_content": [], "entropy": [], "distribution": []}
+        for pos, (symbol, time) in enumerate(zip(sequence, time_sequence)):
+            if not 0 <= symbol < self.alphabet_size:
+                raise ValueError("sequence invalid! Symbol index {} is out of range.".format(symbol))
+            history = sequence[max(0, pos - self.order_bound):pos]  # only order_bound events are relevant
+            if predict:
+                distribution, model_order = self.predict(history, time)
+                nonzero = distribution[distribution > 0]
+                results["model_order"].append(model_order)
+                results["information_content"].append(-np.log2(distribution[symbol]))
+                results["entropy"].append(-np.sum(nonzero * np.log2(nonzero)))
+                results["distribution"].append(distribution)
+            if train:
+                self.update(history, symbol, time)
+
+        return results
+
+
+class PPMDecayEngine(PPMSimpleEngine):
+    """
+    In-process implementation of PPM-Decay, following the semantics of the R package ppm's new_ppm_decay.
+
+    Instead of counts, each context node of the context tree stores its observations (symbol and position, see
+    ContextTrie.add_occurrence). When predicting, the weights of all
+    observations are evaluated at once by the decay kernel (buffer, short-term memory, long-term memory),
+    summed per symbol, and perturbed by retrieval noise. As in new_ppm_decay, noise is the scale (i.e., standard
+    deviation) of the Gaussian noise, and escape method A is used, without exclusion, update exclusion, or shortest
+    deterministic contexts.
+    """
+
+    def __init__(self, alphabet_size: int, order_bound: int = 10,
+                 buffer_weight: float = 1, buffer_length_time: float = 0, buffer_length_items: int = 0,
+                 only_learn_from_buffer: bool = False, only_predict_from_buffer: bool = False,
+                 stm_weight: float = 1, stm_duration: float = 0,
+                 ltm_weight: float = 1, ltm_half_life: float = 10, ltm_asymptote: float = 0,
+                 noise: float = 0, seed: int = 1):
+        super().__init__(alphabet_size, order_bound, shortest_deterministic=False, exclusion=False,
+                         update_exclusion=False, escape_method=PPMEscapeMethod.A)
+        if not ltm_half_life > 0:
+            raise ValueError("ltm_half_life invalid! Value must be greater than 0.")
+        if not noise >= 0:
+            raise ValueError("noise invalid! Value must be greater than or equal 0.")
+
+        self.buffer_weight = float(buffer_weight)
+        self.buffer_length_time = float(buffer_length_time)
+        self.buffer_length_items = int(buffer_length_items)
+        self.only_learn_from_buffer = bool(only_learn_from_buffer)
+        self.only_predict_from_buffer = bool(only_predict_from_buffer)
+        self.stm_weight = float(stm_weight)
+        self.stm_duration = float(stm_duration)
+        self.ltm_weight = float(ltm_weight)
+        self.ltm_half_life = float(ltm_half_life)
+        self.ltm_asymptote = float(ltm_asymptote)
+        self.noise = float(noise)
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+        self.counts = ContextTrie(self.alphabet_size, occurrences=True)
+        # Timestamps of all observed events (across sequences), indexed by position
+        self.times = np.empty(64)
+        self.observed_events = 0
+
+    def parameters(self) -> dict:
+        return {"alphabet_size": self.alphabet_size, "order_bound": self.order_bound,
+                "buffer_weight": self.buffer_weight, "buffer_length_time": self.buffer_length_time,
+                "buffer_length_items": self.buffer_length_items, "only_learn_from_buffer": self.only_learn_from_buffer,
+                "only_predict_from_buffer": self.only_predict_from_buffer, "stm_weight": self.stm_weight,
+                "stm_duration": self.stm_duration, "ltm_weight": self.ltm_weight, "ltm_half_life": self.ltm_half_life,
+                "ltm_asymptote": self.ltm_asymptote, "noise": self.noise, "seed": self.seed}
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """
+        Return the learned state (context tree with observations, timestamps, random number generator) as arrays.
+
+        Returns
+        -------
+        dict
+            Arrays of the context tree (see ContextTrie.get_state), times, rng_state (JSON)
+        """
+        return {
+            **self.counts.get_state(),
+            "times": self.times[:self.observed_events].copy(),
+            "rng_state": np.array(json.dumps(self.rng.bit_generator.state))
+        }
+
+    def set_state(self, state: Dict[str, np.ndarray]):
+        self.counts.set_state(state)
+        self.observed_events = len(state["times"])
+        self.times = np.empty(max(64, self.observed_events))
+        self.times[:self.observed_events] = state["times"]
+        self.rng.bit_generator.state = json.loads(str(state["rng_state"]))
+
+    def memory_footprint(self) -> Dict[str, int]:
+        """
+        Return the memory footprint of the learned state, i.e., of the context tree (see ContextTrie.memory_footprint)
+        and the timestamps.
+        """
+        footprint = self.counts.memory_footprint()
+        footprint["allocated_bytes"] += self.times.nbytes
+        footprint["used_bytes"] += self.observed_events * self.times.itemsize
+        return footprint
+
+    def _buffer_exit_times(self, positions: np.ndarray, time: float) -> np.ndarray:
+        """
+        Return the times at which the events at the given positions leave (or will leave) the buffer, given that the
+        next event occurs at the given time.
+        """
+        exit_times = self.times[positions] + self.buffer_length_time
+        # An event leaves the buffer as soon as buffer_length_items further events arrived
+        displacing_positions = positions + self.buffer_length_items
+        displacing_times = np.where(displacing_positions < self.observed_events,
+                                    self.times[np.minimum(displacing_positions, self.observed_events - 1)],
+                                    np.where(displacing_positions == self.observed_events, time, np.inf))
+        return np.minimum(exit_times, displacing_times)
+
+    def decay_kernel(self, time_since_buffer_exit: np.ndarray) -> np.ndarray:
+        """
+        Weights of observations, given the time elapsed since they left the buffer (negative while being in the
+        buffer).
+
+        Parameters
+        ----------
+        time_since_buffer_exit
+            np.ndarray of elapsed times
+
+        Returns
+        -------
+        np.ndarray
+            Weights
+        """
+        dt = np.asarray(time_since_buffer_exit, dtype=float)
+        weights = np.full(dt.shape, self.buffer_weight)
+        weights[dt >= 0] = 0
+
+        in_stm = (dt >= 0) & (dt < self.stm_duration)
+        if in_stm.any() and self.stm_weight > 0:
+            # Exponential decay from stm_weight to ltm_weight over the duration of the short-term memory
+            weights[in_stm] = self.stm_weight * np.power(self.ltm_weight / self.stm_weight,
+                                                         dt[in_stm] / self.stm_duration)
+
+        in_ltm = dt >= self.stm_duration
+        weights[in_ltm] = self.ltm_asymptote + (self.ltm_weight - self.ltm_asymptote) * \
+            np.power(2.0, -(dt[in_ltm] - self.stm_duration) / self.ltm_half_life)
+
+        return weights
+
+    def _buffered_events_count(self, history: List[int], time: float) -> int:
+        """
+        Return the number of most recent events of the current sequence which are still in the buffer.
+        """
+        positions = np.arange(self.observed_events - len(history), self.observed_events)
+        out_of_buffer = np.flatnonzero(self._buffer_exit_times(positions, time) <= time)
+        return len(history) if len(out_of_buffer) == 0 else len(history) - out_of_buffer[-1] - 1
+
+    def _max_order(self, history: List[int], time: float) -> int:
+        max_order = super()._max_order(history, time)
+        if self.only_predict_from_buffer:
+            max_order = min(max_order, self._buffered_events_count(history, time))
+        return max_order
+
+    def _weights(self, history: List[int], max_order: int, time: float) -> List[np.ndarray]:
+        return [self._context_weights(node, time) if node != ContextTrie.NONE else None
+                for node in self.counts.context_nodes(history, max_order)]
+
+    def _context_weights(self, node: int, time: float) -> np.ndarray:
+        """
+        Return the weights of all symbols following the context node, or None if the context was never observed.
+        """
+        occurrences = self.counts.occurrences(node)
+        if occurrences is None:
+            return None
+
+        symbols, positions = occurrences
+        kernel_weights = self.decay_kernel(time - self._buffer_exit_times(positions, time))
+        weights = np.bincount(symbols, weights=kernel_weights, minlength=self.alphabet_size)
+        if self.noise > 0:
+            # As in new_ppm_decay, retrieval noise (with standard deviation noise) perturbs the summed weight of each
+            # observed n-gram once
+            observed = np.bincount(symbols, minlength=self.alphabet_size) > 0
+            noise = self.rng.normal(0, self.noise, np.count_nonzero(observed))
+            weights[observed] = np.maximum(weights[observed] + noise, 0)
+
+        return weights
+
+    def predict(self, history: List[int], time: float = None) -> Tuple[np.ndarray, int]:
+        if time is None:
+            raise ValueError("time invalid! PPM-Decay requires the timestamp of each event.")
+        return super().predict(history, time)
+
+    def update(self, history: List[int], symbol: int, time: float = None):
+        if time is None:
+            raise ValueError("time invalid! PPM-Decay requires the timestamp of each event.")
+
+        if self.observed_events == len(self.times):
+            self.times = np.resize(self.times, 2 * len(self.times))
+        self.times[self.observed_events] = time
+
+        max_order = min(self.order_bound, len(history))
+        if self.only_learn_from_buffer:
+            max_order = min(max_order, self._buffered_events_count(history, time))
+        for node in self.counts.context_nodes(history, max_order, create=True):
+            self.counts.add_occurrence(node, symbol, self.observed_events)
+
+        self.observed_events += 1
+
+
+def encode_sequence(sequence: list, alphabet_levels: list) -> List[int]:
+    """
+    Map a sequence to symbol indices, comparing elements and alphabet levels by their string representation
+    (which corresponds to how the R intermediate script creates factors).
+
+    Parameters
+    ----------
+    sequence
+        List of events
+    alphabet_levels
+        List of alphabet levels
+
+    Returns
+    -------
+    list
+        Symbol index (0-based) for each event
+    """
+    level_indices = {str(level): idx for idx, level in enumerate(alphabet_levels)}
+    try:
+        return [level_indices[str(e)] for e in sequence]
+    except KeyError as e:
+        raise ValueError("sequence invalid! Element {} is not part of alphabet_levels.".format(e))
+
+
+def run_engine(engine: PPMSimpleEngine, alphabet_levels: list, input_sequence: List[list],
+               input_time_sequence: List[list] = None) -> pd.DataFrame:
+    """
+    Process all trials with the given engine and collect the results as the R intermediate script does.
+
+    Parameters
+    ----------
+    engine
+        Engine to use
+    alphabet_levels
+        List of alphabet levels
+    input_sequence
+        List of trials
+    input_time_sequence
+        List of timestamps per trial, or None
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns symbol, model_order, information_content, entropy, distribution, trial_idx (1-based)
+    """
+    levels = [str(level) for level in alphabet_levels]
+    trial_dfs = []
+    for trial_idx, trial in enumerate(input_sequence):
+        time_sequence = input_time_sequence[trial_idx] if input_time_sequence is not None else None
+        results = engine.model_seq(encode_sequence(trial, levels), time_sequence)
+        trial_df = pd.DataFrame({
+            "symbol": pd.Categorical([str(e) for e in trial], categories=levels),
+            **results
+        })
+        trial_df["trial_idx"] = trial_idx + 1
+        trial_dfs.append(trial_df)
+
+    return pd.concat(trial_dfs, ignore_index=True)
+
+
+def create_engine(instructions_file: PPMInstructionsFile) -> PPMSimpleEngine:
+    """
+    Return a new (untrained) engine, configured as described by the instructions file.
+
+    Parameters
+    ----------
+    instructions_file
+        Instructions file object
+
+    Returns
+    -------
+    PPMSimpleEngine
+        PPMSimpleEngine or PPMDecayEngine
+    """
+    if instructions_file.model_type == PPMModelType.SIMPLE:
+        return PPMSimpleEngine(len(instructions_file.alphabet_levels), instructions_file.order_bound,
+                               instructions_file.shortest_deterministic, instructions_file.exclusion,
+                               instructions_file.update_exclusion, instructions_file.escape_method)
+    elif instructions_file.model_type == PPMModelType.DECAY:
+        return PPMDecayEngine(len(instructions_file.alphabet_levels), instructions_file.order_bound,
+                              instructions_file.buffer_weight, instructions_file.buffer_length_time,
+                              instructions_file.buffer_length_items, instructions_file.only_learn_from_buffer,
+                              instructions_file.only_predict_from_buffer,
+                              instructions_file.stm_weight, instructions_file.stm_duration,
+                              instructions_file.ltm_weight, instructions_file.ltm_half_life,
+                              instructions_file.ltm_asymptote, instructions_file.noise, instructions_file.seed)
+    raise ValueError("instructions_file invalid! The native backend does not support model type {}."
+                     .format(instructions_file.model_type))
+
+
+def split_trials(instructions_file: PPMInstructionsFile,
+                 shards: List[List[int]] = None) -> List[PPMInstructionsFile]:
+    """
+    Return one instructions file per shard of trials, each with the configuration of the given instructions file,
+    but only the shard's trials.
+
+    Parameters
+    ----------
+    instructions_file
+        Instructions file object
+    shards
+        Trials (0-based) per shard. If None, each trial is a shard of its own.
+
+    Returns
+    -------
+    list
+        Instructions files, in the order of the shards
+    """
+    if shards is None:
+        shards = [[trial_idx] for trial_idx in range(len(instructions_file.input_sequence))]
+    shard_instructions_files = []
+    for shard in shards:
+        shard_instructions_file = copy.copy(instructions_file)
+        shard_instructions_file.input_sequence = [instructions_file.input_sequence[trial_idx] for trial_idx in shard]
+        if instructions_file.model_type == PPMModelType.DECAY:
+            shard_instructions_file.input_time_sequence = [instructions_file.input_time_sequence[trial_idx]
+                                                           for trial_idx in shard]
+        shard_instructions_files.append(shard_instructions_file)
+    return shard_instructions_files
+
+
+def run_independent_trials(instructions_file: PPMInstructionsFile, trial_indices: List[int]) -> pd.DataFrame:
+    """
+    Run the given trials, each with a new engine, i.e., nothing learned from one trial is used for another one.
+
+    Parameters
+    ----------
+    instructions_file
+        Instructions file object
+    trial_indices
+        Trials to run (0-based)
+
+    Returns
+    -------
+    pd.DataFrame
+        Results of the trials (see run_engine), with trial_idx referring to the trials of instructions_file
+    """
+    trial_instructions_files = split_trials(instructions_file)
+    dfs = []
+    for trial_idx in trial_indices:
+        trial_instructions_file = trial_instructions_files[trial_idx]
+        df = run_engine(create_engine(trial_instructions_file), trial_instructions_file.alphabet_levels,
+                        trial_instructions_file.input_sequence,
+                        trial_instructions_file.input_time_sequence
+                        if trial_instructions_file.model_type == PPMModelType.DECAY else None)
+        df["trial_idx"] = trial_idx + 1
+        dfs.append(df)
+    return pd.concat(dfs, ignore_index=True)
+
+
+def run_native_model(instructions_file: PPMInstructionsFile,
+                     instructions_file_path: Union[str, Path] = None) -> PPMResultsMetaFile:
+    """
+    Run the model described by the instructions file in-process, i.e., without R.
+
+    Parameters
+    ----------
+    instructions_file
+        Instructions file object
+    instructions_file_path
+        Path of the instructions file (if any), which is referenced by the results
+
+    Returns
+    -------
+    PPMResultsMetaFile
+        Results held in memory. Use save_self to write them to disk.
+    """
+    engine = create_engine(instructions_file)
+    df = run_engine(engine, instructions_file.alphabet_levels, instructions_file.input_sequence,
+                    instructions_file.input_time_sequence if instructions_file.model_type == PPMModelType.DECAY
+                    else None)
+
+    return PPMResultsMetaFile.from_data_frame(instructions_file, df, instructions_file_path)
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import io
+import json
+from typing import List
+
+import numpy as np
+
+from cmme.ppmdecay.base import PPMModelType
+from cmme.ppmdecay.binding import PPMInstructionsFile
+from cmme.ppmdecay.native import PPMSimpleEngine, PPMDecayEngine, create_engine, encode_sequence
+
+
+class PPMSession:
+    """
+    Online PPM: events are processed one at a time, as they arrive, using the native engine.
+
+    The session keeps the learned context tree and the order_bound most recent events of the current trial only.
+    Hence, updating the simple model costs O(order_bound). The session's state can be saved to bytes (snapshot) and
+    restored later, e.g., to checkpoint long-running corpora.
+    """
+    ENGINES = {PPMModelType.SIMPLE: PPMSimpleEngine, PPMModelType.DECAY: PPMDecayEngine}
+
+    def __init__(self, engine: PPMSimpleEngine, alphabet_levels: list):
+        """
+        Parameters
+        ----------
+        engine
+            Engine to use (PPMSimpleEngine or PPMDecayEngine), possibly already trained
+        alphabet_levels
+            Alphabet levels, in the order of the engine's symbol indices
+        """
+        if len(alphabet_levels) != engine.alphabet_size:
+            raise ValueError("alphabet_levels invalid! Its length must match the alphabet size of the engine.")
+
+        self.engine = engine
+        self.model_type = PPMModelType.DECAY if isinstance(engine, PPMDecayEngine) else PPMModelType.SIMPLE
+        self.alphabet_levels = list(alphabet_levels)
+        self._levels = [str(level) for level in self.alphabet_levels]
+        self.history: List[int] = []  # most recent events of the current trial
+        self.last_time = None
+
+    @staticmethod
+    def from_instructions_file(instructions_file: PPMInstructionsFile) -> PPMSession:
+        """
+        Return a session configured as described by the instructions file. If the instructions file contains an
+        input sequence, the session is trained on it first (trial by trial), such that the session continues
+        after its last event.
+
+        Parameters
+        ----------
+        instructions_file
+            Instructions file object
+
+        Returns
+        -------
+        PPMSession
+            Session
+        """
+        session = PPMSession(create_engine(instructions_file), instructions_file.alphabet_levels)
+        for trial_idx, trial in enumerate(instructions_file.input_sequence):
+            if trial_idx > 0:
+                session.new_trial()
+            times = instructions_file.input_time_sequence[trial_idx] \
+                if instructions_file.model_type == PPMModelType.DECAY else [None] * len(trial)
+            for symbol, time in zip(trial, times):
+                session.update(symbol, time, predict=False)
+        return session
+
+    def _time(self, time: float = None) -> float:
+        if self.model_type == PPMModelType.DECAY and time is None:
+            # Like PPMInstructionBuilder's default time sequence: 0, 1, 2, ...
+            return self.last_time + 1 if self.last_time is not None else 0
+        return time
+
+    def _results(self, distribution: np.ndarray, model_order: int, symbol_idx: int = None) -> dict:
+        nonzero = distribution[distribution > 0]
+        results = {
+            "model_order": model_order,
+            "entropy": float(-np.sum(nonzero * np.log2(nonzero))),
+            "distribution": distribution
+        }
+        if symbol_idx is not None:
+            results["information_content"] = float(-np.log2(distribution[symbol_idx]))
+        return results
+
+    def predict(self, symbol=None, time: float = None) -> dict:
+        """
+        Predict the next event, without learning.
+
+        Parameters
+        ----------
+        symbol
+            If not None, the information content of this symbol is returned as well
+        time
+            Relevant for PPM-Decay. Timestamp of the next event. If None, the last timestamp + 1 is used.
+
+        Returns
+        -------
+        dict
+            model_order, entropy, distribution (over alphabet_levels), and information_content (if symbol is given)
+        """
+        symbol_idx = encode_sequence([symbol], self._levels)[0] if symbol is not None else None
+        distribution, model_order = self.engine.predict(self.history, self._time(time))
+        return self._results(distribution, model_order, symbol_idx)
+
+    def update(self, symbol, time: float = None, predict: bool = True) -> dict:
+        """
+        Process the next event: predict it, then learn from it.
+
+        Parameters
+        ----------
+        symbol
+            Observed symbol (an element of alphabet_levels)
+        time
+            Relevant for PPM-Decay. Timestamp of the event. If None, the last timestamp + 1 is used.
+        predict
+            Whether to predict the event before learning from it
+
+        Returns
+        -------
+        dict
+            If predict is True: model_order, entropy, distribution, and information_content of the event
+        """
+        symbol_idx = encode_sequence([symbol], self._levels)[0]
+        time = self._time(time)
+
+        results = dict()
+        if predict:
+            results = self._results(*self.engine.predict(self.history, time), symbol_idx)
+        self.engine.update(self.history, symbol_idx, time)
+
+        self.history.append(symbol_idx)
+        if len(self.history) > self.engine.order_bound:
+            del self.history[0]
+        if time is not None:
+            self.last_time = time
+        return results
+
+    def new_trial(self):
+        """
+        Start a new trial: subsequent events are not predicted from the events of the previous trial (but from
+        what was learned from them).
+        """
+        self.history = []
+
+    def snapshot(self) -> bytes:
+        """
+        Return the session's state (configuration, learned context tree, current trial).
+
+        Returns
+        -------
+        bytes
+            State, see restore
+        """
+        meta = json.dumps({"model_type": self.model_type.value, "parameters": self.engine.parameters(),
+                           "alphabet_levels": self.alphabet_levels, "last_time": self.last_time},
+                          default=lambda value: value.item())  # NumPy scalars
+        buffer = io.BytesIO()
+        np.savez(buffer, meta=np.array(meta), history=np.array(self.history, dtype=np.int64),
+                 **self.engine.get_state())
+        return buffer.getvalue()
+
+    @staticmethod
+    def restore(snapshot: bytes) -> PPMSession:
+        """
+        Return the session whose state was saved by snapshot.
+
+        Parameters
+        ----------
+        snapshot
+            State, as returned by snapshot
+
+        Returns
+        -------
+        PPMSession
+            Session, which continues where the snapshot was taken
+        """
+        with np.load(io.BytesIO(snapshot)) as data:
+            state = {name: data[name] for name in data.files}
+        meta = json.loads(str(state.pop("meta")))
+
+        engine = PPMSession.ENGINES[PPMModelType(meta["model_type"])](**meta["parameters"])
+        engine.set_state(state)
+        session = PPMSession(engine, meta["alphabet_levels"])
+        session.history = state["history"].tolist()
+        session.last_time = meta["last_time"]
+        return session
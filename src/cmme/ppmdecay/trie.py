@@ -0,0 +1,440 @@
+from __future__ import annotations
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+def _symbol_dtype(alphabet_size: int) -> np.dtype:
+    for dtype in [np.uint8, np.uint16, np.uint32]:
+        if alphabet_size <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+class ContextTrie:
+    """
+    Context tree of PPM, stored as struct-of-arrays (typed NumPy arrays instead of one object per node).
+
+    The tree is a suffix trie: starting at the root (the empty context), the path of a context visits its symbols
+    from the most recent to the oldest one. Thus, the contexts of all orders preceding an event lie on a single path,
+    and are found in O(order). Each context node references a linked list of successor entries (symbol, count),
+    i.e., the symbols observed after the context. Children and successors are singly linked lists (first/next index
+    arrays). Index -1 denotes "none".
+
+    Optionally (as used by PPM-Decay), each context node also references the individual observations after it, i.e.,
+    occurrence entries (symbol, position). They are stored in a linked list of blocks per node: each block is a
+    contiguous range of the occurrence arrays, and each further block of a node has twice the capacity. Thus, the
+    occurrences of a context are gathered from O(log(occurrences)) array slices.
+    """
+    NONE = -1
+    INITIAL_CAPACITY = 1024
+    MIN_BLOCK_CAPACITY = 8
+
+    def __init__(self, alphabet_size: int, alphabet_levels: list = None, capacity: int = INITIAL_CAPACITY,
+                 occurrences: bool = False):
+        """
+        Parameters
+        ----------
+        alphabet_size
+            Number of symbols
+        alphabet_levels
+            Alphabet levels, in the order of the symbol indices. If None, symbols are referred to by their index.
+        capacity
+            Number of context nodes and successor entries to allocate initially. Arrays grow by doubling.
+        occurrences
+            Whether to store occurrence entries (see add_occurrence)
+        """
+        if not alphabet_size >= 1:
+            raise ValueError("alphabet_size invalid! Value must be greater than or equal 1.")
+        if alphabet_levels is not None and len(alphabet_levels) != alphabet_size:
+            raise ValueError("alphabet_levels invalid! Its length must match alphabet_size.")
+
+        self.alphabet_size = int(alphabet_size)
+        self.alphabet_levels = list(alphabet_levels) if alphabet_levels is not None else None
+        self._level_indices = {str(level): idx for idx, level in enumerate(alphabet_levels)} \
+            if alphabet_levels is not None else None
+        symbol_dtype = _symbol_dtype(self.alphabet_size)
+        capacity = max(1, int(capacity))
+
+        # Context nodes
+        self.node_symbol = np.zeros(capacity, dtype=symbol_dtype)
+        self.node_parent = np.full(capacity, self.NONE, dtype=np.int32)
+        self.node_first_child = np.full(capacity, self.NONE, dtype=np.int32)
+        self.node_next_sibling = np.full(capacity, self.NONE, dtype=np.int32)
+        self.node_first_successor = np.full(capacity, self.NONE, dtype=np.int32)
+        self.node_count = 1  # root
+
+        # Successor entries
+        self.successor_symbol = np.zeros(capacity, dtype=symbol_dtype)
+        self.successor_count = np.zeros(capacity, dtype=np.uint32)
+        self.successor_next = np.full(capacity, self.NONE, dtype=np.int32)
+        self.successor_entry_count = 0
+
+        self.stores_occurrences = bool(occurrences)
+        self.occurrence_block_count = 0
+        self.occurrence_extent = 0  # number of occurrence entries reserved by blocks
+        if self.stores_occurrences:
+            self.node_first_block = np.full(capacity, self.NONE, dtype=np.int32)
+            self.node_last_block = np.full(capacity, self.NONE, dtype=np.int32)
+            # Occurrence blocks
+            self.block_start = np.zeros(capacity, dtype=np.int64)
+            self.block_size = np.zeros(capacity, dtype=np.int64)
+            self.block_next = np.full(capacity, self.NONE, dtype=np.int32)
+            # Occurrence entries
+            self.occurrence_symbol = np.zeros(capacity, dtype=symbol_dtype)
+            self.occurrence_position = np.zeros(capacity, dtype=np.int64)
+
+    NODE_ARRAYS = ["node_symbol", "node_parent", "node_first_child", "node_next_sibling", "node_first_successor"]
+    SUCCESSOR_ARRAYS = ["successor_symbol", "successor_count", "successor_next"]
+    OCCURRENCE_NODE_ARRAYS = ["node_first_block", "node_last_block"]
+    BLOCK_ARRAYS = ["block_start", "block_size", "block_next"]
+    OCCURRENCE_ARRAYS = ["occurrence_symbol", "occurrence_position"]
+
+    @property
+    def _node_arrays(self) -> List[str]:
+        return self.NODE_ARRAYS + (self.OCCURRENCE_NODE_ARRAYS if self.stores_occurrences else [])
+
+    @property
+    def _array_counts(self) -> List[Tuple[List[str], int]]:
+        # Names of arrays with their number of used elements
+        array_counts = [(self._node_arrays, self.node_count), (self.SUCCESSOR_ARRAYS, self.successor_entry_count)]
+        if self.stores_occurrences:
+            array_counts += [(self.BLOCK_ARRAYS, self.occurrence_block_count),
+                             (self.OCCURRENCE_ARRAYS, self.occurrence_extent)]
+        return array_counts
+
+    def _grow_arrays(self, names: List[str], size: int):
+        for name, array in zip(names, self._grow([getattr(self, name) for name in names], size)):
+            setattr(self, name, array)
+
+    @staticmethod
+    def _grow(arrays: List[np.ndarray], size: int) -> List[np.ndarray]:
+        grown = []
+        for array in arrays:
+            new_array = np.full(max(size, 2 * len(array)), ContextTrie.NONE if array.dtype == np.int32 else 0,
+                                dtype=array.dtype)
+            new_array[:len(array)] = array
+            grown.append(new_array)
+        return grown
+
+    def _new_node(self, parent: int, symbol: int) -> int:
+        if self.node_count == len(self.node_symbol):
+            self._grow_arrays(self._node_arrays, self.node_count + 1)
+        node = self.node_count
+        self.node_symbol[node] = symbol
+        self.node_parent[node] = parent
+        self.node_next_sibling[node] = self.node_first_child[parent]
+        self.node_first_child[parent] = node
+        self.node_count += 1
+        return node
+
+    def _new_successor(self, node: int, symbol: int) -> int:
+        if self.successor_entry_count == len(self.successor_symbol):
+            self._grow_arrays(self.SUCCESSOR_ARRAYS, self.successor_entry_count + 1)
+        entry = self.successor_entry_count
+        self.successor_symbol[entry] = symbol
+        self.successor_next[entry] = self.node_first_successor[node]
+        self.node_first_successor[node] = entry
+        self.successor_entry_count += 1
+        return entry
+
+    def _new_block(self, node: int, capacity: int) -> int:
+        if self.occurrence_block_count == len(self.block_start):
+            self._grow_arrays(self.BLOCK_ARRAYS, self.occurrence_block_count + 1)
+        if self.occurrence_extent + capacity > len(self.occurrence_symbol):
+            self._grow_arrays(self.OCCURRENCE_ARRAYS, self.occurrence_extent + capacity)
+        block = self.occurrence_block_count
+        self.block_start[block] = self.occurrence_extent
+        self.block_size[block] = 0
+        last_block = int(self.node_last_block[node])
+        if last_block == -1:
+            self.node_first_block[node] = block
+        else:
+            self.block_next[last_block] = block
+        self.node_last_block[node] = block
+        self.occurrence_block_count += 1
+        self.occurrence_extent += capacity
+        return block
+
+    def _block_capacity(self, block: int) -> int:
+        next_start = self.block_start[block + 1] if block + 1 < self.occurrence_block_count \
+            else self.occurrence_extent
+        return int(next_start - self.block_start[block])
+
+    def symbol_index(self, level) -> int:
+        """
+        Return the symbol index of an alphabet level (compared by string representation).
+        """
+        if self._level_indices is None:
+            return int(level)
+        try:
+            return self._level_indices[str(level)]
+        except KeyError:
+            raise ValueError("level invalid! {} is not part of alphabet_levels.".format(level))
+
+    def child(self, node: int, symbol: int, create: bool = False) -> int:
+        """
+        Return the child of a context node which extends the context by an older symbol.
+        If it does not exist, it is created if create is True, otherwise NONE is returned.
+        """
+        node_symbol, node_next_sibling = self.node_symbol, self.node_next_sibling
+        child = int(self.node_first_child[node])
+        while child != -1 and node_symbol[child] != symbol:
+            child = int(node_next_sibling[child])
+        if child == -1 and create:
+            child = self._new_node(node, symbol)
+        return child
+
+    def context_nodes(self, history: Sequence[int], max_order: int, create: bool = False) -> List[int]:
+        """
+        Return the context nodes of orders 0, 1, ..., max_order preceding the next event. If a context does not
+        exist (and create is False), it and all higher-order contexts are NONE.
+
+        Parameters
+        ----------
+        history
+            Symbol indices of the preceding events (at least max_order)
+        max_order
+            Highest order
+        create
+            Whether to create missing contexts
+
+        Returns
+        -------
+        list
+            Node indices, ordered by increasing order
+        """
+        nodes = [0]
+        node = 0
+        for order in range(1, max_order + 1):
+            if node != self.NONE:
+                node = self.child(node, history[len(history) - order], create)
+            nodes.append(node)
+        return nodes
+
+    def find(self, context: Sequence[int]) -> int:
+        """
+        Return the node of a context (symbol indices in chronological order), or NONE if it does not exist.
+        """
+        return self.context_nodes(context, len(context))[-1]
+
+    def successor_counts(self, node: int) -> np.ndarray:
+        """
+        Return the counts of all symbols observed after the context, or None if no symbol was observed.
+        """
+        entry = int(self.node_first_successor[node])
+        if entry == -1:
+            return None
+        successor_next = self.successor_next
+        entries = []
+        while entry != -1:
+            entries.append(entry)
+            entry = int(successor_next[entry])
+        counts = np.zeros(self.alphabet_size)
+        counts[self.successor_symbol[entries]] = self.successor_count[entries]
+        return counts
+
+    def increment(self, node: int, symbol: int) -> int:
+        """
+        Increment the count of a symbol observed after the context.
+
+        Returns
+        -------
+        int
+            Count before incrementing
+        """
+        successor_symbol, successor_next = self.successor_symbol, self.successor_next
+        entry = int(self.node_first_successor[node])
+        while entry != -1 and successor_symbol[entry] != symbol:
+            entry = int(successor_next[entry])
+        if entry == -1:
+            entry = self._new_successor(node, symbol)
+        previous_count = int(self.successor_count[entry])
+        self.successor_count[entry] = previous_count + 1
+        return previous_count
+
+    def add_occurrence(self, node: int, symbol: int, position: int):
+        """
+        Append an observation of a symbol after the context, at the given position (e.g., index of the event).
+        """
+        if not self.stores_occurrences:
+            raise ValueError("Occurrences invalid! The trie was created without occurrences.")
+        block = int(self.node_last_block[node])
+        if block == -1 or self.block_size[block] == self._block_capacity(block):
+            capacity = self.MIN_BLOCK_CAPACITY if block == -1 else 2 * self._block_capacity(block)
+            block = self._new_block(node, capacity)
+        entry = self.block_start[block] + self.block_size[block]
+        self.occurrence_symbol[entry] = symbol
+        self.occurrence_position[entry] = position
+        self.block_size[block] += 1
+
+    def occurrences(self, node: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return all observations after the context, in the order they were added, or None if there are none.
+
+        Returns
+        -------
+        (np.ndarray, np.ndarray)
+            Symbols and positions
+        """
+        block = self.node_first_block[node] if self.stores_occurrences else -1
+        if block == -1:
+            return None
+        block_start, block_size, block_next = self.block_start, self.block_size, self.block_next
+        ranges = []
+        while block != -1:
+            start = block_start[block]
+            ranges.append(slice(start, start + block_size[block]))
+            block = block_next[block]
+        if len(ranges) == 1:
+            return self.occurrence_symbol[ranges[0]], self.occurrence_position[ranges[0]]
+        return (np.concatenate([self.occurrence_symbol[r] for r in ranges]),
+                np.concatenate([self.occurrence_position[r] for r in ranges]))
+
+    def node(self, index: int = 0) -> ContextTrieNode:
+        """
+        Return a view of a context node (by default, the root).
+        """
+        if not 0 <= index < self.node_count:
+            raise ValueError("index invalid! Node {} does not exist.".format(index))
+        return ContextTrieNode(self, index)
+
+    def get(self, context: Sequence[int], default=None) -> np.ndarray:
+        """
+        Return the counts of all symbols observed after the context (like dict.get).
+        """
+        node = self.find(context)
+        counts = self.successor_counts(node) if node != self.NONE else None
+        return counts if counts is not None else default
+
+    def __getitem__(self, context: Sequence[int]) -> np.ndarray:
+        counts = self.get(context)
+        if counts is None:
+            raise KeyError(context)
+        return counts
+
+    def __contains__(self, context: Sequence[int]) -> bool:
+        return self.get(context) is not None
+
+    def __len__(self) -> int:
+        return self.node_count
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Number of bytes allocated by the arrays.
+        """
+        return sum(getattr(self, name).nbytes for names, _ in self._array_counts for name in names)
+
+    def memory_footprint(self) -> Dict[str, int]:
+        """
+        Return the memory footprint.
+
+        Returns
+        -------
+        dict
+            nodes, successor_entries, and occurrence_entries (number of used elements), allocated_bytes, and
+            used_bytes
+        """
+        occurrence_entries = int(self.block_size[:self.occurrence_block_count].sum()) \
+            if self.stores_occurrences else 0
+        used_bytes = 0
+        for names, count in self._array_counts:
+            if names == self.OCCURRENCE_ARRAYS:
+                count = occurrence_entries  # without the unused capacity of blocks
+            used_bytes += count * sum(getattr(self, name).itemsize for name in names)
+        return {
+            "nodes": self.node_count,
+            "successor_entries": self.successor_entry_count,
+            "occurrence_entries": occurrence_entries,
+            "allocated_bytes": self.nbytes,
+            "used_bytes": used_bytes
+        }
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """
+        Return the used part of all arrays, e.g., to write them with np.savez.
+        """
+        return {name: getattr(self, name)[:count].copy() for names, count in self._array_counts for name in names}
+
+    def set_state(self, state: Dict[str, np.ndarray]):
+        """
+        Replace the trie by the given one (see get_state).
+        """
+        self.node_count = len(state["node_symbol"])
+        self.successor_entry_count = len(state["successor_symbol"])
+        if self.stores_occurrences:
+            self.occurrence_block_count = len(state["block_start"])
+            self.occurrence_extent = len(state["occurrence_symbol"])
+        for names, size in self._array_counts:
+            for name in names:
+                array = getattr(self, name)
+                new_array = np.full(max(size, self.INITIAL_CAPACITY), self.NONE if array.dtype == np.int32 else 0,
+                                    dtype=array.dtype)
+                new_array[:size] = state[name]
+                setattr(self, name, new_array)
+
+
+class ContextTrieNode:
+    """
+    Lightweight view of a context node of a ContextTrie.
+    """
+    __slots__ = ("trie", "index")
+
+    def __init__(self, trie: ContextTrie, index: int):
+        self.trie = trie
+        self.index = index
+
+    def __repr__(self):
+        return "ContextTrieNode(context={})".format(self.context)
+
+    @property
+    def symbol(self) -> int:
+        """
+        Oldest symbol of the context (None for the root).
+        """
+        return int(self.trie.node_symbol[self.index]) if self.index != 0 else None
+
+    @property
+    def context(self) -> Tuple[int, ...]:
+        """
+        Context as symbol indices, in chronological order.
+        """
+        symbols = []
+        index = self.index
+        while index > 0:
+            symbols.append(int(self.trie.node_symbol[index]))
+            index = self.trie.node_parent[index]
+        return tuple(symbols)
+
+    @property
+    def levels(self) -> tuple:
+        """
+        Context as alphabet levels, in chronological order.
+        """
+        if self.trie.alphabet_levels is None:
+            return self.context
+        return tuple(self.trie.alphabet_levels[symbol] for symbol in self.context)
+
+    @property
+    def order(self) -> int:
+        return len(self.context)
+
+    def children(self) -> List[ContextTrieNode]:
+        """
+        Return the contexts which extend this context by one older symbol.
+        """
+        children = []
+        child = self.trie.node_first_child[self.index]
+        while child != ContextTrie.NONE:
+            children.append(ContextTrieNode(self.trie, int(child)))
+            child = self.trie.node_next_sibling[child]
+        return children
+
+    def successor_counts(self) -> np.ndarray:
+        """
+        Return the counts of all symbols observed after this context, shape: (symbol,).
+        """
+        counts = self.trie.successor_counts(self.index)
+        return counts if counts is not None else np.zeros(self.trie.alphabet_size)
@@ -1,5 +1,8 @@
 import numbers
 
+import pandas as pd
+import pyarrow as pa
+
 
 def list_to_str(lst, sep=", "):
     return sep.join(map(str, lst))
@@ -28,3 +31,26 @@ def auto_convert_input_sequence(seq: list):
     else:
         return ValueError("seq invalid! First element must be either a number, a character/string, "
                           "or a list.")
+
+
+def data_frame_to_ipc_stream(df: pd.DataFrame) -> bytes:
+    """
+    Serialize a data frame to the Arrow IPC stream format.
+    :param df:
+    :return: bytes
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def ipc_stream_to_data_frame(ipc_stream: bytes) -> pd.DataFrame:
+    """
+    Deserialize a data frame from the Arrow IPC stream format.
+    :param ipc_stream: bytes
+    :return:
+    """
+    with pa.ipc.open_stream(pa.py_buffer(ipc_stream)) as reader:
+        return reader.read_all().to_pandas()
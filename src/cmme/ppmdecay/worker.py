@@ -0,0 +1,332 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import List, Union
+
+from cmme.config import Config
+from cmme.ppmdecay.binding import PPM_RUN_FILEPATH
+
+
+class RSession:
+    """
+    Embedded R of the current process. The intermediate script is compiled once, and the resulting package is
+    cached for all subsequent model runs.
+    """
+    _package = None
+    _lock = threading.Lock()  # The embedded R must not be used concurrently
+
+    @classmethod
+    def _load_package(cls):
+        if cls._package is None:
+            # R_HOME specifies the R instance to use by rpy2.
+            # Needs to happen before any imports from rpy2
+            os.environ["R_HOME"] = str(Config().r_home())
+            from rpy2.robjects.packages import SignatureTranslatedAnonymousPackage
+
+            with open(PPM_RUN_FILEPATH) as f:
+                r_file_contents = f.read()
+            cls._package = SignatureTranslatedAnonymousPackage(r_file_contents, "ppm-python-bridge")
+        return cls._package
+
+    @classmethod
+    def package(cls):
+        """
+        Return the compiled intermediate script. On first use, R is started and the script is compiled.
+
+        Returns
+        -------
+        SignatureTranslatedAnonymousPackage
+            Package providing ppmdecay_intermediate_script
+        """
+        with cls._lock:
+            return cls._load_package()
+
+    @classmethod
+    def run_model(cls, instructions_file_path: Union[str, Path]) -> str:
+        """
+        Run the intermediate script for the given instructions file.
+
+        Parameters
+        ----------
+        instructions_file_path
+            Path of the instructions file
+
+        Returns
+        -------
+        str
+            Path of the results file
+        """
+        with cls._lock:
+            return str(cls._load_package().ppmdecay_intermediate_script(str(instructions_file_path))[0])
+
+    @classmethod
+    def run_model_in_memory(cls, instructions_ipc_stream: bytes) -> bytes:
+        """
+        Run the intermediate script for the given instructions, without reading or writing any files.
+
+        Parameters
+        ----------
+        instructions_ipc_stream
+            Instructions table (see PPMInstructionsFile.to_data_frame) in the Arrow IPC stream format
+
+        Returns
+        -------
+        bytes
+            Results table in the Arrow IPC stream format
+        """
+        with cls._lock:
+            package = cls._load_package()
+            from rpy2.robjects.vectors import ByteVector
+            return bytes(package.ppmdecay_intermediate_script_in_memory(ByteVector(instructions_ipc_stream)))
+
+    @classmethod
+    def run_batch(cls, batch_file_path: Union[str, Path], results_dataset_path: Union[str, Path]) -> str:
+        """
+        Run all jobs of a batch file (see PPMBatch) within one call of the intermediate script.
+
+        Parameters
+        ----------
+        batch_file_path
+            Path of the batch file
+        results_dataset_path
+            Directory where to write the results dataset to, partitioned by job_id
+
+        Returns
+        -------
+        str
+            Path of the results dataset
+        """
+        with cls._lock:
+            return str(cls._load_package().ppmdecay_batch_script(str(batch_file_path), str(results_dataset_path))[0])
+
+    @classmethod
+    def is_healthy(cls) -> bool:
+        """
+        Check whether the embedded R responds.
+
+        Returns
+        -------
+        bool
+            True if R evaluated a trivial expression correctly
+        """
+        with cls._lock:
+            cls._load_package()
+            import rpy2.robjects as robjects
+            return int(robjects.r("1L + 1L")[0]) == 2
+
+
+_health_check_barrier = None  # of the pool this worker process belongs to
+
+
+def _initialize_worker(health_check_barrier=None):
+    global _health_check_barrier
+    _health_check_barrier = health_check_barrier
+    RSession.package()
+
+
+def _run_model(instructions_file_path: str) -> str:
+    return RSession.run_model(instructions_file_path)
+
+
+def _check_health(timeout: float) -> bool:
+    # Each worker blocks until all workers took a check, such that no worker can take two checks of one round
+    _health_check_barrier.wait(timeout)
+    return RSession.is_healthy()
+
+
+class RWorkerPool:
+    """
+    Pool of worker processes, each with its own embedded R session, to run several instructions files concurrently.
+
+    The pool starts on first use, shuts down automatically after being idle for autostop_wait_time seconds, and is
+    restarted if a health check fails or a worker process died.
+    """
+    AUTOSTOP_WAIT_TIME = 60  # seconds
+    HEALTH_CHECK_INTERVAL = 30  # seconds
+    HEALTH_CHECK_TIMEOUT = 10  # seconds
+
+    def __init__(self, size: int = None, autostop_wait_time: float = AUTOSTOP_WAIT_TIME,
+                 health_check_interval: float = HEALTH_CHECK_INTERVAL,
+                 health_check_timeout: float = HEALTH_CHECK_TIMEOUT):
+        """
+        Parameters
+        ----------
+        size
+            Number of worker processes. If None, the number of CPUs is used.
+        autostop_wait_time
+            Idle time (seconds) after which the worker processes are shut down
+        health_check_interval
+            Time (seconds) between two health checks of an idle pool. If None, no periodic health checks are
+            performed.
+        health_check_timeout
+            Time (seconds) within which the workers must respond to a health check
+        """
+        if size is not None and not size >= 1:
+            raise ValueError("size invalid! Value must be greater than or equal 1.")
+
+        self.size = size if size is not None else (os.cpu_count() or 1)
+        self.autostop_wait_time = autostop_wait_time
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+
+        self._executor = None
+        self._health_check_barrier = None
+        self._lock = threading.RLock()
+        self._work_in_progress = 0
+        self._last_action = None
+        self._last_health_check = None
+        self._autostop_thread = None
+
+    def __enter__(self) -> RWorkerPool:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    @property
+    def is_running(self) -> bool:
+        return self._executor is not None
+
+    def _start(self):
+        if self._executor is None:
+            mp_context = multiprocessing.get_context("spawn")
+            self._health_check_barrier = mp_context.Barrier(self.size)
+            self._executor = ProcessPoolExecutor(max_workers=self.size, mp_context=mp_context,
+                                                 initializer=_initialize_worker,
+                                                 initargs=(self._health_check_barrier,))
+            self._last_health_check = datetime.now()
+            self._autostop_thread = threading.Thread(target=self._autostop_thread_func, args=(self._executor,),
+                                                     daemon=True)
+            self._autostop_thread.start()
+
+    def _detach_executor(self) -> ProcessPoolExecutor:
+        executor, self._executor = self._executor, None
+        return executor
+
+    @staticmethod
+    def _shutdown_executor(executor: ProcessPoolExecutor):
+        # Must not be called while holding the lock, as pending done-callbacks acquire it
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def restart(self):
+        """
+        Replace all worker processes by new ones.
+        """
+        with self._lock:
+            executor = self._detach_executor()
+            self._start()
+        self._shutdown_executor(executor)
+
+    def shutdown(self):
+        """
+        Shut down all worker processes. The pool starts again on its next use.
+        """
+        with self._lock:
+            executor = self._detach_executor()
+        self._shutdown_executor(executor)
+
+    def _work_done(self, future: Future):
+        with self._lock:
+            self._work_in_progress -= 1
+            self._last_action = datetime.now()
+
+    def submit(self, instructions_file_path: Union[str, Path]) -> Future:
+        """
+        Schedule the execution of an instructions file.
+
+        Parameters
+        ----------
+        instructions_file_path
+            Path of the instructions file
+
+        Returns
+        -------
+        Future
+            Future of the results file path
+        """
+        broken_executor = None
+        with self._lock:
+            self._last_action = datetime.now()
+            self._start()
+            try:
+                future = self._executor.submit(_run_model, str(instructions_file_path))
+            except BrokenProcessPool:
+                # Replace the executor, but shut down the broken one only after releasing the lock (see restart)
+                broken_executor = self._detach_executor()
+                self._start()
+                future = self._executor.submit(_run_model, str(instructions_file_path))
+            self._work_in_progress += 1
+        self._shutdown_executor(broken_executor)
+        future.add_done_callback(self._work_done)
+        return future
+
+    def map(self, instructions_file_paths: List[Union[str, Path]]) -> List[str]:
+        """
+        Run several instructions files concurrently, and wait until all of them are processed.
+
+        Parameters
+        ----------
+        instructions_file_paths
+            Paths of the instructions files
+
+        Returns
+        -------
+        list
+            Results file paths, in the order of instructions_file_paths
+        """
+        futures = [self.submit(path) for path in instructions_file_paths]
+        return [future.result() for future in futures]
+
+    def check_health(self) -> bool:
+        """
+        Check whether all worker processes respond. If not, the pool is restarted.
+
+        Each worker process takes exactly one check, as the checks wait for each other (see _check_health). Thus, a
+        busy or hung worker lets the check time out. Accordingly, the check is meant to be performed while the pool is
+        idle.
+
+        Returns
+        -------
+        bool
+            True if the pool was healthy
+        """
+        with self._lock:
+            self._last_health_check = datetime.now()
+            if self._executor is None:
+                return True
+            try:
+                futures = [self._executor.submit(_check_health, self.health_check_timeout) for _ in range(self.size)]
+            except BrokenProcessPool:
+                futures = []
+        done, not_done = wait(futures, timeout=self.health_check_timeout)
+        is_healthy = len(futures) > 0 and len(not_done) == 0 and \
+            all(future.exception() is None and future.result() for future in done)
+        if not is_healthy:
+            self.restart()
+        return is_healthy
+
+    def _autostop_thread_func(self, executor: ProcessPoolExecutor):
+        sleep_time = max(min(self.autostop_wait_time, self.health_check_interval or self.autostop_wait_time) / 5.0,
+                         1)  # seconds until next check; once every >=1s
+        while self._executor is executor:  # a restarted pool has its own thread
+            with self._lock:
+                now = datetime.now()
+                is_idle = self._executor is executor and self._work_in_progress <= 0
+                stopped_executor = None
+                if is_idle and (now - self._last_action).total_seconds() >= self.autostop_wait_time:
+                    stopped_executor = self._detach_executor()
+            if stopped_executor is not None:
+                self._shutdown_executor(stopped_executor)
+                break
+            if is_idle and self.health_check_interval is not None and \
+                    (now - self._last_health_check).total_seconds() >= self.health_check_interval:
+                self.check_health()
+            time.sleep(sleep_time)
@@ -0,0 +1,367 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import itertools
+import math
+import numbers
+from enum import Enum
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow
+import pyarrow.dataset
+import pyarrow.parquet
+
+from cmme.comparison import _model_of, results_columns
+from cmme.lib.cache import instructions_key
+from cmme.lib.model import Model, ModelBuilder
+from cmme.lib.results_file import ResultsFile
+
+
+def parameter_grid(parameters: Dict[str, list]) -> List[dict]:
+    """
+    Expand a parameter space into all its configurations (cartesian product, in the order of the parameters).
+
+    Parameters
+    ----------
+    parameters
+        Parameter name => values, e.g., {"hazard": [0.01, 0.1], "memory": [5, 10]}
+
+    Returns
+    -------
+    list
+        Configurations, each as dict of parameter name => value
+    """
+    if len(parameters) == 0:
+        raise ValueError("parameters invalid! There must be at least one parameter.")
+    for name, values in parameters.items():
+        if len(values) == 0:
+            raise ValueError("parameters invalid! {} has no values.".format(name))
+    names = list(parameters.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*parameters.values())]
+
+
+def apply_parameters(builder: ModelBuilder, config: dict) -> ModelBuilder:
+    """
+    Return a copy of the builder, configured by calling its methods (in the order of the config).
+
+    A parameter named like a method is passed as its argument, e.g., {"hazard": 0.1} calls hazard(0.1). A parameter
+    named "method.argument" is passed as keyword argument, e.g., {"stm_options.order_bound": 3} calls
+    stm_options(order_bound=3). For methods which set a dict of options (e.g., IDyOM's stm_options), the builder's
+    other options are kept.
+
+    Parameters
+    ----------
+    builder
+        Model builder (not modified)
+    config
+        Parameter name => value
+
+    Returns
+    -------
+    ModelBuilder
+        Configured copy of the builder
+    """
+    builder = copy.deepcopy(builder)
+    calls: Dict[str, Union[dict, tuple]] = dict()  # method name => keyword arguments, or positional argument
+    for name, value in config.items():
+        method_name, _, argument_name = name.partition(".")
+        if not callable(getattr(builder, method_name, None)) or method_name.startswith("_"):
+            raise ValueError("config invalid! {} has no method {}.".format(type(builder).__name__, method_name))
+        if argument_name:
+            calls.setdefault(method_name, dict())[argument_name] = value
+        else:
+            calls[method_name] = (value,)
+
+    for method_name, arguments in calls.items():
+        method = getattr(builder, method_name)
+        if isinstance(arguments, tuple):
+            method(*arguments)
+        else:
+            options = getattr(builder, "_" + method_name, None)
+            method(**{**options, **arguments} if isinstance(options, dict) else arguments)
+    return builder
+
+
+class SuccessiveHalving:
+    """
+    Early stopping by successive halving: all configurations are run on a short prefix of the input sequence ("rung"
+    0), then only the best 1/reduction_factor of them on a prefix reduction_factor times as long, and so on, until
+    the remaining configurations are run on the whole input sequence.
+
+    As the models are causal, a run on a prefix yields the same values as the first observations of a complete run.
+    Thus, the worst configurations are discarded at a fraction of their cost.
+    """
+
+    def __init__(self, min_observations: int, reduction_factor: int = 3):
+        """
+        Parameters
+        ----------
+        min_observations
+            Length of the prefix in rung 0
+        reduction_factor
+            Factor by which the number of configurations decreases, and the prefix length increases, per rung
+        """
+        if not min_observations >= 1:
+            raise ValueError("min_observations invalid! Value must be greater than or equal 1.")
+        if not reduction_factor >= 2:
+            raise ValueError("reduction_factor invalid! Value must be greater than or equal 2.")
+        self.min_observations = min_observations
+        self.reduction_factor = reduction_factor
+
+    def budgets(self, length: int) -> List[int]:
+        """
+        Return the prefix length per rung. The last rung covers the whole input sequence.
+        """
+        budgets = []
+        budget = self.min_observations
+        while budget < length:
+            budgets.append(budget)
+            budget *= self.reduction_factor
+        budgets.append(length)
+        return budgets
+
+    def survivors(self, count: int) -> int:
+        """
+        Return the number of configurations (out of count) which advance to the next rung.
+        """
+        return max(1, math.ceil(count / self.reduction_factor))
+
+
+class Sweep:
+    """
+    Parameter sweep (grid search) over a model builder, e.g., PPMDecayInstructionBuilder, DREXInstructionBuilder, or
+    IDYOMInstructionBuilder.
+
+    The parameter space is expanded into configurations (see parameter_grid and apply_parameters), and configurations
+    with identical instructions are run only once. The runs are dispatched to their backend at once (see Model.arun;
+    concurrency is limited per backend), e.g., to a pool of IDyOM servers by run_options={"server": pool}.
+
+    Each configuration is scored by an objective, by default the mean information content (D-REX: mean surprisal).
+    With early stopping (see SuccessiveHalving), the worst configurations are discarded after runs on prefixes of the
+    input sequence.
+
+    If a results path is set, the per-observation results of every finished run are appended to a Parquet dataset
+    there, partitioned by rung (see load_results).
+    """
+    DEFAULT_OBJECTIVES = {"PPMModel": "information_content", "DREXModel": "surprisal",
+                          "IDYOMModel": "information_content"}
+    RESERVED_COLUMNS = ["config_id", "rung", "observations", "objective", "stopped", "time"]
+
+    def __init__(self, builder: ModelBuilder, parameters: Dict[str, list], input_sequence: list = None,
+                 objective: Union[str, Callable[[ResultsFile], float]] = None, minimize: bool = True,
+                 early_stopping: SuccessiveHalving = None, results_path: Union[str, Path] = None,
+                 run_options: dict = None):
+        """
+        Parameters
+        ----------
+        builder
+            Model builder, which specifies all parameters except the swept ones (not modified)
+        parameters
+            Parameter name => values (see apply_parameters)
+        input_sequence
+            Input sequence (single trial), set for all configurations. If None, the builder's input sequence is used.
+            IDyOM sweeps take their data from the builder's dataset, i.e., input_sequence must be None.
+        objective
+            Name of the quantity (see results_columns) whose mean is the objective, or a function which returns the
+            objective of a results file. If None, the model's default (see DEFAULT_OBJECTIVES) is used.
+        minimize
+            Whether lower objective values are better
+        early_stopping
+            If set, configurations are discarded by successive halving. This requires input_sequence (thus, it is not
+            available for IDyOM).
+        results_path
+            Directory of the Parquet dataset to append results to. If None, results are not stored.
+        run_options
+            Further arguments of the model's arun (e.g., {"backend": PPMBackend.NATIVE})
+        """
+        for name in parameters.keys():
+            if name in Sweep.RESERVED_COLUMNS:
+                raise ValueError("parameters invalid! {} is a reserved name.".format(name))
+        model: Model = _model_of(builder)
+        if model.__name__ == "IDYOMModel" and (input_sequence is not None or early_stopping is not None):
+            raise ValueError("input_sequence invalid! IDyOM sweeps take their data from the builder's dataset, and "
+                             "cannot use input_sequence or (prefix-based) early stopping.")
+        if early_stopping is not None and input_sequence is None:
+            raise ValueError("early_stopping invalid! Early stopping requires input_sequence.")
+
+        self.builder = builder
+        self.parameters = parameters
+        self.input_sequence = list(input_sequence) if input_sequence is not None else None
+        self.model = model
+        self.objective = objective if objective is not None else Sweep.DEFAULT_OBJECTIVES[self.model.__name__]
+        self.minimize = minimize
+        self.early_stopping = early_stopping
+        self.results_path = Path(results_path) if results_path is not None else None
+        self.run_options = run_options if run_options is not None else dict()
+
+        self.configs: Dict[str, dict] = dict()  # config_id => config
+        self.invalid_configs: List[Tuple[dict, Exception]] = []  # rejected by the builder
+        self._builders: Dict[str, ModelBuilder] = dict()
+        self._column_types = {name: Sweep._column_type(values) for name, values in parameters.items()}
+        self._expand()
+
+        self.summary = pd.DataFrame({
+            "config_id": list(self.configs.keys()),
+            **{name: [self._column_value(name, config[name]) for config in self.configs.values()]
+               for name in self.parameters.keys()},
+            "rung": -1, "observations": 0, "objective": np.nan, "stopped": False
+        }).set_index("config_id", drop=False)
+
+    @staticmethod
+    def _column_type(values: list) -> type:
+        # Parameter values are stored with the same type across all runs, as required for a single dataset
+        if all(isinstance(value, (bool, np.bool_)) for value in values):
+            return bool
+        if all(isinstance(value, numbers.Integral) for value in values):
+            return int
+        if all(isinstance(value, numbers.Real) for value in values):
+            return float
+        return str
+
+    def _column_value(self, name: str, value):
+        column_type = self._column_types[name]
+        if column_type == str:
+            return value.name if isinstance(value, Enum) else str(value)
+        return column_type(value)
+
+    def _configured_builder(self, config: dict, length: int = None) -> ModelBuilder:
+        builder = apply_parameters(self.builder, config)
+        if self.input_sequence is not None:
+            builder.input_sequence(self.input_sequence[:length])
+        return builder
+
+    def _expand(self):
+        for config in parameter_grid(self.parameters):
+            try:
+                builder = self._configured_builder(config)
+                config_id = instructions_key(builder.to_instructions_file(), self.model.__name__)
+            except ValueError as e:
+                self.invalid_configs.append((config, e))
+                continue
+            if config_id not in self.configs:  # otherwise, equivalent to a previous config
+                self.configs[config_id] = config
+                self._builders[config_id] = builder
+        if len(self.configs) == 0:
+            raise ValueError("parameters invalid! The builder rejected all configurations.")
+
+    def _budgets(self) -> List[Union[int, None]]:
+        if self.early_stopping is None:
+            return [len(self.input_sequence) if self.input_sequence is not None else None]
+        return self.early_stopping.budgets(len(self.input_sequence))
+
+    def _score(self, results_file: ResultsFile, columns: Dict[str, np.ndarray]) -> float:
+        if callable(self.objective):
+            return float(self.objective(results_file))
+        if self.objective not in columns:
+            raise ValueError("objective invalid! Results contain {}.".format(sorted(columns.keys())))
+        return float(np.nanmean(columns[self.objective]))
+
+    async def _run(self, config_id: str, length: Union[int, None], is_complete: bool) -> Tuple[str, ResultsFile]:
+        if is_complete:
+            builder = self._builders[config_id]
+        else:
+            builder = self._configured_builder(self.configs[config_id], length)
+        return config_id, await self.model.arun(builder.to_instructions_file(), **self.run_options)
+
+    def _store(self, config_id: str, rung: int, columns: Dict[str, np.ndarray]):
+        observations = len(next(iter(columns.values())))
+        df = pd.DataFrame({"config_id": config_id, "time": np.arange(observations), **columns})
+        for name, value in self.configs[config_id].items():
+            df[name] = self._column_value(name, value)
+        df["rung"] = rung
+        pyarrow.parquet.write_to_dataset(pyarrow.Table.from_pandas(df, preserve_index=False), str(self.results_path),
+                                         partition_cols=["rung"],
+                                         basename_template="{}-{{i}}.parquet".format(config_id))
+
+    def _ranked(self, config_ids: List[str]) -> List[str]:
+        objectives = self.summary.loc[config_ids, "objective"]
+        # NaN objectives (e.g., failed scores) rank last
+        objectives = objectives.fillna(np.inf if self.minimize else -np.inf)
+        return list(objectives.sort_values(ascending=self.minimize, kind="stable").index)
+
+    async def astream(self) -> AsyncIterator[Tuple[str, int, float]]:
+        """
+        Run the sweep, and yield as soon as a run finished. Its results are appended to the results dataset before.
+
+        Returns
+        -------
+        AsyncIterator
+            Tuples of config_id, rung, and objective
+        """
+        budgets = self._budgets()
+        config_ids = list(self.configs.keys())
+        for rung, length in enumerate(budgets):
+            is_complete = rung == len(budgets) - 1
+            tasks = [asyncio.ensure_future(self._run(config_id, length, is_complete)) for config_id in config_ids]
+            try:
+                for task in asyncio.as_completed(tasks):
+                    config_id, results_file = await task
+                    columns = results_columns(results_file, length)
+                    objective = self._score(results_file, columns)
+                    if self.results_path is not None:
+                        self._store(config_id, rung, columns)
+                    self.summary.loc[config_id, ["rung", "observations", "objective"]] = \
+                        [rung, len(next(iter(columns.values()))), objective]
+                    yield config_id, rung, objective
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+            if not is_complete:
+                ranked = self._ranked(config_ids)
+                config_ids = ranked[:self.early_stopping.survivors(len(ranked))]
+                self.summary.loc[ranked[len(config_ids):], "stopped"] = True
+
+    async def arun(self) -> pd.DataFrame:
+        """
+        Run the sweep, and return the summary when all runs finished.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per (distinct) configuration, with its parameters, the last rung it was run in, the number of
+            observations of that run, its objective, and whether it was stopped early. Sorted from best to worst.
+        """
+        async for _ in self.astream():
+            pass
+        return self.best()
+
+    def run(self) -> pd.DataFrame:
+        """
+        Like arun, but blocking (for use outside of an event loop).
+        """
+        return asyncio.run(self.arun())
+
+    def best(self) -> pd.DataFrame:
+        """
+        Return the summary, sorted such that configurations which were run longest, then those with the best
+        objective, come first.
+        """
+        objectives = self.summary["objective"].fillna(np.inf if self.minimize else -np.inf)
+        order = np.lexsort(((objectives if self.minimize else -objectives).to_numpy(),
+                            -self.summary["rung"].to_numpy()))
+        return self.summary.iloc[order].reset_index(drop=True)
+
+    @staticmethod
+    def load_results(results_path: Union[str, Path]) -> pd.DataFrame:
+        """
+        Load the results dataset of a sweep (of any number of runs, also while the sweep is running).
+
+        Parameters
+        ----------
+        results_path
+            Directory of the results dataset (partitioned by rung)
+
+        Returns
+        -------
+        pd.DataFrame
+            Per-observation results, with columns config_id, rung, time, the parameters, and the model's quantities
+        """
+        dataset = pyarrow.dataset.dataset(str(results_path), format="parquet", partitioning="hive")
+        df = dataset.to_table().to_pandas()
+        df["rung"] = df["rung"].astype(np.int64)
+        return df.sort_values(["rung", "config_id", "time"], kind="stable", ignore_index=True)
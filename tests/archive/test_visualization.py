@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+
+from cmme.archive.visualization import DataFrame, calc_drex_entropy
+from cmme.drex.binding import DREXResultsFile
+from cmme.ppmdecay.base import PPMBackend
+from cmme.ppmdecay.model import PPMSimpleInstructionBuilder, PPMModel
+
+
+def test_calc_drex_entropy_matches_per_row_reference():
+    def reference(ensemble):
+        p = np.asarray(ensemble, dtype=float) / np.sum(ensemble)
+        p = p[p > 0]
+        return -np.sum(p * np.log2(p))
+
+    ensemble = np.array([[1., 1., 1., 1.],
+                         [2., 0., 1., 1.],
+                         [0., 0., 5., 0.],
+                         [.1, .7, .15, .05]])
+    entropy = calc_drex_entropy(ensemble)
+
+    assert entropy.shape == (4,)
+    assert np.allclose(entropy, [reference(row) for row in ensemble])
+    assert np.allclose(entropy[:3], [2, 1.5, 0])
+    assert isinstance(calc_drex_entropy(ensemble[1]), float)
+    assert np.isclose(calc_drex_entropy(ensemble[1]), 1.5)
+
+
+def test_data_frame_combines_drex_and_ppm_results():
+    drex_results_file = DREXResultsFile.load(
+        os.path.join(os.path.dirname(__file__), "../sample_files/drex-resultsfile-gaussian-D1.mat"))
+    input_sequence = np.asarray(drex_results_file.input_sequence, dtype=float)[:, 0].tolist()
+    alphabet_levels = sorted(set(input_sequence))
+    ppmif = PPMSimpleInstructionBuilder().alphabet_levels(alphabet_levels).input_sequence(input_sequence) \
+        .to_instructions_file()
+    ppm_results_file = PPMModel.run_instructions_file(ppmif, backend=PPMBackend.NATIVE)
+
+    data_frame = DataFrame(ppm_results_file, drex_results_file, input_sequence)
+    df = data_frame.df
+    ntime = len(input_sequence)
+
+    assert list(df.columns) == ["observation", "ppm_information_content", "drex_surprisal", "ppm_alphabet_size",
+                                "ppm_model_order", "ppm_predictions", "drex_predictions", "ppm_entropy",
+                                "drex_entropy", "drex_context_beliefs", "drex_bd", "drex_cd_probability",
+                                "drex_cd_changepoint", "drex_cd_threshold"]
+    assert len(df) == ntime
+    assert data_frame.drex_feature_index == 0
+    assert np.array_equal(df["observation"], input_sequence)
+    assert data_frame.ppm_predictions.shape == (ntime, len(alphabet_levels))
+    assert data_frame.drex_predictions.shape == (ntime, len(alphabet_levels))
+    memory = np.asarray(drex_results_file.context_beliefs).shape[0]
+    assert data_frame.drex_context_beliefs.shape == (ntime, memory)
+    for matrix in [data_frame.ppm_predictions, data_frame.drex_predictions, data_frame.drex_context_beliefs]:
+        assert matrix.flags["C_CONTIGUOUS"]
+    assert df["drex_predictions"][1].base is data_frame.drex_predictions  # rows are views
+    assert np.allclose(df["drex_entropy"], calc_drex_entropy(data_frame.drex_predictions))
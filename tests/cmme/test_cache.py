@@ -0,0 +1,67 @@
+import tempfile
+
+import numpy as np
+
+from cmme.drex.base import GaussianPrior
+from cmme.drex.model import DREXInstructionBuilder
+from cmme.lib.cache import ResultsCache, instructions_key
+from cmme.ppmdecay.base import PPMBackend
+from cmme.ppmdecay.model import PPMSimpleInstructionBuilder, PPMModel
+
+
+def _ppm_instructions_file(order_bound=2):
+    return PPMSimpleInstructionBuilder().alphabet_levels(["a", "b", "c"]).order_bound(order_bound) \
+        .input_sequence(["a", "b", "a", "c", "a", "b"]).to_instructions_file()
+
+
+def test_instructions_key_is_canonical():
+    assert instructions_key(_ppm_instructions_file()) == instructions_key(_ppm_instructions_file())
+    assert instructions_key(_ppm_instructions_file()) != instructions_key(_ppm_instructions_file(order_bound=3))
+    assert instructions_key(_ppm_instructions_file()) != instructions_key(_ppm_instructions_file(), PPMBackend.NATIVE)
+
+    def drex_instructions_file(input_sequence):
+        prior = GaussianPrior(np.array([[0.]]), np.array([[[1.]]]), np.array([1]))
+        return DREXInstructionBuilder().prior(prior).input_sequence(input_sequence).to_instructions_file()
+
+    instructions_file = drex_instructions_file([0., 2., 4.])
+    strided_instructions_file = drex_instructions_file([0., 2., 4.])
+    strided_instructions_file.input_sequence[0] = np.arange(6.).reshape(3, 2)[:, :1]  # same values, not contiguous
+    assert instructions_key(instructions_file) == instructions_key(strided_instructions_file)
+    assert instructions_key(instructions_file) != instructions_key(drex_instructions_file([0., 2., 5.]))
+
+
+def test_results_cache_returns_stored_results():
+    cache = ResultsCache()
+    runs = []
+
+    def run():
+        runs.append(1)
+        return PPMModel.run_instructions_file(_ppm_instructions_file(), backend=PPMBackend.NATIVE)
+
+    results_file = cache.get_or_run(_ppm_instructions_file(), run)
+    cached_results_file = cache.get_or_run(_ppm_instructions_file(), run)
+    assert len(runs) == 1
+    assert cached_results_file.results_file_data.df.equals(results_file.results_file_data.df)
+
+    model_results_file = PPMModel.run_instructions_file(_ppm_instructions_file(), backend=PPMBackend.NATIVE,
+                                                        cache=cache)
+    assert model_results_file.results_file_data.df.equals(results_file.results_file_data.df)
+    assert len(cache) == 2  # run by the model: the backend is part of the key
+
+
+def test_results_cache_evicts_least_recently_used():
+    for directory in [None, tempfile.mkdtemp()]:
+        cache = ResultsCache(directory, max_entries=2)
+        cache.put("a", np.zeros(10))
+        cache.put("b", np.zeros(10))
+        assert cache.get("a") is not None  # "b" is now the least recently used
+        cache.put("c", np.zeros(10))
+        assert "a" in cache and "b" not in cache and "c" in cache
+        assert len(cache) == 2
+
+        cache.max_bytes = cache.nbytes // 2 + 1
+        cache.put("a", np.zeros(10))
+        assert len(cache) == 1 and "a" in cache
+
+        cache.clear()
+        assert len(cache) == 0
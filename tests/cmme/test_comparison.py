@@ -0,0 +1,52 @@
+import asyncio
+
+import numpy as np
+
+from cmme.comparison import ComparisonPipeline
+from cmme.drex.base import GaussianPrior, DREXBackend
+from cmme.drex.model import DREXInstructionBuilder, DREXModel
+from cmme.ppmdecay.base import PPMBackend
+from cmme.ppmdecay.model import PPMSimpleInstructionBuilder, PPMModel
+
+
+def _pipeline(input_sequence):
+    prior = GaussianPrior(np.array([[0.]]), np.array([[[1.]]]), np.array([1]))
+    builders = {
+        "ppm": PPMSimpleInstructionBuilder().alphabet_levels(sorted(set(input_sequence))).order_bound(2),
+        "drex": DREXInstructionBuilder().prior(prior)
+    }
+    run_options = {"ppm": {"backend": PPMBackend.NATIVE}, "drex": {"backend": DREXBackend.NATIVE}}
+    return ComparisonPipeline(input_sequence, builders, run_options)
+
+
+def test_comparison_pipeline_aligns_results():
+    input_sequence = [1., 2., 1., 2., 5., 5., 5.]
+    pipeline = _pipeline(input_sequence)
+
+    table = pipeline.run()
+
+    assert table["observation"].tolist() == input_sequence
+    assert set(table.columns) == {"observation", "ppm_information_content", "ppm_entropy", "ppm_model_order",
+                                  "drex_surprisal", "drex_belief_dynamics", "drex_change_probability"}
+    ppm_results_file = PPMModel.run_instructions_file(
+        pipeline.builders["ppm"].input_sequence(input_sequence).to_instructions_file(), backend=PPMBackend.NATIVE)
+    assert np.allclose(table["ppm_information_content"],
+                       ppm_results_file.results_file_data.df_of_last_trial()["information_content"])
+    drex_results_file = DREXModel.run_instructions_file(
+        pipeline.builders["drex"].input_sequence(input_sequence).to_instructions_file(), backend=DREXBackend.NATIVE)
+    assert np.allclose(table["drex_surprisal"], drex_results_file.joint_surprisal)
+
+
+def test_comparison_pipeline_streams_results():
+    pipeline = _pipeline([1., 2., 1., 2.])
+
+    async def collect():
+        return [(name, list(table.columns)) async for name, table in pipeline.astream()]
+
+    streamed = asyncio.run(collect())
+
+    assert sorted(name for name, _ in streamed) == ["drex", "ppm"]
+    first_name, first_columns = streamed[0]
+    assert all(column == "observation" or column.startswith(first_name + "_") for column in first_columns)
+    assert len(streamed[1][1]) == 7
+    assert set(pipeline.results.keys()) == {"ppm", "drex"}
@@ -0,0 +1,62 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather
+
+from cmme.config import Config
+from cmme.lib.compression import CompressionCodec, CompressionPolicy, write_feather
+
+
+def test_compression_policy_feather_kwargs():
+    assert CompressionPolicy(CompressionCodec.ZSTD, 5).feather_kwargs() == {"compression": "zstd",
+                                                                           "compression_level": 5}
+    assert CompressionPolicy(CompressionCodec.NONE, 5).feather_kwargs() == {"compression": "uncompressed",
+                                                                           "compression_level": None}
+
+
+def test_compression_policy_auto_depends_on_payload_size():
+    policy = CompressionPolicy(CompressionCodec.AUTO)
+    small_df = pd.DataFrame({"x": np.arange(10)})
+    large_df = pd.DataFrame({"x": np.arange(CompressionPolicy.AUTO_SIZE_THRESHOLD)})
+
+    assert policy.resolve(small_df).codec == CompressionCodec.ZSTD
+    assert policy.resolve(large_df).codec == CompressionCodec.LZ4
+
+
+def test_default_compression_policy(tmp_path):
+    config_file_path = tmp_path / "cmme-comparison.ini"
+    config_file_path.write_text("[active]\nCMME_IO_DIR = {}\n".format(tmp_path))
+    policy = CompressionPolicy.default(Config(config_file_path))
+    assert policy.codec == CompressionCodec(Config.DEFAULT_FEATHER_COMPRESSION)
+    assert policy.level == Config.DEFAULT_FEATHER_COMPRESSION_LEVEL
+
+    config_file_path.write_text("[active]\nFEATHER_COMPRESSION = lz4\nFEATHER_COMPRESSION_LEVEL = 3\n")
+    policy = CompressionPolicy.default(Config(config_file_path))
+    assert policy.codec == CompressionCodec.LZ4
+    assert policy.level == 3
+
+
+def test_default_compression_policy_is_read_once(tmp_path, monkeypatch):
+    config_file_path = tmp_path / "cmme-comparison.ini"
+    config_file_path.write_text("[active]\nFEATHER_COMPRESSION = lz4\n")
+    monkeypatch.setattr(Config, "DEFAULT_CONFIG_FILE_PATH", config_file_path)
+    monkeypatch.setattr(CompressionPolicy, "_default", None)
+
+    policy = CompressionPolicy.default()
+    assert policy.codec == CompressionCodec.LZ4
+    assert CompressionPolicy.default() is policy  # not read again
+
+    config_file_path.write_text("[active]\nFEATHER_COMPRESSION = uncompressed\n")
+    os.utime(config_file_path, ns=(0, config_file_path.stat().st_mtime_ns + 1))
+    assert CompressionPolicy.default().codec == CompressionCodec.NONE
+
+
+def test_write_feather():
+    df = pd.DataFrame({"x": np.arange(100), "y": np.linspace(0, 1, 100)})
+    for codec in CompressionCodec:
+        with tempfile.NamedTemporaryFile() as tmpfile:
+            write_feather(df, tmpfile.name, CompressionPolicy(codec))
+            assert pd.read_feather(tmpfile.name).equals(df)
+            assert pyarrow.feather.read_table(tmpfile.name).num_rows == 100
@@ -0,0 +1,51 @@
+import numpy as np
+
+from cmme.drex.base import GaussianPrior, DREXBackend
+from cmme.drex.model import DREXInstructionBuilder, DREXModel
+from cmme.ppmdecay.base import PPMBackend
+from cmme.ppmdecay.model import PPMDecayInstructionBuilder
+from cmme.sweep import Sweep, SuccessiveHalving, parameter_grid
+
+
+def test_sweep_deduplicates_configs():
+    builder = PPMDecayInstructionBuilder().alphabet_levels([1, 2, 3])
+    parameters = {"order_bound": [1, 2, 2], "ltm_half_life": [5., 10.]}
+    assert len(parameter_grid(parameters)) == 6
+
+    sweep = Sweep(builder, parameters, input_sequence=[1, 2, 3, 1, 2], run_options={"backend": PPMBackend.NATIVE})
+    assert len(sweep.configs) == 4
+    assert builder._order_bound == 10  # not modified
+
+    summary = sweep.run()
+    assert len(summary) == 4
+    assert (summary["rung"] == 0).all() and (summary["observations"] == 5).all()
+    assert list(summary["objective"]) == sorted(summary["objective"])
+
+
+def test_sweep_early_stopping(tmp_path):
+    rng = np.random.default_rng(1)
+    input_sequence = list(np.concatenate([rng.normal(0, 1, 40), rng.normal(3, 1, 41)]))
+    prior = GaussianPrior(np.array([[0.]]), np.array([[[1.]]]), np.array([1]))
+    builder = DREXInstructionBuilder().prior(prior)
+    parameters = {"hazard": [0.01, 0.1, 0.3], "memory": [5, 20, 81]}
+    run_options = {"backend": DREXBackend.NATIVE}
+
+    sweep = Sweep(builder, parameters, input_sequence, early_stopping=SuccessiveHalving(9, 3),
+                  results_path=tmp_path / "results", run_options=run_options)
+    summary = sweep.run()
+
+    # 9 configs on 9 observations, 3 on 27, 1 on 81
+    assert list(summary["observations"]) == [81, 27, 27] + [9] * 6
+    assert list(summary["stopped"]) == [False] + [True] * 8
+
+    best = summary.iloc[0]
+    results_file = DREXModel.run_instructions_file(
+        builder.input_sequence(input_sequence).hazard(best["hazard"]).memory(int(best["memory"]))
+        .to_instructions_file(), backend=DREXBackend.NATIVE)
+    assert np.isclose(best["objective"], np.mean(results_file.joint_surprisal))
+
+    results = Sweep.load_results(tmp_path / "results")
+    assert len(results) == 9 * 9 + 3 * 27 + 81
+    assert set(results.columns) >= {"config_id", "rung", "time", "hazard", "memory", "surprisal"}
+    last_run = results[results["rung"] == 2]
+    assert np.allclose(last_run["surprisal"], results_file.joint_surprisal.flatten())
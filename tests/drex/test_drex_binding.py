@@ -6,6 +6,7 @@ from numpy import array
 
 from cmme.drex.base import UnprocessedPrior, DistributionType, GaussianPrior
 from cmme.drex.binding import from_mat, to_mat, DREXInstructionsFile, DREXResultsFile, DREXResultsFilePsi, \
+    LazyDREXResultsFile, \
     transform_to_estimatesuffstat_representation, transform_to_rundrexmodel_representation
 from cmme.drex.model import DREXInstructionBuilder
 from cmme.drex.util import transform_to_unified_drex_input_sequence_representation
@@ -346,6 +347,59 @@ def test_results_file_reads_file_without_error():
     rf4 = DREXResultsFile.load(os.path.join(os.path.dirname(__file__), "../sample_files/drex-resultsfile-poisson-D3.mat"))
 
 
+def test_lazy_results_file_decodes_attributes_on_access():
+    file_path = os.path.join(os.path.dirname(__file__), "../sample_files/drex-resultsfile-gaussian-D2.mat")
+    expected = DREXResultsFile.load(file_path)
+    rf = DREXResultsFile.load(file_path, lazy=True)
+
+    assert isinstance(rf, LazyDREXResultsFile)
+    assert np.array_equal(rf.joint_surprisal, expected.joint_surprisal)
+    assert not rf.is_decoded("psi")
+    assert not rf.variables.is_decoded("post_DREX_prediction_results")
+
+    for attribute in DREXResultsFile.ATTRIBUTES:
+        if attribute not in ["prior", "psi"]:
+            assert np.array_equal(getattr(rf, attribute), getattr(expected, attribute))
+    assert np.array_equal(rf.psi.prediction_by_feature(0), expected.psi.prediction_by_feature(0))
+    assert rf.dimension_values == expected.dimension_values
+
+    rf.release("psi")
+    assert not rf.is_decoded("psi")
+    assert not rf.variables.is_decoded("post_DREX_prediction_results")
+
+
+def test_lazy_results_file_decodes_struct_fields_on_access():
+    file_path = os.path.join(os.path.dirname(__file__), "../sample_files/drex-resultsfile-gaussian-D1.mat")
+    expected = DREXResultsFile.load(file_path)
+    rf = DREXResultsFile.load(file_path, lazy=True)
+
+    assert np.array_equal(rf.joint_surprisal, expected.joint_surprisal)
+    assert rf.variables.is_decoded("run_DREX_model_results", "joint_surprisal")
+    assert not rf.variables.is_decoded("run_DREX_model_results")
+    assert not rf.variables.is_decoded("run_DREX_model_results", "context_beliefs")
+    assert not rf.variables.is_decoded("run_DREX_model_results", "prediction_params")
+
+    rf.release("joint_surprisal")
+    assert not rf.variables.is_decoded("run_DREX_model_results", "joint_surprisal")
+
+
+def test_results_file_sidecar_is_memory_mapped():
+    file_path = os.path.join(os.path.dirname(__file__), "../sample_files/drex-resultsfile-gmm-D1.mat")
+    expected = DREXResultsFile.load(file_path)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sidecar_path = DREXResultsFile.save_sidecar(expected, os.path.join(tmp_dir, "results-sidecar"))
+        rf = DREXResultsFile.load_sidecar(sidecar_path)
+
+        assert isinstance(rf.joint_surprisal, np.memmap)
+        assert np.array_equal(rf.joint_surprisal, expected.joint_surprisal)
+        assert np.array_equal(rf.context_beliefs, expected.context_beliefs)
+        assert np.array_equal(rf.psi.prediction_by_feature(2), expected.psi.prediction_by_feature(2))
+        assert np.allclose(rf.prior.means, expected.prior.means, equal_nan=True)
+        assert rf.change_decision_threshold == expected.change_decision_threshold
+        del rf
+
+
 def test_load_drex_instructions_file():
     input_sequence = transform_to_unified_drex_input_sequence_representation([1, 2, 3, 4, 5])
     prior_input_sequence = transform_to_unified_drex_input_sequence_representation(
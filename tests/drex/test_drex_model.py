@@ -104,3 +104,25 @@ def test_drex_instance_automatically_sets_obsnz_according_to_nfeatures():
     drex_instance.input_sequence(prior_input_sequence)
 
     assert len(drex_instance._obsnz) == 2
+
+
+def test_map_succeeds_with_engine_pool():
+    from cmme.drex.worker import MatlabEnginePool
+
+    prior = UnprocessedPrior(DistributionType.GAUSSIAN, [1, 1, 2, 2, 3, 3, 2, 2], 1)
+    input_sequences = [[1, 2, 3], [3, 2, 1, 1], [2, 2]]
+
+    with tempfile.TemporaryDirectory() as tmpdirname, MatlabEnginePool(size=2) as pool:
+        instructions_file_paths = []
+        for idx, input_sequence in enumerate(input_sequences):
+            instructions_file_path = "{}/instructionsfile-{}.mat".format(tmpdirname, idx)
+            DREXInstructionBuilder().prior(prior).input_sequence(input_sequence)\
+                .to_instructions_file()\
+                .save_self(instructions_file_path, "{}/resultsfile-{}.mat".format(tmpdirname, idx))
+            instructions_file_paths.append(instructions_file_path)
+
+        results_files = DREXModel(pool).map(instructions_file_paths)
+        assert pool.engines_count <= 2
+
+    for results_file, input_sequence in zip(results_files, input_sequences):
+        assert results_file.surprisal.shape[0] == len(input_sequence)
@@ -0,0 +1,262 @@
+import asyncio
+from pathlib import Path
+
+import numpy as np
+import scipy.io
+
+from cmme.drex.base import GaussianPrior, LognormalPrior, GmmPrior, PoissonPrior, DREXBackend, DistributionType, \
+    UnprocessedPrior
+from cmme.drex.binding import DREXInstructionsFile, DREXResultsFile
+from cmme.drex.model import DREXInstructionBuilder, DREXModel
+from cmme.drex.native import GaussianEngine, LognormalEngine, GmmEngine, run_native_model, belief_dynamics, \
+    change_decision
+from cmme.drex.suffstat import estimate_suffstat, PriorCache
+
+SAMPLE_FILES_DIR = Path(__file__).parent.parent / "sample_files"
+
+
+def _rerun_results_file(file_name: str, memory=2, maxhyp=1, prior=None) -> (DREXResultsFile, DREXResultsFile):
+    # The sample results files were computed with hazard=0.01, obsnz=0, and predscale=0.001
+    expected = DREXResultsFile.load(SAMPLE_FILES_DIR / file_name)
+    instructions_file = DREXInstructionsFile([expected.input_sequence.T.tolist()],
+                                             prior if prior is not None else expected.prior,
+                                             0.01, memory, maxhyp, [0.0] * expected.input_sequence.shape[1],
+                                             10, 0.001, 0.001, 0.01)
+    return run_native_model(instructions_file), expected
+
+
+def test_native_gaussian_D1_reproduces_matlab_results():
+    results_file, expected = _rerun_results_file("drex-resultsfile-gaussian-D1.mat")
+
+    assert np.allclose(results_file.surprisal, expected.surprisal)
+    assert np.allclose(results_file.joint_surprisal, expected.joint_surprisal)
+    assert np.allclose(results_file.context_beliefs, expected.context_beliefs)
+    assert np.allclose(results_file.change_decision_probability, expected.change_decision_probability)
+    assert results_file.change_decision_changepoint == expected.change_decision_changepoint
+    assert np.array_equal(results_file.psi.positions_by_feature(0), expected.psi.positions_by_feature(0))
+    assert np.allclose(results_file.psi.prediction_by_feature(0), expected.psi.prediction_by_feature(0))
+
+
+def test_native_gaussian_D2_reproduces_matlab_results():
+    results_file, expected = _rerun_results_file("drex-resultsfile-gaussian-D2.mat")
+
+    assert np.allclose(results_file.surprisal, expected.surprisal)
+    assert np.allclose(results_file.joint_surprisal, expected.joint_surprisal)
+    assert np.allclose(results_file.psi.prediction_by_feature(0), expected.psi.prediction_by_feature(0))
+
+
+def test_native_gmm_reproduces_matlab_results():
+    results_file, expected = _rerun_results_file("drex-resultsfile-gmm-D1.mat", np.inf, np.inf)
+
+    assert np.allclose(results_file.surprisal, expected.surprisal)
+    assert np.allclose(results_file.joint_surprisal, expected.joint_surprisal)
+    assert np.allclose(results_file.context_beliefs, expected.context_beliefs)
+    assert results_file.change_decision_changepoint == expected.change_decision_changepoint
+    assert np.allclose(results_file.psi.prediction_by_feature(2), expected.psi.prediction_by_feature(2))
+
+
+def test_native_poisson_reproduces_matlab_results():
+    expected_prior = DREXResultsFile.load(SAMPLE_FILES_DIR / "drex-resultsfile-poisson-D3.mat").prior
+    results_file, expected = _rerun_results_file("drex-resultsfile-poisson-D3.mat", np.inf, np.inf,
+                                                 PoissonPrior(expected_prior.lambd, expected_prior.n, D=3))
+
+    assert np.allclose(results_file.surprisal, expected.surprisal)
+    assert np.allclose(results_file.joint_surprisal, expected.joint_surprisal)
+    assert np.allclose(results_file.context_beliefs, expected.context_beliefs)
+    assert results_file.psi.features() == []
+
+
+def _sample_unprocessed_prior(file_name: str) -> UnprocessedPrior:
+    data = scipy.io.loadmat(SAMPLE_FILES_DIR / file_name, simplify_cells=True)["estimate_suffstat"]
+    xs = data["xs"]
+    prior_input_sequence = np.array([np.array(trial, dtype=float) for trial in xs], dtype=object) \
+        if xs.dtype == object else [xs.T.tolist()]
+    return UnprocessedPrior(DistributionType(data["params"]["distribution"]), prior_input_sequence,
+                            int(data["params"]["D"]))
+
+
+def test_estimate_suffstat_gaussian_reproduces_matlab_results():
+    for D in [1, 2]:
+        prior = estimate_suffstat(_sample_unprocessed_prior("drex-instructionsfile-gaussian-D{}.mat".format(D)))
+        expected = DREXResultsFile.load(SAMPLE_FILES_DIR / "drex-resultsfile-gaussian-D{}.mat".format(D)).prior
+
+        assert isinstance(prior, GaussianPrior)
+        assert np.allclose(prior.means, expected.means)
+        assert np.allclose(prior.covariance, expected.covariance)
+        assert np.array_equal(prior.n, expected.n)
+
+
+def test_estimate_suffstat_gmm_reproduces_matlab_results():
+    prior = estimate_suffstat(_sample_unprocessed_prior("drex-instructionsfile-gmm-D1.mat"))
+    expected = DREXResultsFile.load(SAMPLE_FILES_DIR / "drex-resultsfile-gmm-D1.mat").prior
+
+    assert isinstance(prior, GmmPrior)
+    for attribute in ["means", "covariance", "n", "pi", "sp", "k"]:
+        assert np.allclose(getattr(prior, attribute), getattr(expected, attribute), equal_nan=True)
+
+
+def test_estimate_suffstat_poisson_reproduces_matlab_results():
+    prior = estimate_suffstat(_sample_unprocessed_prior("drex-instructionsfile-poisson-D3.mat"))
+
+    assert isinstance(prior, PoissonPrior)
+    assert np.allclose(prior.lambd, [6, 9, 12])
+    assert np.allclose(prior.n, [1, 1, 1])
+    assert prior.D_value() == 3
+
+
+def test_estimate_suffstat_lognormal_corresponds_to_gaussian_of_logarithm():
+    xs = [[1.0, 2.5, 4.0, 3.0], [0.5, 2.0, 1.5]]
+    lognormal_prior = estimate_suffstat(UnprocessedPrior(DistributionType.LOGNORMAL, xs, 2))
+    gaussian_prior = estimate_suffstat(UnprocessedPrior(DistributionType.GAUSSIAN,
+                                                        [np.log(trial).tolist() for trial in xs], 2))
+
+    assert isinstance(lognormal_prior, LognormalPrior)
+    assert np.allclose(lognormal_prior.means, gaussian_prior.means)
+    assert np.allclose(lognormal_prior.covariance, gaussian_prior.covariance)
+
+
+def test_prior_cache_estimates_each_prior_once(tmp_path):
+    unprocessed_prior = _sample_unprocessed_prior("drex-instructionsfile-gaussian-D2.mat")
+    cache = PriorCache(tmp_path)
+
+    prior = cache.get(unprocessed_prior)
+    assert cache.get(_sample_unprocessed_prior("drex-instructionsfile-gaussian-D2.mat")) is prior
+    assert len(cache) == 1
+    assert len(list(tmp_path.glob("*.npz"))) == 1
+
+    # Another cache (e.g., of another process) reuses the persisted prior
+    persisted_prior = PriorCache(tmp_path).get(unprocessed_prior)
+    assert np.allclose(persisted_prior.covariance, prior.covariance)
+
+    # Different content, different key
+    assert PriorCache.key(unprocessed_prior) != \
+        PriorCache.key(_sample_unprocessed_prior("drex-instructionsfile-gaussian-D1.mat"))
+
+
+def test_native_backend_estimates_unprocessed_prior():
+    unprocessed_prior = _sample_unprocessed_prior("drex-instructionsfile-gaussian-D1.mat")
+    expected = DREXResultsFile.load(SAMPLE_FILES_DIR / "drex-resultsfile-gaussian-D1.mat")
+    instructions_file = DREXInstructionsFile([expected.input_sequence.T.tolist()], unprocessed_prior,
+                                             0.01, 2, 1, [0.0], None, None, 0.001, 0.01)
+
+    results_file = run_native_model(instructions_file, prior_cache=PriorCache())
+
+    assert isinstance(results_file.prior, GaussianPrior)
+    assert np.allclose(results_file.surprisal, expected.surprisal)
+
+
+def test_belief_dynamics_and_change_decision_reproduce_matlab_results():
+    expected = DREXResultsFile.load(SAMPLE_FILES_DIR / "drex-resultsfile-poisson-D3.mat")
+
+    assert np.allclose(belief_dynamics(expected.context_beliefs, 0.01), expected.belief_dynamics, atol=1e-4)
+    changepoint, change_probability = change_decision(expected.context_beliefs, expected.change_decision_threshold)
+    assert changepoint == expected.change_decision_changepoint
+    assert np.allclose(change_probability, expected.change_decision_probability)
+
+
+def test_gaussian_engine_updates_sufficient_statistics():
+    prior = GaussianPrior(np.array([[0.]]), np.array([[[1.]]]), np.array([1]))
+    engine = GaussianEngine(prior, hazard=0.5)
+    for x in [1, 2]:
+        engine.step(np.array([x]))
+
+    assert engine.count == 3
+    assert np.allclose(engine.params["n"][:3, 0], [3, 2, 1])
+    assert np.allclose(engine.params["mu"][:3, 0, 0], [1, 1, 0])
+    assert np.allclose(engine.params["ss"][:3, 0, 0, 0], [1 + 1 / 2 + 2 / 3 * 1.5 ** 2, 1 + 1 / 2 * 2 ** 2, 1])
+    assert np.isclose(engine.context_beliefs().sum(), 1)
+
+
+def test_gaussian_engine_memory_limits_hypotheses():
+    prior = GaussianPrior(np.array([[0.]]), np.array([[[1.]]]), np.array([1]))
+    engine = GaussianEngine(prior, memory=3)
+    for x in [0, 1, 0, 1, 0]:
+        engine.step(np.array([x]))
+
+    assert engine.count == 3
+    assert engine.context_beliefs()[0] == 0  # the oldest slot is cleared as soon as the window is full
+    assert np.isclose(engine.context_beliefs().sum(), 1)
+
+
+def test_lognormal_engine_corresponds_to_gaussian_engine_of_logarithm():
+    means, covariance, n = np.array([[0.5]]), np.array([[[2.]]]), np.array([1])
+    gaussian_engine = GaussianEngine(GaussianPrior(means, covariance, n))
+    lognormal_engine = LognormalEngine(LognormalPrior(means, covariance, n))
+    for x in [0.2, 1.5, -0.3]:
+        gaussian_results = gaussian_engine.step(np.array([x]))
+        lognormal_results = lognormal_engine.step(np.array([np.exp(x)]))
+        assert np.allclose(lognormal_results["surprisal"], gaussian_results["surprisal"] + x / np.log(2))
+    assert np.allclose(lognormal_engine.context_beliefs(), gaussian_engine.context_beliefs())
+
+
+def test_gmm_engine_adds_components():
+    prior = GmmPrior(np.array([[0.]]), np.array([[1.]]), np.array([[1.]]), np.array([[1.]]), np.array([[1.]]),
+                     np.array([1]))
+    engine = GmmEngine(prior, max_ncomp=2, beta=0.001)
+    for x in [0, 100, 200]:
+        engine.step(np.array([x]))
+
+    # Oldest hypothesis: 100 is explained by no component, thus a new one is added. As the number of components is
+    # limited to max_ncomp, 200 is assigned to the component which explains it best.
+    assert engine.params["k"][0, 0] == 2
+    assert np.allclose(engine.params["sp"][0, 0], [2, 2])
+    assert np.allclose(engine.params["mu"][0, 0], [0, 150])
+
+
+def test_native_backend_detects_change():
+    rng = np.random.default_rng(42)
+    input_sequence = np.concatenate([rng.normal(0, 1, 30), rng.normal(20, 1, 30)]).tolist()
+    prior = GaussianPrior(np.array([[0.]]), np.array([[[1.]]]), np.array([1]))
+    instructions_file = DREXInstructionBuilder().prior(prior).input_sequence(input_sequence).to_instructions_file()
+
+    results_file = DREXModel.run_instructions_file(instructions_file, backend=DREXBackend.NATIVE)
+
+    assert results_file.surprisal.shape == (60, 1)
+    assert results_file.context_beliefs.shape == (61, 61)
+    assert np.allclose(results_file.context_beliefs.sum(axis=0), 1)
+    # After the change, the belief is concentrated on the hypothesis which started at the change
+    assert np.argmax(results_file.context_beliefs[:, 35]) == 30
+    assert results_file.context_beliefs[:29, 35].sum() < 0.01
+
+
+def test_session_reproduces_native_model_results():
+    rng = np.random.default_rng(1)
+    input_sequence = np.concatenate([rng.normal(0, 1, 20), rng.normal(10, 1, 20)])
+    prior = GaussianPrior(np.array([[0., 0.]]), np.array([[[1., 0.5], [0.5, 1.]]]), np.array([2]))
+    builder = DREXInstructionBuilder().prior(prior).input_sequence(input_sequence.tolist())
+    expected = run_native_model(builder.to_instructions_file())
+
+    session = builder.to_session()
+    results = [session.observe(x) for x in input_sequence]
+
+    assert session.time == 40
+    assert np.allclose([r["surprisal"] for r in results], expected.surprisal)
+    assert np.allclose([r["joint_surprisal"] for r in results], expected.joint_surprisal)
+    assert np.allclose([r["belief_dynamics"] for r in results], expected.belief_dynamics[1:])
+    assert np.allclose([r["change_decision_probability"] for r in results], expected.change_decision_probability[1:])
+    assert results[-1]["change_decision_changepoint"] == expected.change_decision_changepoint
+    assert np.allclose(session.context_beliefs(), expected.context_beliefs[:, -1])
+
+
+def test_session_with_finite_memory_has_constant_size():
+    prior = GmmPrior(np.array([[0.]]), np.array([[1.]]), np.array([[1.]]), np.array([[1.]]), np.array([[1.]]),
+                     np.array([1]))
+    session = DREXInstructionBuilder().prior(prior).memory(5).maxhyp(3).to_session()
+    rng = np.random.default_rng(2)
+    for x in rng.normal(0, 1, 100):
+        results = session.observe(x)
+        assert session.engine.count <= 5
+        assert np.count_nonzero(session.context_beliefs()) <= 3
+        assert 0 <= results["change_decision_probability"] <= 1
+    assert len(session.engine.beliefs) <= 10
+    assert session.engine.observations.shape == (1, 1)
+
+
+def test_arun_with_native_backend():
+    prior = GaussianPrior(np.array([[0.]]), np.array([[[1.]]]), np.array([1]))
+    builder = DREXInstructionBuilder().prior(prior).input_sequence([0., 1., 0., 5., 5.])
+
+    results_file = asyncio.run(DREXModel.arun(builder, backend=DREXBackend.NATIVE))
+
+    expected_results_file = DREXModel.run_instructions_file(builder.to_instructions_file(), backend=DREXBackend.NATIVE)
+    assert np.array_equal(results_file.surprisal, expected_results_file.surprisal)
@@ -5,7 +5,7 @@ import os
 from cmme.config import Config
 from cmme.idyom import IDYOMModel, IDYOMDatabase
 from cmme.idyom.base import IDYOMModelType, BasicViewpoint, transform_string_list_to_viewpoints_list, IDYOMEscapeMethod
-from cmme.idyom.binding import IDYOMInstructionsFile
+from cmme.idyom.binding import IDYOMInstructionsFile, IDYOMResultsFile
 from cmme.idyom.model import IDYOMInstructionBuilder
 from cmme.idyom.util import install_idyom
 from cmme.lib.util import path_as_string_with_trailing_slash
@@ -180,4 +180,46 @@ def test_load_results_file():
 
             assert idyom_rf.df is not None
             assert idyom_rf.targetViewpoints == transform_string_list_to_viewpoints_list(target_viewpoints)
-            assert list(idyom_rf.usedSourceViewpoints.keys()) == transform_string_list_to_viewpoints_list(source_viewpoints)
\ No newline at end of file
+            assert list(idyom_rf.usedSourceViewpoints.keys()) == transform_string_list_to_viewpoints_list(source_viewpoints)
+
+
+def _write_results_file(file_path):
+    with open(file_path, "w") as f:
+        f.write("dataset.id melody.id note.id melody.name cpitch cpitch.order.stm.cpitch cpitch.60 cpitch.62 "
+                "cpitch.probability probability information.content entropy information.gain \n")
+        f.write('1 1 1 "a b" 60 0 0.5 0.5 0.5 0.5 1.0 1.0 0.0 \n')
+        f.write('1 1 2 "a b" 62 1 0.25 0.75 0.75 0.75 0.415 0.81 0.1 \n')
+
+
+def test_load_results_file_with_sidecar_and_projection():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        file_path = Path(tmpdir) / "results.dat"
+        _write_results_file(file_path)
+
+        results_file = IDYOMResultsFile.load(file_path, use_sidecar=False)
+        assert results_file.df.columns[-1] == "information.gain"  # no unnamed columns
+        assert results_file.df["note.id"].tolist() == [1, 2]
+        assert results_file.df["melody.name"].tolist() == ["a b", "a b"]
+        assert results_file.df["cpitch.60"].dtype == float
+        assert results_file.targetViewpoints == [BasicViewpoint.CPITCH]
+        assert results_file.targetViewpointValues[BasicViewpoint.CPITCH] == ["60", "62"]
+
+        assert not IDYOMResultsFile.sidecar_path(file_path).exists()
+        assert IDYOMResultsFile.load(file_path).df.equals(results_file.df)
+        assert IDYOMResultsFile.sidecar_path(file_path).exists()
+
+        projected_results_file = IDYOMResultsFile.load(file_path, columns=["information.content", "entropy"])
+        assert projected_results_file.df.columns.tolist() == ["information.content", "entropy"]
+        assert projected_results_file.df["entropy"].tolist() == [1.0, 0.81]
+        assert projected_results_file.targetViewpoints == []
+
+        # A modified results file invalidates the sidecar
+        with open(file_path, "a") as f:
+            f.write('1 1 3 "a b" 60 1 0.5 0.5 0.5 0.5 1.0 1.0 0.0 \n')
+        assert len(IDYOMResultsFile.load(file_path, columns=["entropy"]).df) == 3
+
+        try:
+            IDYOMResultsFile.load(file_path, columns=["cpitch.64"])
+            assert False
+        except ValueError:
+            pass
@@ -111,4 +111,23 @@ def test_encode_composition():
         composition = compositions[0] # assume: file "test.mid"
 
         encoding = idb.encode_composition(composition, BasicViewpoint.CPITCH)
-        assert encoding == [60, 61, 63, 65, 66, 68, 56, 54, 53, 51, 49, 44, 42, 41, 39, 37, 73, 77, 80, 68, 70, 72, 73, 127, 66, 66, 66, 0, 45, 46, 45]
\ No newline at end of file
+        assert encoding == [60, 61, 63, 65, 66, 68, 56, 54, 53, 51, 49, 44, 42, 41, 39, 37, 73, 77, 80, 68, 70, 72, 73, 127, 66, 66, 66, 0, 45, 46, 45]
+
+def test_encode_dataset():
+    idyom_root_path = Config().idyom_root_path()
+    sample_midi_files_dir_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../sample_files/idyom-midi/"))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        idyom_database_path = path_as_string_with_trailing_slash(tmpdir) + "db/database.sqlite"
+
+        install_idyom(idyom_root_path, idyom_database_path)
+
+        idb = IDYOMDatabase(idyom_root_path, idyom_database_path)
+        dataset_id = idb.import_midi_dataset(sample_midi_files_dir_path, description="test")
+        compositions = idb.get_all_compositions(dataset_id)
+
+        values, offsets = idb.encode_dataset(dataset_id, BasicViewpoint.CPITCH)
+
+        assert len(offsets) == len(compositions) + 1
+        for idx, composition in enumerate(compositions):
+            assert values[offsets[idx]:offsets[idx + 1]].tolist() == \
+                   idb.encode_composition(composition, BasicViewpoint.CPITCH)
@@ -1,7 +1,17 @@
+import asyncio
+import os
+import signal
+import sqlite3
+
+import pytest
+
 from cmme.config import Config
 from cmme.idyom import IDYOMDatabase
 from cmme.idyom.model import *
+from cmme.idyom.server import IDYOMServer, IDYOMWorkerPool
 from cmme.idyom.util import install_idyom
+from cmme.lib.cache import ResultsCache
+from cmme.sweep import Sweep, SuccessiveHalving
 
 
 def test_default_idyom_instruction_builder_uses_default_values():
@@ -81,4 +91,184 @@ def test_idyom_both_run_succeeds():
         idyom_model = IDYOMModel()
         idyom_results_file = idyom_model.run_instructions_file(idyomif)
 
-        assert idyom_results_file.df is not None
\ No newline at end of file
+        assert idyom_results_file.df is not None
+
+def test_idyom_server_runs_several_instructions_files():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        idyom_root_path = Config().idyom_root_path()
+        idyom_database_path = Path(tmpdir) / Path("./db/database.sqlite")
+        install_idyom(idyom_root_path, idyom_database_path)
+
+        midi_dir_path = str(Path(__file__).parent.parent.resolve() / Path("sample_files/idyom-midi")) + "/"
+        idyom_database = IDYOMDatabase(idyom_root_path, idyom_database_path)
+        dataset = idyom_database.import_midi_dataset(midi_dir_path, "test")
+
+        instructions_files = [
+            IDYOMInstructionBuilder().model(IDYOMModelType.STM).source_viewpoints([BasicViewpoint.CPITCH])
+            .target_viewpoints([BasicViewpoint.CPITCH]).dataset(dataset)
+            .stm_options(order_bound=order_bound).training_options(resampling_folds_count_k=1)
+            .output_options(output_path=tmpdir).to_instructions_file()
+            for order_bound in [1, 2]]
+
+        with IDYOMServer(idyom_root_path, idyom_database_path) as server:
+            results_files = server.map(instructions_files)
+            single_results_file = IDYOMModel.run_instructions_file(instructions_files[0], server=server)
+
+        assert all(results_file.df is not None for results_file in results_files)
+        assert single_results_file.df.equals(results_files[0].df)
+
+
+def test_idyom_server_terminates_hung_and_closed_lisp_processes():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        idyom_root_path = Config().idyom_root_path()
+        idyom_database_path = Path(tmpdir) / Path("./db/database.sqlite")
+        install_idyom(idyom_root_path, idyom_database_path)
+
+        server = IDYOMServer(idyom_root_path, idyom_database_path)
+        server.HEALTH_CHECK_TIMEOUT = 1
+        server.start()
+        hung_process = server.database.lisp.process
+        os.kill(hung_process.pid, signal.SIGSTOP)  # simulates a hung Lisp
+        server._restart_if_unhealthy()
+        assert hung_process.poll() is not None
+        assert server.database.lisp.process is not hung_process
+
+        process = server.database.lisp.process
+        server.close()
+        assert process.poll() is not None
+        assert server.database is None
+
+
+def test_idyom_server_terminates_lisp_processes_of_hung_runs():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        idyom_root_path = Config().idyom_root_path()
+        idyom_database_path = Path(tmpdir) / Path("./db/database.sqlite")
+        install_idyom(idyom_root_path, idyom_database_path)
+        instructions_file = IDYOMInstructionBuilder().model(IDYOMModelType.STM) \
+            .source_viewpoints([BasicViewpoint.CPITCH]).target_viewpoints([BasicViewpoint.CPITCH]).dataset(1) \
+            .output_options(output_path=tmpdir).to_instructions_file()
+
+        # A hung run is failed by the watchdog, and the Lisp process is replaced
+        server = IDYOMServer(idyom_root_path, idyom_database_path, run_timeout=1)
+        server.HEALTH_CHECK_TIMEOUT = 1
+        server.start()
+        hung_process = server.database.lisp.process
+        os.kill(hung_process.pid, signal.SIGSTOP)
+        future = server.submit(instructions_file)
+        assert isinstance(future.exception(), TimeoutError)
+        assert hung_process.poll() is not None
+        assert server._is_healthy()
+
+        # Closing the server while a run hangs does not block
+        server.run_timeout = None
+        hung_process = server.database.lisp.process
+        os.kill(hung_process.pid, signal.SIGSTOP)
+        futures = [server.submit(instructions_file) for _ in range(2)]
+        server.close(timeout=1)
+        assert hung_process.poll() is not None
+        assert futures[0].exception() is not None
+        assert futures[1].cancelled()
+        assert server.database is None
+
+
+def test_idyom_worker_pool_schedules_with_dataset_affinity():
+    def instructions_file(dataset_id, use_ltms_cache=None, use_resampling_set_cache=None):
+        return IDYOMInstructionBuilder().model(IDYOMModelType.STM).source_viewpoints([BasicViewpoint.CPITCH]) \
+            .target_viewpoints([BasicViewpoint.CPITCH]).dataset(dataset_id) \
+            .caching_options(use_resampling_set_cache, use_ltms_cache).to_instructions_file()
+
+    pool = IDYOMWorkerPool(size=2, max_imbalance=1)  # workers are not started
+    assert IDYOMWorkerPool.affinity_key(instructions_file(1)) == (1, ())
+    assert IDYOMWorkerPool.affinity_key(instructions_file(1, False, False)) is None
+
+    first_worker = pool._select_worker((1, ()))
+    pool._pending[first_worker] += 1
+    second_worker = pool._select_worker((2, ()))
+    assert second_worker != first_worker
+    assert pool._select_worker((1, ())) == first_worker  # imbalance 1 - 0 is acceptable
+    pool._pending[first_worker] += 1
+    assert pool._select_worker((1, ())) == second_worker  # imbalance 2 - 0 is not, i.e., spill over
+    assert pool.affinities[second_worker] == {(1, ()), (2, ())}
+
+
+def test_idyom_sweep_rejects_input_sequence_and_early_stopping():
+    builder = IDYOMInstructionBuilder().model(IDYOMModelType.STM).source_viewpoints([BasicViewpoint.CPITCH]) \
+        .target_viewpoints([BasicViewpoint.CPITCH]).dataset(1)
+    parameters = {"stm_options.order_bound": [1, 2]}
+
+    for kwargs in [{"input_sequence": [60, 62, 64]},
+                   {"input_sequence": [60, 62, 64], "early_stopping": SuccessiveHalving(1)},
+                   {"early_stopping": SuccessiveHalving(1)}]:
+        with pytest.raises(ValueError, match="dataset"):
+            Sweep(builder, parameters, **kwargs)
+
+
+def test_idyom_results_cache_misses_reimported_datasets(tmp_path):
+    idyom_database_path = tmp_path / "database.sqlite"
+
+    def import_dataset(pitches):  # as IDyOM's import, reusing dataset id 1
+        with sqlite3.connect(str(idyom_database_path)) as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS mtp_dataset (dataset_id INTEGER, description TEXT)")
+            connection.execute("CREATE TABLE IF NOT EXISTS mtp_composition "
+                               "(dataset_id INTEGER, composition_id INTEGER, description TEXT)")
+            connection.execute("CREATE TABLE IF NOT EXISTS mtp_event "
+                               "(dataset_id INTEGER, composition_id INTEGER, event_id INTEGER, cpitch INTEGER)")
+            for table in ["mtp_dataset", "mtp_composition", "mtp_event"]:
+                connection.execute("DELETE FROM {}".format(table))
+            connection.execute("INSERT INTO mtp_dataset VALUES (1, 'test')")
+            connection.execute("INSERT INTO mtp_composition VALUES (1, 0, 'composition')")
+            connection.executemany("INSERT INTO mtp_event VALUES (1, 0, ?, ?)", list(enumerate(pitches)))
+        connection.close()
+
+    class CountingServer:
+        def __init__(self):
+            self.runs = 0
+
+        def run(self, instructions_file):
+            self.runs += 1
+            return self.runs
+
+    instructions_file = IDYOMInstructionBuilder().model(IDYOMModelType.STM).source_viewpoints([BasicViewpoint.CPITCH]) \
+        .target_viewpoints([BasicViewpoint.CPITCH]).dataset(1).idyom_database_path(idyom_database_path) \
+        .to_instructions_file()
+    cache = ResultsCache()
+    server = CountingServer()
+
+    import_dataset([60, 62, 64])
+    assert IDYOMModel.run_instructions_file(instructions_file, server=server, cache=cache) == 1
+    assert IDYOMModel.run_instructions_file(instructions_file, server=server, cache=cache) == 1
+    import_dataset([60, 62, 65])
+    assert IDYOMModel.run_instructions_file(instructions_file, server=server, cache=cache) == 2
+    import_dataset([60, 62, 64])
+    assert IDYOMModel.run_instructions_file(instructions_file, server=server, cache=cache) == 1
+
+
+def test_idyom_async_run_kills_sbcl_when_cancelled(tmp_path, monkeypatch):
+    # Stands in for sbcl, and hangs
+    pid_path = tmp_path / "sbcl.pid"
+    sbcl_path = tmp_path / "sbcl"
+    sbcl_path.write_text("#!/bin/sh\necho $$ > {}\nexec sleep 1000\n".format(pid_path))
+    sbcl_path.chmod(0o755)
+    monkeypatch.setenv("PATH", str(tmp_path) + os.pathsep + os.environ["PATH"])
+    instructions_file_path = tmp_path / "run.lisp"
+    monkeypatch.setattr("cmme.idyom.model.new_filepath", lambda *args: instructions_file_path)
+
+    instructions_file = IDYOMInstructionBuilder().model(IDYOMModelType.STM).source_viewpoints([BasicViewpoint.CPITCH]) \
+        .target_viewpoints([BasicViewpoint.CPITCH]).dataset(1).output_options(output_path=str(tmp_path)) \
+        .to_instructions_file()
+
+    async def cancel_run():
+        task = asyncio.ensure_future(IDYOMModel.arun(instructions_file))
+        while not pid_path.exists() or len(pid_path.read_text()) == 0:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return int(pid_path.read_text())
+
+    pid = asyncio.run(cancel_run())
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+    assert not instructions_file_path.exists()
@@ -0,0 +1,61 @@
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather
+
+from cmme.ppmdecay.base import PPMBackend, PPMEscapeMethod
+from cmme.ppmdecay.batch import PPMBatch
+from cmme.ppmdecay.model import PPMSimpleInstructionBuilder, PPMDecayInstructionBuilder, PPMModel
+
+
+def _example_batch():
+    alphabet_levels = [1, 2, 3]
+    input_sequence = [[1, 2, 3, 1, 2], [3, 3, 1]]
+    batch = PPMBatch()
+    for order_bound in [1, 2]:
+        batch.add(PPMSimpleInstructionBuilder()
+                  .alphabet_levels(alphabet_levels).input_sequence(input_sequence)
+                  .order_bound(order_bound).escape_method(PPMEscapeMethod.A))
+    for ltm_half_life in [1, 10]:
+        batch.add(PPMDecayInstructionBuilder()
+                  .alphabet_levels(alphabet_levels).input_sequence(input_sequence)
+                  .ltm_half_life(ltm_half_life))
+    return batch
+
+
+def test_ppm_batch_to_data_frame():
+    batch = _example_batch()
+    df = batch.to_data_frame()
+
+    assert df["job_id"].tolist() == [1, 2, 3, 4]
+    assert df["model_type"].tolist() == ["SIMPLE", "SIMPLE", "DECAY", "DECAY"]
+    assert df["order_bound"].tolist() == [1, 2, 10, 10]
+    assert pd.isna(df["ltm_half_life"][0]) and df["ltm_half_life"][3] == 10
+
+    with tempfile.NamedTemporaryFile() as tmpfile:
+        batch.save(tmpfile.name)
+        assert pyarrow.feather.read_table(tmpfile.name).num_rows == 4
+
+
+def test_run_ppm_batch_with_native_backend():
+    batch = _example_batch()
+    results = batch.run(backend=PPMBackend.NATIVE)
+
+    assert results.job_ids == [1, 2, 3, 4]
+    assert results.trials == [1, 2]
+    assert len(results.df_by_job_and_trial(3, 2)) == 3
+    assert results.indexed_df().index.names == ["job_id", "trial_idx"]
+
+    single_job_results = PPMModel.run_instructions_file(batch.instructions_file(2), backend=PPMBackend.NATIVE)
+    assert np.allclose(batch.results_of_job(results, 2).results_file_data.df["information_content"],
+                       single_job_results.results_file_data.df["information_content"])
+
+
+def test_run_ppm_batch():
+    batch = _example_batch()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = batch.run(batch_file_path="{}/batch.feather".format(tmpdir))
+
+    assert results.job_ids == [1, 2, 3, 4]
+    assert results.df_by_job_and_trial(1, 1)["symbol"].tolist() == ["1", "2", "3", "1", "2"]
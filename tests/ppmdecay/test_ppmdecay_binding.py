@@ -1,9 +1,13 @@
 import tempfile
 
+import pandas as pd
+
 from cmme.ppmdecay.base import PPMEscapeMethod, PPMModelType
-from cmme.ppmdecay.binding import PPMSimpleInstructionsFile, PPMDecayInstructionsFile, PPMResultsMetaFile
+from cmme.ppmdecay.binding import PPMSimpleInstructionsFile, PPMDecayInstructionsFile, PPMResultsMetaFile, \
+    PPMSimpleResultsFileData, PPMBatchResultsFileData
 from cmme.ppmdecay.model import PPMSimpleInstructionBuilder, PPMDecayInstructionBuilder, PPMModel
-from cmme.ppmdecay.util import auto_convert_input_sequence
+from cmme.lib.util import nparray_to_list
+from cmme.ppmdecay.util import auto_convert_input_sequence, data_frame_to_ipc_stream, ipc_stream_to_data_frame
 
 
 def test_ppmsimple_instructions_file():
@@ -218,3 +222,71 @@ def test_load_ppmsimple_results_file():
         ppmrf_data = ppmrf.results_file_data
         assert ppmrf_data.df is not None
         assert len(ppmrf_data.trials) == 1
+
+
+def test_ppmdecay_instructions_file_ipc_stream_roundtrip():
+    alphabet_levels = list(map(str, [1, 2, 3, 5]))
+    input_sequence = [list(map(str, [1, 1, 3, 2])), list(map(str, [5, 5, 1, 3]))]
+    input_time_sequence = [[1, 2, 4, 5], [6, 8, 9, 10]]
+
+    ppmif = PPMDecayInstructionBuilder() \
+        .alphabet_levels(alphabet_levels) \
+        .input_sequence(input_sequence, input_time_sequence) \
+        .to_instructions_file()
+    df = ipc_stream_to_data_frame(data_frame_to_ipc_stream(ppmif.to_data_frame()))
+
+    assert df["model_type"][0] == PPMModelType.DECAY.value
+    assert nparray_to_list(df["input_sequence"][0]) == input_sequence
+    assert nparray_to_list(df["input_time_sequence"][0]) == input_time_sequence
+    assert df["ltm_half_life"][0] == ppmif.ltm_half_life
+
+
+def test_run_ppmsimple_in_memory():
+    alphabet_levels = list(map(str, [1, 2, 3, 5]))
+    input_sequence = list(map(str, [1, 1, 3, 2, 5, 5, 1, 3]))
+
+    ppmif = PPMSimpleInstructionBuilder() \
+        .alphabet_levels(alphabet_levels) \
+        .input_sequence(input_sequence) \
+        .to_instructions_file()
+    ppmrf = PPMModel.run_instructions_file(ppmif)
+
+    assert ppmrf.results_file_meta_path is None
+    assert ppmrf.model_type == PPMModelType.SIMPLE
+    assert ppmrf.results_file_data.df["symbol"].tolist() == input_sequence
+
+
+def test_results_file_data_trial_index():
+    df = pd.DataFrame({"symbol": ["a", "b", "c", "d", "e", "f"], "trial_idx": [2, 10, 1, 2, 10, 1]})
+    data = PPMSimpleResultsFileData(None, df)
+
+    assert data.trials == [1, 2, 10]
+    assert data.df_by_trial(2)["symbol"].tolist() == ["a", "d"]
+    assert data.df_of_last_trial()["symbol"].tolist() == ["b", "e"]
+    assert [(trial, trial_df["symbol"].tolist()) for trial, trial_df in data.iter_trials()] == \
+           [(1, ["c", "f"]), (2, ["a", "d"]), (10, ["b", "e"])]
+    try:
+        data.df_by_trial(3)
+        assert False
+    except ValueError:
+        pass
+
+    sorted_df = df.sort_values("trial_idx", kind="stable", ignore_index=True)
+    assert PPMSimpleResultsFileData(None, sorted_df).df is sorted_df  # no copy if already sorted
+
+
+def test_batch_results_file_data_index():
+    df = pd.DataFrame({"symbol": ["a", "b", "c", "d", "e"], "trial_idx": [1, 2, 1, 1, 2],
+                       "job_id": [1, 1, 0, 0, 0]})
+    data = PPMBatchResultsFileData(None, df)
+
+    assert data.job_ids == [0, 1]
+    assert data.trials == [1, 2]
+    assert data.df_by_job(0)["symbol"].tolist() == ["c", "d", "e"]
+    assert data.df_by_job_and_trial(0, 1)["symbol"].tolist() == ["c", "d"]
+    assert data.df_by_trial(2)["symbol"].tolist() == ["e", "b"]
+    try:
+        data.df_by_job_and_trial(1, 3)
+        assert False
+    except ValueError:
+        pass
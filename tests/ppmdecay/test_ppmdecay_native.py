@@ -0,0 +1,291 @@
+import asyncio
+import itertools
+import tempfile
+
+import numpy as np
+
+from cmme.ppmdecay.base import PPMEscapeMethod, PPMModelType, PPMBackend
+from cmme.ppmdecay.model import PPMSimpleInstructionBuilder, PPMDecayInstructionBuilder, PPMModel
+from cmme.ppmdecay.native import PPMSimpleEngine, PPMDecayEngine, encode_sequence, run_native_model, \
+    split_trials
+from cmme.ppmdecay.session import PPMSession
+
+
+def test_ppm_simple_engine_escape_method_a():
+    engine = PPMSimpleEngine(2, order_bound=0, shortest_deterministic=False, exclusion=False,
+                             update_exclusion=False, escape_method=PPMEscapeMethod.A)
+    results = engine.model_seq([0, 0, 1])
+
+    assert results["model_order"] == [-1, 0, 0]
+    assert np.allclose(results["distribution"][0], [1 / 2, 1 / 2])
+    assert np.allclose(results["distribution"][1], [3 / 4, 1 / 4])
+    assert np.allclose(results["distribution"][2], [5 / 6, 1 / 6])
+    assert np.allclose(results["information_content"], [1, -np.log2(3 / 4), -np.log2(1 / 6)])
+    assert np.isclose(results["entropy"][1], -(3 / 4 * np.log2(3 / 4) + 1 / 4 * np.log2(1 / 4)))
+
+
+def test_ppm_simple_engine_escape_method_b():
+    engine = PPMSimpleEngine(2, order_bound=0, shortest_deterministic=False, exclusion=False,
+                             update_exclusion=False, escape_method=PPMEscapeMethod.B)
+    results = engine.model_seq([0, 0, 0])
+
+    assert np.allclose(results["distribution"][1], [1 / 2, 1 / 2])
+    assert np.allclose(results["distribution"][2], [3 / 4, 1 / 4])
+
+
+def test_ppm_simple_engine_distributions_are_normalized():
+    for escape_method in PPMEscapeMethod:
+        engine = PPMSimpleEngine(4, order_bound=3, escape_method=escape_method)
+        results = engine.model_seq([0, 1, 2, 0, 1, 3, 0, 1, 2, 2, 0, 1])
+        for distribution in results["distribution"]:
+            assert np.isclose(distribution.sum(), 1)
+            assert (distribution > 0).all()
+
+
+def _simple_engine_configurations():
+    return itertools.product(PPMEscapeMethod, [True, False], [True, False], [True, False])
+
+
+def test_ppm_simple_engine_interpolation_conserves_mass():
+    sequence = list(np.random.default_rng(0).integers(0, 3, 80))
+    for escape_method, exclusion, update_exclusion, shortest_deterministic in _simple_engine_configurations():
+        engine = PPMSimpleEngine(3, order_bound=3, shortest_deterministic=shortest_deterministic, exclusion=exclusion,
+                                 update_exclusion=update_exclusion, escape_method=escape_method)
+        for pos, symbol in enumerate(sequence):
+            history = sequence[max(0, pos - engine.order_bound):pos]
+            weights = engine._weights(history, engine._max_order(history, None), None)
+            distribution, unassigned_mass = engine._interpolate(weights, engine._select_model_order(weights))
+            # Without normalization, probability mass is only left unassigned if exclusion removed all symbols
+            assert np.isclose(distribution.sum() + unassigned_mass, 1)
+            assert unassigned_mass == 0 or exclusion
+            engine.update(history, symbol)
+
+
+def test_native_backend_matches_r_backend():
+    input_sequence = [[1, 2, 3, 1, 2, 4, 1, 2, 3, 3, 4, 1, 2, 3, 1, 1], [2, 3, 4, 2, 3, 1, 2]]
+    for escape_method, exclusion, update_exclusion, shortest_deterministic in _simple_engine_configurations():
+        ppmif = PPMSimpleInstructionBuilder() \
+            .alphabet_levels([1, 2, 3, 4]) \
+            .order_bound(3) \
+            .escape_method(escape_method) \
+            .exclusion(exclusion) \
+            .update_exclusion(update_exclusion) \
+            .shortest_deterministic(shortest_deterministic) \
+            .input_sequence(input_sequence) \
+            .to_instructions_file()
+        native_df = PPMModel.run_instructions_file(ppmif, backend=PPMBackend.NATIVE).results_file_data.df
+        r_df = PPMModel.run_instructions_file(ppmif, backend=PPMBackend.R).results_file_data.df
+
+        assert native_df["model_order"].tolist() == r_df["model_order"].tolist()
+        assert np.allclose(native_df["information_content"], r_df["information_content"])
+        assert np.allclose(native_df["entropy"], r_df["entropy"])
+
+
+def test_ppm_simple_engine_shortest_deterministic():
+    engine = PPMSimpleEngine(3, order_bound=2, shortest_deterministic=True, update_exclusion=False)
+    engine.model_seq([0, 1, 0, 1])
+    distribution, model_order = engine.predict([0])
+    assert model_order == 1  # the context (0) was always followed by 1, whereas () was not deterministic
+
+    engine = PPMSimpleEngine(3, order_bound=2, shortest_deterministic=False, update_exclusion=False)
+    engine.model_seq([0, 1, 0, 1])
+    distribution, model_order = engine.predict([1, 0])
+    assert model_order == 2
+
+
+def test_ppm_simple_engine_update_exclusion():
+    engine = PPMSimpleEngine(2, order_bound=1, update_exclusion=True)
+    engine.model_seq([0, 0, 0])
+    assert engine.counts[tuple()][0] == 2  # the third event was already known in context (0)
+    assert engine.counts[(0,)][0] == 2
+
+    engine = PPMSimpleEngine(2, order_bound=1, update_exclusion=False)
+    engine.model_seq([0, 0, 0])
+    assert engine.counts[tuple()][0] == 3
+
+
+def test_encode_sequence():
+    assert encode_sequence([1, 3, 2], ["1", "2", "3"]) == [0, 2, 1]
+    assert encode_sequence(["a", "b"], ["b", "a"]) == [1, 0]
+
+
+def test_run_ppm_simple_with_native_backend():
+    alphabet_levels = [1, 2, 3, 4, 5, 6]
+    input_sequence = [[1, 2, 3, 4, 5], [1, 1, 3, 2]]
+
+    ppmif = PPMSimpleInstructionBuilder() \
+        .alphabet_levels(alphabet_levels) \
+        .input_sequence(input_sequence) \
+        .to_instructions_file()
+    results_meta_file = PPMModel.run_instructions_file(ppmif, backend=PPMBackend.NATIVE)
+    df = results_meta_file.results_file_data.df
+
+    assert results_meta_file.model_type == PPMModelType.SIMPLE
+    assert results_meta_file.alphabet_levels == list(map(str, alphabet_levels))
+    assert list(df.columns) == ["symbol", "model_order", "information_content", "entropy", "distribution",
+                                "trial_idx"]
+    assert results_meta_file.results_file_data.trials == [1, 2]
+    assert df[df["trial_idx"] == 2]["symbol"].tolist() == list(map(str, input_sequence[1]))
+
+    with tempfile.NamedTemporaryFile() as tmpfile:
+        ppmif.save_self(tmpfile.name)
+        results_meta_file_from_path = PPMModel.run_instructions_file_at_path(tmpfile.name,
+                                                                             backend=PPMBackend.NATIVE)
+        assert np.allclose(results_meta_file_from_path.results_file_data.df["information_content"],
+                           df["information_content"])
+
+
+def test_ppm_decay_engine_decay_kernel():
+    engine = PPMDecayEngine(2, buffer_weight=4, stm_weight=2, stm_duration=2, ltm_weight=1, ltm_half_life=3,
+                            ltm_asymptote=0.5)
+    assert np.allclose(engine.decay_kernel([-1, 0, 1, 2, 5]), [4, 2, np.sqrt(2), 1, 0.75])
+
+
+def test_ppm_decay_engine_ltm_half_life():
+    engine = PPMDecayEngine(2, order_bound=0, ltm_half_life=10)
+    engine.update([], 0, 0)
+    distribution, model_order = engine.predict([0], 10)
+
+    assert model_order == 0
+    assert np.allclose(distribution, [0.5 / 1.5 + 1 / 1.5 * 0.5, 1 / 1.5 * 0.5])
+
+
+def test_ppm_decay_engine_buffer():
+    engine = PPMDecayEngine(2, order_bound=0, buffer_weight=2, buffer_length_time=5, buffer_length_items=2)
+    engine.update([], 0, 0)
+    assert np.allclose(engine.predict([0], 1)[0], [2 / 3 + 1 / 6, 1 / 6])
+
+    # An observation leaves the buffer as soon as two further events arrived
+    engine.update([0], 1, 1)
+    engine.update([0, 1], 1, 2)
+    assert np.allclose(engine._context_weights(0, 3), [2 ** -0.1, 1 + 2])
+
+
+def test_ppm_decay_engine_noise_is_reproducible():
+    sequence, time_sequence = [0, 1, 0, 1, 0, 2], [0, 1, 2, 3, 4, 5]
+    results = [PPMDecayEngine(3, noise=0.5, seed=42).model_seq(sequence, time_sequence) for _ in range(2)]
+    assert np.allclose(results[0]["information_content"], results[1]["information_content"])
+
+
+def test_ppm_decay_engine_noise_perturbs_summed_weights():
+    # 50 observations of the n-gram (0), long decayed (asymptote 0), and one recent observation of the n-gram (1)
+    noise_sd = 0.25  # as in new_ppm_decay, noise is the standard deviation
+    engine = PPMDecayEngine(2, order_bound=0, ltm_half_life=1, noise=noise_sd, seed=1)
+    engine.model_seq([0] * 50 + [1], list(range(50)) + [100], predict=False)
+
+    weights = np.array([engine._context_weights(0, 101) for _ in range(20000)])
+    # The weight of (0) is ~0: noise is added once to the sum (i.e., clipped once), regardless of 50 observations
+    assert np.isclose(weights[:, 0].mean(), noise_sd / np.sqrt(2 * np.pi), atol=0.005)
+    # The weight of (1) is 2^-1 = 0.5 plus noise of standard deviation 0.25 (clipped at 0)
+    expected = np.maximum(0.5 + np.random.default_rng(0).normal(0, noise_sd, 1000000), 0)
+    assert np.isclose(weights[:, 1].mean(), expected.mean(), atol=0.01)
+    assert np.isclose(weights[:, 1].var(), noise_sd ** 2, rtol=0.05)  # not clipped, as 0.5 is 2 sd away from 0
+    assert not np.isclose(weights[:, 1].var(), noise_sd, rtol=0.5)
+
+
+def test_run_ppm_decay_with_native_backend():
+    alphabet_levels = [1, 2, 3, 4, 5, 6]
+    input_sequence = [[1, 2, 3, 4, 5], [1, 1, 3, 2]]
+
+    ppmif = PPMDecayInstructionBuilder() \
+        .alphabet_levels(alphabet_levels) \
+        .input_sequence(input_sequence) \
+        .buffer_weight(2).buffer_length_items(3).buffer_length_time(2) \
+        .only_predict_from_buffer(True).only_learn_from_buffer(True) \
+        .to_instructions_file()
+
+    with tempfile.NamedTemporaryFile() as tmpfile:
+        ppmif.save_self(tmpfile.name)
+        results_meta_file = PPMModel.run_instructions_file_at_path(tmpfile.name, backend=PPMBackend.NATIVE)
+    df = results_meta_file.results_file_data.df
+
+    assert results_meta_file.model_type == PPMModelType.DECAY
+    assert results_meta_file.results_file_data.trials == [1, 2]
+    assert len(df) == 9
+    assert df["model_order"].max() <= 2
+    assert np.allclose([d.sum() for d in df["distribution"]], 1)
+
+
+def test_ppm_session_reproduces_native_model():
+    input_sequence = [["a", "b", "a", "c", "a", "b"], ["b", "a", "b", "c"]]
+    for new_builder in [lambda: PPMSimpleInstructionBuilder(),
+                        lambda: PPMDecayInstructionBuilder().buffer_length_items(2).noise(0.5)]:
+        expected = run_native_model(new_builder().alphabet_levels(["a", "b", "c"]).order_bound(2)
+                                    .input_sequence(input_sequence).to_instructions_file()).results_file_data.df
+
+        session = new_builder().alphabet_levels(["a", "b", "c"]).order_bound(2).to_session()
+        results = []
+        for trial_idx, trial in enumerate(input_sequence):
+            if trial_idx > 0:
+                session.new_trial()
+            results.extend(session.update(symbol) for symbol in trial)
+
+        assert [r["model_order"] for r in results] == expected["model_order"].tolist()
+        assert np.allclose([r["information_content"] for r in results], expected["information_content"])
+        assert np.allclose([r["distribution"] for r in results], np.stack(expected["distribution"]))
+
+
+def test_ppm_session_snapshot_and_restore():
+    sequence = ["a", "b", "c", "a", "b", "a", "c", "c", "b", "a"]
+    for builder in [PPMSimpleInstructionBuilder(), PPMDecayInstructionBuilder().ltm_half_life(3).noise(0.1)]:
+        session = builder.alphabet_levels(["a", "b", "c"]).order_bound(3).input_sequence(sequence[:6]).to_session()
+        restored_session = PPMSession.restore(session.snapshot())
+
+        for symbol in sequence[6:]:
+            results, restored_results = session.update(symbol), restored_session.update(symbol)
+            assert results["model_order"] == restored_results["model_order"]
+            assert np.allclose(results["distribution"], restored_results["distribution"])
+        assert np.allclose(session.predict("a")["distribution"], restored_session.predict("a")["distribution"])
+        assert len(session.history) == 3
+
+
+def test_independent_trials_run_in_parallel():
+    input_sequence = [["a", "b", "a", "b"], ["b", "b", "a"], ["a", "a", "a", "b", "b"], ["b", "a"]]
+    instructions_file = PPMSimpleInstructionBuilder().alphabet_levels(["a", "b"]).order_bound(2) \
+        .input_sequence(input_sequence).to_instructions_file()
+
+    results = PPMModel.run_instructions_file(instructions_file, PPMBackend.NATIVE, independent_trials=True,
+                                             processes=2)
+    df = results.results_file_data.df
+
+    assert df["trial_idx"].tolist() == [1] * 4 + [2] * 3 + [3] * 5 + [4] * 2
+    for trial_idx, trial in enumerate(input_sequence):
+        expected = PPMModel.run_instructions_file(
+            PPMSimpleInstructionBuilder().alphabet_levels(["a", "b"]).order_bound(2).input_sequence([trial])
+            .to_instructions_file(), PPMBackend.NATIVE).results_file_data.df
+        assert np.allclose(results.results_file_data.df_by_trial(trial_idx + 1)["information_content"],
+                           expected["information_content"])
+
+    # By default, learning carries over from one trial to the next
+    dependent_df = PPMModel.run_instructions_file(instructions_file, PPMBackend.NATIVE).results_file_data.df
+    assert not np.allclose(dependent_df["information_content"], df["information_content"])
+
+
+def test_split_trials_into_shards():
+    input_sequence = [["a", "b"], ["b"], ["a", "a", "b"], ["b", "a"]]
+    input_time_sequence = [[1, 2], [1], [1, 2, 3], [1, 2]]
+    instructions_file = PPMDecayInstructionBuilder().alphabet_levels(["a", "b"]) \
+        .input_sequence(input_sequence, input_time_sequence).to_instructions_file()
+
+    shard_instructions_files = split_trials(instructions_file, [[0, 1], [2, 3]])
+    assert [len(f.input_sequence) for f in shard_instructions_files] == [2, 2]
+    assert [list(trial) for trial in shard_instructions_files[1].input_sequence] == [["a", "a", "b"], ["b", "a"]]
+    assert [list(trial) for trial in shard_instructions_files[1].input_time_sequence] == [[1, 2, 3], [1, 2]]
+    assert len(instructions_file.input_sequence) == 4  # not modified
+    assert len(split_trials(instructions_file)) == 4
+
+
+def test_arun_runs_concurrently_within_limit():
+    builders = [PPMSimpleInstructionBuilder().alphabet_levels(["a", "b", "c"]).order_bound(order_bound)
+                .input_sequence(["a", "b", "a", "c", "a", "b", "c"]) for order_bound in [1, 2, 3]]
+
+    async def run_all():
+        return await asyncio.gather(*[PPMModel.arun(builder, backend=PPMBackend.NATIVE) for builder in builders])
+
+    results_files = asyncio.run(run_all())
+
+    for builder, results_file in zip(builders, results_files):
+        expected_results_file = PPMModel.run_instructions_file(builder.to_instructions_file(),
+                                                               backend=PPMBackend.NATIVE)
+        assert results_file.results_file_data.df.equals(expected_results_file.results_file_data.df)
+    assert PPMModel.async_concurrency_limit(PPMBackend.R) == 1
@@ -0,0 +1,104 @@
+import numpy as np
+
+from cmme.ppmdecay.native import PPMSimpleEngine, PPMDecayEngine
+from cmme.ppmdecay.trie import ContextTrie
+
+
+def _count_ngrams(sequence, order_bound, alphabet_size):
+    counts = dict()
+    for pos, symbol in enumerate(sequence):
+        for order in range(min(order_bound, pos) + 1):
+            context = tuple(sequence[pos - order:pos])
+            counts.setdefault(context, np.zeros(alphabet_size))[symbol] += 1
+    return counts
+
+
+def test_context_trie_counts_ngrams():
+    rng = np.random.default_rng(3)
+    sequence = rng.integers(0, 5, 500).tolist()
+    trie = ContextTrie(5, capacity=4)  # forces growing
+    for pos, symbol in enumerate(sequence):
+        for node in trie.context_nodes(sequence[:pos], min(3, pos), create=True):
+            trie.increment(node, symbol)
+
+    expected = _count_ngrams(sequence, 3, 5)
+    assert len(trie) == len(expected)
+    for context, counts in expected.items():
+        assert np.array_equal(trie[context], counts)
+    assert trie.get((4, 4, 4, 4)) is None
+    assert trie.find((4, 4, 4, 4)) == ContextTrie.NONE
+
+
+def test_context_trie_node_views():
+    trie = ContextTrie(3, alphabet_levels=["a", "b", "c"])
+    sequence = [trie.symbol_index(level) for level in ["a", "b", "a", "c"]]
+    for pos, symbol in enumerate(sequence):
+        for node in trie.context_nodes(sequence[:pos], min(2, pos), create=True):
+            trie.increment(node, symbol)
+
+    root = trie.node()
+    assert root.context == tuple() and root.symbol is None
+    assert np.array_equal(root.successor_counts(), [2, 1, 1])
+    assert sorted(child.levels for child in root.children()) == [("a",), ("b",)]
+    node = trie.node(trie.find((0, 1)))
+    assert node.levels == ("a", "b") and node.order == 2
+    assert np.array_equal(node.successor_counts(), [1, 0, 0])
+    assert not hasattr(node, "__dict__")
+
+
+def test_context_trie_memory_footprint():
+    trie = ContextTrie(300)
+    assert trie.node_symbol.dtype == np.uint16
+    footprint = trie.memory_footprint()
+    assert footprint["nodes"] == 1
+    assert footprint["successor_entries"] == 0
+    assert footprint["allocated_bytes"] == trie.nbytes
+    assert footprint["used_bytes"] < footprint["allocated_bytes"]
+
+
+def test_context_trie_state_round_trip():
+    engine = PPMSimpleEngine(4, order_bound=4)
+    engine.model_seq([0, 1, 2, 3, 0, 1, 2, 0, 1, 3, 3, 2])
+
+    restored_engine = PPMSimpleEngine(4, order_bound=4)
+    restored_engine.set_state(engine.get_state())
+
+    assert restored_engine.counts.memory_footprint()["used_bytes"] == engine.counts.memory_footprint()["used_bytes"]
+    for history in [[], [1], [0, 1], [3, 0, 1]]:
+        distribution, model_order = engine.predict(history)
+        restored_distribution, restored_model_order = restored_engine.predict(history)
+        assert np.allclose(distribution, restored_distribution)
+        assert model_order == restored_model_order
+
+
+def test_context_trie_stores_occurrences():
+    rng = np.random.default_rng(4)
+    sequence = rng.integers(0, 3, 300).tolist()
+    trie = ContextTrie(3, capacity=4, occurrences=True)  # forces growing
+    expected = dict()
+    for pos, symbol in enumerate(sequence):
+        for node in trie.context_nodes(sequence[:pos], min(2, pos), create=True):
+            trie.add_occurrence(node, symbol, pos)
+        for order in range(min(2, pos) + 1):
+            expected.setdefault(tuple(sequence[pos - order:pos]), []).append((symbol, pos))
+
+    assert len(trie) == len(expected)
+    for context, occurrences in expected.items():
+        symbols, positions = trie.occurrences(trie.find(context))
+        assert symbols.tolist() == [symbol for symbol, _ in occurrences]
+        assert positions.tolist() == [position for _, position in occurrences]
+    assert trie.memory_footprint()["occurrence_entries"] == sum(len(o) for o in expected.values())
+
+    restored_trie = ContextTrie(3, occurrences=True)
+    restored_trie.set_state(trie.get_state())
+    restored_trie.add_occurrence(0, 1, 300)
+    assert restored_trie.occurrences(0)[1].tolist() == list(range(301))
+
+
+def test_ppm_decay_engine_memory_footprint():
+    engine = PPMDecayEngine(4, order_bound=2)
+    engine.model_seq([0, 1, 2, 3, 0, 1, 2], predict=False)
+    footprint = engine.memory_footprint()
+    assert footprint["occurrence_entries"] == 1 + 2 + 3 * 5
+    assert footprint["successor_entries"] == 0
+    assert footprint["used_bytes"] < footprint["allocated_bytes"]
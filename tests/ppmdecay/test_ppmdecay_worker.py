@@ -0,0 +1,42 @@
+import tempfile
+
+import pytest
+
+from cmme.ppmdecay.model import PPMSimpleInstructionBuilder, PPMModel
+from cmme.ppmdecay.worker import RWorkerPool
+
+
+def test_rworkerpool_size_must_be_positive():
+    with pytest.raises(ValueError):
+        RWorkerPool(size=0)
+
+
+def test_rworkerpool_starts_lazily():
+    pool = RWorkerPool(size=2)
+    assert not pool.is_running
+    assert pool.check_health()
+    pool.shutdown()
+    assert not pool.is_running
+
+
+def test_run_instructions_files_concurrently():
+    alphabet_levels = [1, 2, 3]
+    input_sequences = [[1, 2, 3, 1, 2], [3, 3, 2, 1]]
+
+    with tempfile.TemporaryDirectory() as tmpdir, RWorkerPool(size=2) as pool:
+        file_paths = []
+        for idx, input_sequence in enumerate(input_sequences):
+            ppmif = PPMSimpleInstructionBuilder() \
+                .alphabet_levels(alphabet_levels) \
+                .input_sequence(input_sequence) \
+                .to_instructions_file()
+            file_path = "{}/instructions-{}.feather".format(tmpdir, idx)
+            ppmif.save_self(file_path)
+            file_paths.append(file_path)
+
+        results = PPMModel.run_instructions_files_at_paths(file_paths, pool)
+        assert pool.check_health()
+
+    assert len(results) == 2
+    for results_meta_file, input_sequence in zip(results, input_sequences):
+        assert results_meta_file.results_file_data.df["symbol"].tolist() == list(map(str, input_sequence))